@@ -11,33 +11,79 @@ result_backend = settings.REDIS_URL
 
 # ---------------------------------------------------------------------------
 # QUEUES
-# Each endpoint has its own queue so worker pools can be sized independently
+# Each endpoint has its own queue so worker pools can be sized independently.
+# Fetch stages get one queue per region (e.g. "match_detail.europe") because
+# Riot rate limits are per region — a worker can be dedicated to one region
+# with -Q. Saving is region-agnostic and shares a single queue.
 # ---------------------------------------------------------------------------
-task_queues = (
-    Queue("league"),
-    Queue("match_list"),
-    Queue("match_detail"),
-    Queue("save"),
-)
+REGIONAL_STAGES = ("league", "match_list", "match_detail")
 
-task_default_queue = "match_detail"
+
+def regional_queue(stage: str, region: str | None = None) -> str:
+    return f"{stage}.{(region or settings.RIOT_REGION).lower()}"
+
+
+task_queues = tuple(
+    Queue(regional_queue(stage, region))
+    for region in settings.crawl_regions
+    for stage in REGIONAL_STAGES
+) + (Queue("save"),)
+
+task_default_queue = regional_queue("match_detail")
 
 # ---------------------------------------------------------------------------
 # TASK ROUTING
-# Routes each task to its designated queue
+# Routes each task to its designated stage queue — fetch tasks are sent to the
+# queue of the region passed in their "region" kwarg
+# ---------------------------------------------------------------------------
+TASK_STAGES = {
+    "crawler.tasks.league.fetch_league":                     "league",
+    "crawler.tasks.match_list.fetch_match_list":             "match_list",
+    "crawler.tasks.match_detail.fetch_match_detail":         "match_detail",
+    "crawler.tasks.match_detail.fetch_match_details_batch":  "match_detail",
+    "crawler.tasks.save.save_match":                         "save",
+    "crawler.tasks.save.save_matches":                       "save",
+}
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    stage = TASK_STAGES.get(name)
+    if stage is None:
+        return None
+    if stage in REGIONAL_STAGES:
+        return {"queue": regional_queue(stage, (kwargs or {}).get("region"))}
+    return {"queue": stage}
+
+
+task_routes = (route_task,)
+
 # ---------------------------------------------------------------------------
-task_routes = {
-    "crawler.tasks.league.fetch_league":             {"queue": "league"},
-    "crawler.tasks.match_list.fetch_match_list":     {"queue": "match_list"},
-    "crawler.tasks.match_detail.fetch_match_detail": {"queue": "match_detail"},
-    "crawler.tasks.save.save_match":                 {"queue": "save"},
+# PRIORITIES
+# The league task queues match list tasks with a priority from the player's
+# score (crawler/services/scheduler.py) and every task spawned from them
+# inherits it — Redis keeps one list per priority step and workers drain
+# 0 (highest) first. Prefetching one task at a time stops a worker from
+# reserving low priority tasks ahead of high priority ones published later.
+# ---------------------------------------------------------------------------
+broker_transport_options = {
+    "priority_steps": list(range(10)),
+    # Lists are named {queue}:{priority} — see ARCHITECTURE.md before
+    # switching a broker that holds lists under kombu's default separator
+    "sep": ":",
+    "queue_order_strategy": "priority",
 }
+task_default_priority = 5
+task_inherit_parent_priority = True
+worker_prefetch_multiplier = 1
 
 # ---------------------------------------------------------------------------
 # WORKER CONCURRENCY
 # Sized according to each endpoint's method rate limit
 # Override per worker using -c flag in docker-compose command if needed
 # ---------------------------------------------------------------------------
+# With CONCURRENCY_CONTROL_ENABLED this is only the ceiling of worker processes
+# — how many of them have a Riot request in flight is adapted fleet-wide by
+# crawler/services/concurrency.py from latency, headroom and errors
 worker_concurrency = 4  # default, overridden per queue below
 
 # ---------------------------------------------------------------------------
@@ -79,14 +125,13 @@ enable_utc = True
 # ---------------------------------------------------------------------------
 # BEAT SCHEDULE
 # Celery Beat periodically checks if the match_list queue is empty
-# and triggers a new league fetch cycle if so
+# and triggers a new league fetch cycle if so — one entry per region
 # ---------------------------------------------------------------------------
 beat_schedule = {
-    "check-and-trigger-league-fetch": {
+    f"check-and-trigger-league-fetch-{region}": {
         "task": "crawler.tasks.league.fetch_league",
         "schedule": settings.CRAWLER_COOLDOWN_MINUTES * 60,  # seconds
-    },
+        "kwargs": {"region": region},
+    }
+    for region in settings.crawl_regions
 }
-
-
-
@@ -1,9 +1,14 @@
+import os
+import threading
+import time
+
 import clickhouse_connect
 from clickhouse_connect.driver.client import Client
 
 from shared.config import settings
 from shared.logging import get_logger
 from shared.models.unit import UnitRowModel
+from crawler.services.match_parser import patch_key
 
 logger = get_logger(__name__)
 
@@ -25,12 +30,87 @@ def get_client() -> Client:
 
 # ---------------------------------------------------------------------------
 # Unit stats insert
+#
+# Every insert creates at least one MergeTree part, so inserting each match's
+# ~72 rows on its own floods ClickHouse with tiny parts to merge. Three modes
+# (CLICKHOUSE_INSERT_MODE):
+#
+#   buffered  rows are buffered per worker process and inserted once
+#             CLICKHOUSE_BATCH_ROWS accumulate or CLICKHOUSE_FLUSH_SECONDS
+#             pass — the buffer is flushed on worker shutdown
+#   async     one insert per match with async_insert — ClickHouse buffers
+#             server side and acknowledges once the rows are written
+#   direct    one synchronous insert per match
+#
+# Buffered rows belong to matches whose save task has already been acked.
+# If a worker dies without shutting down, its unflushed rows are lost from
+# ClickHouse — the raw matches are still in PostgreSQL.
+#
+# A patch change drops every older partition. Buffered rows of an older
+# patch would recreate it, so each flush leaves out rows older than the
+# current patch, and the process detecting the change discards its own
+# (discard_stale_rows) before the partitions are dropped.
 # ---------------------------------------------------------------------------
 
+# Column order must match CREATE TABLE definition in clickhouse_schema.sql
+UNIT_COLUMN_NAMES = [
+    "match_id",
+    "game_datetime",
+    "game_version",
+    "tft_set_number",
+    "queue_id",
+    "puuid",
+    "placement",
+    "level",
+    "last_round",
+    "gold_left",
+    "players_eliminated",
+    "total_damage_to_players",
+    "tier",
+    "rank",
+    "lp",
+    "character_id",
+    "unit_name",
+    "unit_tier",
+    "unit_rarity",
+    "item_1",
+    "item_2",
+    "item_3",
+]
+
+BUFFERED = "buffered"
+ASYNC = "async"
+DIRECT = "direct"
+
+# After a failed flush the buffer keeps at most this many batches — beyond
+# that the oldest rows are dropped rather than growing without bound
+MAX_BUFFERED_BATCHES = 10
+
+# Position of match_id and game_version in a converted row
+_MATCH_ID_INDEX = UNIT_COLUMN_NAMES.index("match_id")
+_GAME_VERSION_INDEX = UNIT_COLUMN_NAMES.index("game_version")
+
+# Per-process buffer of rows converted for clickhouse-connect. _buffer_lock
+# guards the buffer and is never held across a network call; _flush_lock
+# lets one flush insert at a time.
+_buffer: list[list] = []
+_buffer_matches = 0
+_buffer_started: float | None = None
+_buffer_lock = threading.RLock()
+_flush_lock = threading.Lock()
+
+# Background thread flushing a buffer that stopped growing
+_flusher_pid: int | None = None
+_flusher_stop = threading.Event()
+
+# Per-process flush metrics
+_flush_stats = {"flushes": 0, "rows": 0, "max_rows": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+
 def insert_unit_rows(rows: list[UnitRowModel]) -> None:
     """
-    Batch inserts a list of flat unit rows into ClickHouse tft.unit_stats table.
-    All rows from a single match are inserted in one batch for efficiency.
+    Inserts flat unit rows of one or more matches into ClickHouse
+    tft.unit_stats the way CLICKHOUSE_INSERT_MODE says — see above.
 
     Args:
         rows: List of UnitRowModel instances produced by match_parser.explode_match_to_unit_rows()
@@ -39,84 +119,264 @@ def insert_unit_rows(rows: list[UnitRowModel]) -> None:
         logger.warning("insert_unit_rows called with empty list, skipping")
         return
 
-    # Column order must match CREATE TABLE definition in clickhouse_schema.sql
-    column_names = [
-        "match_id",
-        "game_datetime",
-        "game_version",
-        "tft_set_number",
-        "queue_id",
-        "puuid",
-        "placement",
-        "level",
-        "last_round",
-        "gold_left",
-        "players_eliminated",
-        "total_damage_to_players",
-        "tier",
-        "rank",
-        "lp",
-        "character_id",
-        "unit_name",
-        "unit_tier",
-        "unit_rarity",
-        "item_1",
-        "item_2",
-        "item_3",
-    ]
+    data = [_to_row(row) for row in rows]
+    matches = len({row.match_id for row in rows})
 
-    # Convert Pydantic models to list of tuples for clickhouse-connect
-    data = [
-        [
-            row.match_id,
-            row.game_datetime,
-            row.game_version,
-            row.tft_set_number,
-            row.queue_id,
-            row.puuid,
-            row.placement,
-            row.level,
-            row.last_round,
-            row.gold_left,
-            row.players_eliminated,
-            row.total_damage_to_players,
-            row.tier,
-            row.rank,
-            row.lp,
-            row.character_id,
-            row.unit_name,
-            row.unit_tier,
-            row.unit_rarity,
-            row.item_1,
-            row.item_2,
-            row.item_3,
-        ]
-        for row in rows
-    ]
+    if settings.CLICKHOUSE_INSERT_MODE == BUFFERED:
+        _buffer_rows(data, matches)
+        return
 
-    client = get_client()
+    insert_settings = {"async_insert": 1, "wait_for_async_insert": 1} if settings.CLICKHOUSE_INSERT_MODE == ASYNC else None
     try:
-        client.insert(
-            table="unit_stats",
-            data=data,
-            column_names=column_names,
-        )
+        _insert(data, insert_settings)
         logger.info(
             "unit rows inserted into clickhouse",
             match_id=rows[0].match_id,
+            matches=matches,
             row_count=len(rows),
         )
     except Exception as e:
         logger.error(
             "clickhouse insert failed",
             match_id=rows[0].match_id,
+            matches=matches,
             error=str(e),
         )
         raise
+
+
+def flush_unit_rows() -> int:
+    """
+    Inserts every buffered row in one batch and returns the row count.
+    On failure the rows go back to the front of the buffer and the error is
+    raised — the next flush retries them.
+    """
+    with _flush_lock:
+        return _flush()
+
+
+def discard_stale_rows(current_patch: str) -> int:
+    """
+    Drops buffered rows of patches older than current_patch and returns how
+    many were dropped. Called by patch_detector before it drops the old
+    partitions — waits for an in-flight flush so none lands after the drop.
+    """
+    global _buffer, _buffer_matches
+
+    with _flush_lock, _buffer_lock:
+        kept = [row for row in _buffer if not _is_stale(row, current_patch)]
+        dropped = len(_buffer) - len(kept)
+        if dropped:
+            _buffer = kept
+            _buffer_matches = _count_matches(_buffer)
+            logger.info("stale unit rows discarded", patch=current_patch, rows=dropped)
+        return dropped
+
+
+def close_unit_row_writer() -> None:
+    """Stops the background flusher and flushes what is left — called on worker shutdown."""
+    _flusher_stop.set()
+    try:
+        flush_unit_rows()
+    except Exception:
+        pass  # Already logged by flush_unit_rows
+    if _flush_stats["flushes"]:
+        logger.info("clickhouse flush stats", **get_flush_stats())
+
+
+def get_flush_stats() -> dict:
+    """
+    This process's flush metrics:
+        {"flushes": 12, "rows": 60120, "avg_rows": 5010.0, "max_rows": 5040,
+         "avg_latency_ms": 85.2, "max_latency_ms": 210.4, "buffered_rows": 380}
+    """
+    flushes = _flush_stats["flushes"]
+    return {
+        "flushes": flushes,
+        "rows": _flush_stats["rows"],
+        "avg_rows": round(_flush_stats["rows"] / flushes, 1) if flushes else 0.0,
+        "max_rows": _flush_stats["max_rows"],
+        "avg_latency_ms": round(_flush_stats["total_seconds"] * 1000 / flushes, 1) if flushes else 0.0,
+        "max_latency_ms": round(_flush_stats["max_seconds"] * 1000, 1),
+        "buffered_rows": len(_buffer),
+    }
+
+
+def _buffer_rows(data: list[list], matches: int) -> None:
+    global _buffer_matches, _buffer_started
+
+    _ensure_flusher()
+    with _buffer_lock:
+        _buffer.extend(data)
+        _buffer_matches += matches
+        if _buffer_started is None:
+            _buffer_started = time.monotonic()
+        due = len(_buffer) >= settings.CLICKHOUSE_BATCH_ROWS
+
+    # Never wait behind a flush in progress — it or the next one takes the rows
+    if due and _flush_lock.acquire(blocking=False):
+        try:
+            _flush()
+        except Exception:
+            # Rows stay buffered for the next flush — the match itself is saved
+            pass
+        finally:
+            _flush_lock.release()
+
+
+def _flush() -> int:
+    """Swaps the buffer out and inserts it outside _buffer_lock. Caller holds _flush_lock."""
+    global _buffer, _buffer_matches, _buffer_started
+
+    with _buffer_lock:
+        if not _buffer:
+            return 0
+        data, matches = _buffer, _buffer_matches
+        _buffer, _buffer_matches, _buffer_started = [], 0, None
+
+    current_patch = _current_patch()
+    if current_patch is not None:
+        fresh = [row for row in data if not _is_stale(row, current_patch)]
+        if len(fresh) < len(data):
+            logger.info("stale unit rows discarded", patch=current_patch, rows=len(data) - len(fresh))
+            data, matches = fresh, _count_matches(fresh)
+        if not data:
+            return 0
+
+    started = time.monotonic()
+    try:
+        _insert(data)
+    except Exception as e:
+        with _buffer_lock:
+            _requeue(data, matches)
+        logger.error("clickhouse flush failed", rows=len(data), matches=matches, error=str(e))
+        raise
+
+    elapsed = time.monotonic() - started
+    _record_flush(len(data), elapsed)
+    logger.info(
+        "unit rows flushed to clickhouse",
+        rows=len(data),
+        matches=matches,
+        latency_ms=round(elapsed * 1000, 1),
+    )
+    return len(data)
+
+
+def _flush_if_stale() -> None:
+    with _buffer_lock:
+        stale = (
+            _buffer_started is not None
+            and time.monotonic() - _buffer_started >= settings.CLICKHOUSE_FLUSH_SECONDS
+        )
+    if stale:
+        flush_unit_rows()
+
+
+def _ensure_flusher() -> None:
+    """Starts the time-based flusher once per process (again after a fork)."""
+    global _flusher_pid
+
+    if _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    _flusher_stop.clear()
+    threading.Thread(target=_run_flusher, name="clickhouse-flusher", daemon=True).start()
+
+
+def _run_flusher() -> None:
+    while not _flusher_stop.wait(min(1.0, settings.CLICKHOUSE_FLUSH_SECONDS)):
+        try:
+            _flush_if_stale()
+        except Exception:
+            pass  # Already logged by flush_unit_rows — retried on the next tick
+
+
+def _requeue(data: list[list], matches: int) -> None:
+    """Puts rows of a failed flush back in front of the buffer, bounded. Caller holds the lock."""
+    global _buffer, _buffer_matches, _buffer_started
+
+    _buffer = data + _buffer
+    _buffer_matches += matches
+    _buffer_started = time.monotonic()
+
+    limit = MAX_BUFFERED_BATCHES * settings.CLICKHOUSE_BATCH_ROWS
+    if len(_buffer) > limit:
+        dropped = len(_buffer) - limit
+        _buffer = _buffer[dropped:]
+        _buffer_matches = _count_matches(_buffer)
+        logger.error("clickhouse buffer full, oldest unit rows dropped", dropped_rows=dropped)
+
+
+def _current_patch() -> str | None:
+    # Imported here — patch_detector imports this module
+    from crawler.services.patch_detector import get_current_patch
+
+    try:
+        return get_current_patch()
+    except Exception as e:
+        # Without the current patch nothing is filtered — never block a flush on it
+        logger.warning("current patch unavailable for flush", error=str(e))
+        return None
+
+
+def _is_stale(row: list, current_patch: str) -> bool:
+    return patch_key(row[_GAME_VERSION_INDEX]) < patch_key(current_patch)
+
+
+def _count_matches(data: list[list]) -> int:
+    return len({row[_MATCH_ID_INDEX] for row in data})
+
+
+def _record_flush(rows: int, seconds: float) -> None:
+    _flush_stats["flushes"] += 1
+    _flush_stats["rows"] += rows
+    _flush_stats["max_rows"] = max(_flush_stats["max_rows"], rows)
+    _flush_stats["total_seconds"] += seconds
+    _flush_stats["max_seconds"] = max(_flush_stats["max_seconds"], seconds)
+
+
+def _insert(data: list[list], insert_settings: dict | None = None) -> None:
+    client = get_client()
+    try:
+        client.insert(
+            table="unit_stats",
+            data=data,
+            column_names=UNIT_COLUMN_NAMES,
+            settings=insert_settings,
+        )
     finally:
         client.close()
 
 
+def _to_row(row: UnitRowModel) -> list:
+    """Converts a Pydantic row to a list in UNIT_COLUMN_NAMES order for clickhouse-connect."""
+    return [
+        row.match_id,
+        row.game_datetime,
+        row.game_version,
+        row.tft_set_number,
+        row.queue_id,
+        row.puuid,
+        row.placement,
+        row.level,
+        row.last_round,
+        row.gold_left,
+        row.players_eliminated,
+        row.total_damage_to_players,
+        row.tier,
+        row.rank,
+        row.lp,
+        row.character_id,
+        row.unit_name,
+        row.unit_tier,
+        row.unit_rarity,
+        row.item_1,
+        row.item_2,
+        row.item_3,
+    ]
+
+
 # ---------------------------------------------------------------------------
 # Patch management
 # ---------------------------------------------------------------------------
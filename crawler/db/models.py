@@ -5,11 +5,13 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     Float,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
@@ -26,9 +28,13 @@ class LeagueEntry(Base):
     This is the source of LP and tier data used for ClickHouse analytics filtering.
     """
     __tablename__ = "league_entries"
+    __table_args__ = (
+        # Latest entry per player — serves the DISTINCT ON rank lookup
+        Index("ix_league_entries_puuid_fetched_at", "puuid", text("fetched_at DESC")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    puuid: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    puuid: Mapped[str] = mapped_column(String, nullable=False)
     tier: Mapped[str] = mapped_column(String, nullable=False)        # CHALLENGER, GRANDMASTER, MASTER, DIAMOND etc.
     rank: Mapped[str] = mapped_column(String, nullable=True)         # I, II, III, IV (null for Challenger/GM)
     league_points: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -57,6 +63,7 @@ class PlayerCrawl(Base):
     puuid: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)
     last_crawled_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     matches_found: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # how many new matches were found
+    games_per_hour: Mapped[float | None] = mapped_column(Float, nullable=True)  # smoothed game rate, sizes the next match list request
 
 
 class Match(Base):
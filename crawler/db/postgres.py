@@ -1,8 +1,15 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Generator
+from typing import Generator, Iterator
 
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session, sessionmaker
 
 from shared.config import settings
@@ -50,8 +57,28 @@ def get_session() -> Generator[Session, None, None]:
 
 # ---------------------------------------------------------------------------
 # League entries
+#
+# A cycle writes thousands of league entries, each with its raw JSON. They
+# are streamed into the table with COPY ... FROM STDIN instead of building
+# ORM objects that SQLAlchemy flushes as one INSERT per row.
 # ---------------------------------------------------------------------------
 
+# Column order of the COPY rows — fetched_at is left to its server default
+LEAGUE_ENTRY_COLUMNS = [
+    "puuid",
+    "tier",
+    "rank",
+    "league_points",
+    "wins",
+    "losses",
+    "veteran",
+    "inactive",
+    "fresh_blood",
+    "hot_streak",
+    "raw_response",
+]
+
+
 def save_league_entries(response: LeagueResponseModel) -> int:
     """
     Saves all player entries from a league response to league_entries table.
@@ -59,63 +86,282 @@ def save_league_entries(response: LeagueResponseModel) -> int:
 
     Returns the number of entries saved.
     """
-    # Import here to avoid circular imports with models
-    from crawler.db.models import LeagueEntry
-
-    rows = []
-    for entry in response.entries:
-        rows.append(LeagueEntry(
-            puuid=entry.puuid,
-            tier=response.tier,
-            rank=entry.rank,
-            league_points=entry.leaguePoints,
-            wins=entry.wins,
-            losses=entry.losses,
-            veteran=entry.veteran,
-            inactive=entry.inactive,
-            fresh_blood=entry.freshBlood,
-            hot_streak=entry.hotStreak,
-            raw_response=entry.model_dump(),
-        ))
-
-    with get_session() as session:
-        session.add_all(rows)
+    count = copy_league_entries(response.tier, [entry.model_dump() for entry in response.entries])
 
     logger.info(
         "league entries saved",
         tier=response.tier,
-        count=len(rows),
+        count=count,
     )
-    return len(rows)
+    return count
+
+
+def copy_league_entries(tier: str, entries: list[dict]) -> int:
+    """
+    Bulk loads raw league entries of one tier — the apex tier entries[] or a
+    lower tier page — with a single COPY. Missing fields get the defaults the
+    lower tier endpoint implies.
+
+    Returns the number of entries saved.
+    """
+    if not entries:
+        return 0
+
+    with get_session() as session:
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY league_entries ({', '.join(LEAGUE_ENTRY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                _league_entries_csv(tier, entries),
+            )
+        finally:
+            cursor.close()
+
+    return len(entries)
+
+
+def _league_entries_csv(tier: str, entries: list[dict]) -> io.StringIO:
+    """
+    Renders entries as CSV rows in LEAGUE_ENTRY_COLUMNS order. Strings are
+    quoted, so an empty string stays a string and only None loads as NULL.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for entry in entries:
+        writer.writerow([
+            entry.get("puuid", ""),
+            tier,
+            entry.get("rank", "I"),
+            entry.get("leaguePoints", 0),
+            entry.get("wins", 0),
+            entry.get("losses", 0),
+            bool(entry.get("veteran", False)),
+            bool(entry.get("inactive", False)),
+            bool(entry.get("freshBlood", False)),
+            bool(entry.get("hotStreak", False)),
+            json.dumps(entry),
+        ])
+    buffer.seek(0)
+    return buffer
 
 
 # ---------------------------------------------------------------------------
 # Player crawls
+#
+# Every match list task records its crawl. Writes are INSERT ... ON CONFLICT
+# upserts, and the match list stage buffers them per process through
+# record_player_crawl() so many players are written in one statement. A
+# crawl record lost with a crashed worker only widens that player's next
+# match list window — the fetched IDs are deduplicated either way.
 # ---------------------------------------------------------------------------
 
-def upsert_player_crawl(puuid: str, matches_found: int) -> None:
+PLAYER_CRAWL_BATCH_SIZE = 200
+PLAYER_CRAWL_FLUSH_SECONDS = 5
+
+# Per-process crawl records not yet written: {puuid: row}, latest crawl wins.
+# _crawl_lock guards the buffer and is never held across a network call;
+# _crawl_flush_lock lets one flush write at a time so an older record never
+# lands after a newer one.
+_pending_crawls: dict[str, dict] = {}
+_crawls_pending_since: float | None = None
+_crawl_lock = threading.Lock()
+_crawl_flush_lock = threading.Lock()
+
+# Background thread flushing records of a buffer that stopped growing
+_crawl_flusher_pid: int | None = None
+_crawl_flusher_stop = threading.Event()
+
+
+def upsert_player_crawl(
+    puuid: str,
+    matches_found: int,
+    games_per_hour: float | None = None,
+    crawled_at: datetime | None = None,
+) -> None:
     """
-    Updates or inserts a player crawl record.
+    Updates or inserts a player crawl record in one statement.
     Tracks when each player was last crawled and how many new matches were found.
+    games_per_hour is only overwritten when a new estimate is passed.
+    crawled_at defaults to now — pass the time the crawl started so games
+    played while it ran fall inside the next crawl's window.
+    """
+    upsert_player_crawls([_crawl_row(puuid, matches_found, games_per_hour, crawled_at)])
+    logger.info("player crawl updated", puuid=puuid, matches_found=matches_found)
+
+
+def upsert_player_crawls(crawls: list[dict]) -> int:
+    """
+    Upserts many crawl records in one INSERT ... ON CONFLICT (puuid) DO UPDATE.
+    Each record is {"puuid", "last_crawled_at", "matches_found", "games_per_hour"}
+    with the same semantics as upsert_player_crawl(). If a puuid appears more
+    than once, its last record wins.
+
+    Returns the number of players written.
     """
     from crawler.db.models import PlayerCrawl
 
+    rows = list({crawl["puuid"]: crawl for crawl in crawls}.values())
+    if not rows:
+        return 0
+
+    statement = insert(PlayerCrawl).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[PlayerCrawl.puuid],
+        set_={
+            "last_crawled_at": statement.excluded.last_crawled_at,
+            "matches_found": statement.excluded.matches_found,
+            "games_per_hour": func.coalesce(statement.excluded.games_per_hour, PlayerCrawl.games_per_hour),
+        },
+    )
+
     with get_session() as session:
-        existing = session.execute(
-            select(PlayerCrawl).where(PlayerCrawl.puuid == puuid)
-        ).scalar_one_or_none()
+        session.execute(statement)
 
-        if existing:
-            existing.last_crawled_at = datetime.utcnow()
-            existing.matches_found = matches_found
-        else:
-            session.add(PlayerCrawl(
-                puuid=puuid,
-                last_crawled_at=datetime.utcnow(),
-                matches_found=matches_found,
-            ))
+    return len(rows)
 
-    logger.info("player crawl updated", puuid=puuid, matches_found=matches_found)
+
+def record_player_crawl(
+    puuid: str,
+    matches_found: int,
+    games_per_hour: float | None = None,
+    crawled_at: datetime | None = None,
+) -> None:
+    """
+    Buffered upsert_player_crawl() for the match list stage. Records are
+    written PLAYER_CRAWL_BATCH_SIZE at a time, by a background thread once
+    the oldest has waited PLAYER_CRAWL_FLUSH_SECONDS, and on worker shutdown.
+    """
+    global _crawls_pending_since
+
+    _ensure_crawl_flusher()
+    with _crawl_lock:
+        _pending_crawls[puuid] = _crawl_row(puuid, matches_found, games_per_hour, crawled_at)
+        if _crawls_pending_since is None:
+            _crawls_pending_since = time.monotonic()
+        due = len(_pending_crawls) >= PLAYER_CRAWL_BATCH_SIZE
+    logger.info("player crawl recorded", puuid=puuid, matches_found=matches_found)
+
+    if due:
+        flush_player_crawls()
+
+
+def flush_player_crawls() -> None:
+    """Writes buffered crawl records in one statement — failures keep them for the next flush."""
+    global _crawls_pending_since
+
+    with _crawl_flush_lock:
+        with _crawl_lock:
+            crawls = list(_pending_crawls.values())
+            _crawls_pending_since = None
+        if not crawls:
+            return
+
+        try:
+            upsert_player_crawls(crawls)
+        except Exception as e:
+            # A missed write only widens the player's next window — never fail the crawl
+            logger.warning("failed to flush player crawls", count=len(crawls), error=str(e))
+            with _crawl_lock:
+                if _crawls_pending_since is None:
+                    _crawls_pending_since = time.monotonic()
+            return
+
+        with _crawl_lock:
+            for crawl in crawls:
+                # Keep records replaced by a newer crawl while flushing
+                if _pending_crawls.get(crawl["puuid"]) is crawl:
+                    del _pending_crawls[crawl["puuid"]]
+    logger.info("player crawls flushed", count=len(crawls))
+
+
+def close_player_crawl_writer() -> None:
+    """Stops the background flusher and flushes what is left — called on worker shutdown."""
+    _crawl_flusher_stop.set()
+    flush_player_crawls()
+
+
+def _ensure_crawl_flusher() -> None:
+    """Starts the time-based flusher once per process (again after a fork)."""
+    global _crawl_flusher_pid
+
+    if _crawl_flusher_pid == os.getpid():
+        return
+    _crawl_flusher_pid = os.getpid()
+    _crawl_flusher_stop.clear()
+    threading.Thread(target=_run_crawl_flusher, name="player-crawl-flusher", daemon=True).start()
+
+
+def _run_crawl_flusher() -> None:
+    while not _crawl_flusher_stop.wait(min(1.0, PLAYER_CRAWL_FLUSH_SECONDS)):
+        _flush_stale_crawls()
+
+
+def _flush_stale_crawls() -> None:
+    """Flushes the buffer once its oldest record has waited PLAYER_CRAWL_FLUSH_SECONDS."""
+    with _crawl_lock:
+        stale = (
+            _crawls_pending_since is not None
+            and time.monotonic() - _crawls_pending_since >= PLAYER_CRAWL_FLUSH_SECONDS
+        )
+    if stale:
+        flush_player_crawls()
+
+
+def get_player_crawl(puuid: str) -> dict | None:
+    """
+    Returns the player's last crawl as
+    {"last_crawled_at": datetime, "games_per_hour": float | None},
+    or None if the player was never crawled. Records still buffered in this
+    process are served from the buffer.
+    """
+    from crawler.db.models import PlayerCrawl
+
+    pending = _pending_crawls.get(puuid)
+    if pending is not None and pending["games_per_hour"] is not None:
+        return {"last_crawled_at": pending["last_crawled_at"], "games_per_hour": pending["games_per_hour"]}
+
+    with get_session() as session:
+        row = session.execute(
+            select(PlayerCrawl.last_crawled_at, PlayerCrawl.games_per_hour)
+            .where(PlayerCrawl.puuid == puuid)
+        ).one_or_none()
+
+    if row is None:
+        return None
+    return {"last_crawled_at": row.last_crawled_at, "games_per_hour": row.games_per_hour}
+
+
+def get_matches_found(puuids: list[str]) -> dict[str, int]:
+    """
+    Returns {puuid: matches found by the last crawl} for the given players.
+    Players never crawled are missing from the result.
+    """
+    from crawler.db.models import PlayerCrawl
+
+    if not puuids:
+        return {}
+
+    with get_session() as session:
+        rows = session.execute(
+            select(PlayerCrawl.puuid, PlayerCrawl.matches_found)
+            .where(PlayerCrawl.puuid.in_(puuids))
+        ).all()
+
+    return {row.puuid: row.matches_found for row in rows}
+
+
+def _crawl_row(
+    puuid: str,
+    matches_found: int,
+    games_per_hour: float | None,
+    crawled_at: datetime | None,
+) -> dict:
+    return {
+        "puuid": puuid,
+        "last_crawled_at": crawled_at or datetime.utcnow(),
+        "matches_found": matches_found,
+        "games_per_hour": games_per_hour,
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -124,38 +370,83 @@ def upsert_player_crawl(puuid: str, matches_found: int) -> None:
 
 def save_match(response: MatchResponseModel, raw_json: dict) -> bool:
     """
-    Saves a match to the matches table.
+    Saves a match to the matches table with INSERT ... ON CONFLICT DO NOTHING.
     Returns True if saved, False if match already exists (duplicate guard).
     """
+    match_id = response.metadata.match_id
+
+    if not save_matches([(response, raw_json)]):
+        logger.info("match already exists, skipping", match_id=match_id)
+        return False
+
+    logger.info("match saved", match_id=match_id)
+    return True
+
+
+def save_matches(matches: list[tuple[MatchResponseModel, dict]]) -> set[str]:
+    """
+    Saves a batch of (parsed match, raw JSON) pairs to the matches table in one
+    INSERT ... ON CONFLICT DO NOTHING statement.
+    Returns the match IDs actually inserted — matches already stored are skipped.
+    """
     from crawler.db.models import Match
 
-    match_id = response.metadata.match_id
+    if not matches:
+        return set()
+
+    rows = [
+        {
+            "match_id": response.metadata.match_id,
+            "game_datetime": datetime.utcfromtimestamp(response.info.game_datetime / 1000),
+            "game_length": response.info.game_length,
+            "game_version": response.info.game_version,
+            "tft_set_number": response.info.tft_set_number,
+            "queue_id": response.info.queue_id,
+            "raw_response": raw_json,
+        }
+        for response, raw_json in matches
+    ]
+
+    with get_session() as session:
+        saved = session.execute(
+            insert(Match)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Match.match_id])
+            .returning(Match.match_id)
+        ).scalars().all()
+
+    logger.info("matches saved", count=len(saved), skipped=len(rows) - len(saved))
+    return set(saved)
+
+
+def match_exists(match_id: str) -> bool:
+    """
+    Exact check for one match ID — confirms a Bloom filter positive in the
+    deduplication store. Served by the unique index on match_id.
+    """
+    from crawler.db.models import Match
 
     with get_session() as session:
-        existing = session.execute(
-            select(Match).where(Match.match_id == match_id)
+        found = session.execute(
+            select(Match.id).where(Match.match_id == match_id).limit(1)
         ).scalar_one_or_none()
 
-        if existing:
-            logger.info("match already exists, skipping", match_id=match_id)
-            return False
+    return found is not None
 
-        game_datetime = datetime.utcfromtimestamp(
-            response.info.game_datetime / 1000
-        )
 
-        session.add(Match(
-            match_id=match_id,
-            game_datetime=game_datetime,
-            game_length=response.info.game_length,
-            game_version=response.info.game_version,
-            tft_set_number=response.info.tft_set_number,
-            queue_id=response.info.queue_id,
-            raw_response=raw_json,
-        ))
+def get_existing_match_ids(match_ids: list[str]) -> set[str]:
+    """Returns the subset of match_ids already stored — one query for the whole list."""
+    from crawler.db.models import Match
 
-    logger.info("match saved", match_id=match_id)
-    return True
+    if not match_ids:
+        return set()
+
+    with get_session() as session:
+        rows = session.execute(
+            select(Match.match_id).where(Match.match_id.in_(match_ids))
+        ).scalars().all()
+
+    return set(rows)
 
 
 # ---------------------------------------------------------------------------
@@ -167,46 +458,59 @@ def get_player_ranks(puuids: list[str]) -> dict[str, dict]:
     Looks up the most recent league entry for each puuid.
     Returns a dict mapping puuid → {tier, rank, lp}.
 
-    Used by the save worker to denormalize rank data into ClickHouse rows
-    before inserting unit stats.
+    One DISTINCT ON (puuid) query for all puuids, served by the
+    (puuid, fetched_at DESC) index. The save worker reads ranks through
+    crawler/services/rank_cache.py, which only falls back to this for
+    players missing from the cache.
     """
     from crawler.db.models import LeagueEntry
 
-    result = {}
+    if not puuids:
+        return {}
 
     with get_session() as session:
-        for puuid in puuids:
-            entry = session.execute(
-                select(LeagueEntry)
-                .where(LeagueEntry.puuid == puuid)
-                .order_by(LeagueEntry.fetched_at.desc())
-                .limit(1)
-            ).scalar_one_or_none()
-
-            if entry:
-                result[puuid] = {
-                    "tier": entry.tier,
-                    "rank": entry.rank or "",
-                    "lp": entry.league_points,
-                }
+        rows = session.execute(
+            select(LeagueEntry.puuid, LeagueEntry.tier, LeagueEntry.rank, LeagueEntry.league_points)
+            .where(LeagueEntry.puuid.in_(puuids))
+            .distinct(LeagueEntry.puuid)
+            .order_by(LeagueEntry.puuid, LeagueEntry.fetched_at.desc())
+        ).all()
 
-    return result
+    return {
+        row.puuid: {"tier": row.tier, "rank": row.rank or "", "lp": row.league_points}
+        for row in rows
+    }
 
 
 # ---------------------------------------------------------------------------
 # Startup — pre-populate Redis dedup set from PostgreSQL
 # ---------------------------------------------------------------------------
 
-def get_all_match_ids() -> list[str]:
+def get_latest_game_version() -> str | None:
+    """Raw game_version of the most recently played stored match — None if there is none."""
+    from crawler.db.models import Match
+
+    with get_session() as session:
+        return session.execute(
+            select(Match.game_version).order_by(Match.game_datetime.desc()).limit(1)
+        ).scalar_one_or_none()
+
+
+def iter_match_ids(after_id: int = 0, chunk_size: int = 10_000) -> Iterator[list[tuple[int, str, str]]]:
     """
-    Returns all match IDs stored in PostgreSQL.
-    Called on crawler startup to pre-populate the Redis fetched_match_ids set,
-    ensuring deduplication survives restarts.
+    Streams (id, match_id, game_version) for every match with id > after_id, in id order,
+    as lists of at most chunk_size rows.
+    Uses a server-side cursor so memory stays flat however large the table is.
+    Called on crawler startup to pre-populate the Redis dedup store.
     """
     from crawler.db.models import Match
 
     with get_session() as session:
-        rows = session.execute(select(Match.match_id)).scalars().all()
-
-    logger.info("loaded match ids from postgres", count=len(rows))
-    return list(rows)
+        result = session.execute(
+            select(Match.id, Match.match_id, Match.game_version)
+            .where(Match.id > after_id)
+            .order_by(Match.id)
+            .execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        for partition in result.partitions():
+            yield [(row.id, row.match_id, row.game_version) for row in partition]
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 
 from shared.config import settings
 from shared.logging import get_logger, setup_logging
@@ -37,19 +38,94 @@ app.autodiscover_tasks([
 def on_startup(sender, **kwargs) -> None:
     """
     Runs once when the Celery worker starts up.
-    Pre-populates the Redis fetched_match_ids set from PostgreSQL.
+    Reports the API key pool and brings the Redis match ID dedup store up to
+    date with PostgreSQL — only IDs newer than the last preload are streamed,
+    by the process that wins the lock. Other processes wait for it before they
+    start consuming.
     """
+    try:
+        from crawler.services.key_pool import get_active_keys
+
+        logger.info("api key pool ready", keys=len(settings.api_keys), active=len(get_active_keys()))
+    except Exception as e:
+        logger.error("api key pool unavailable", error=str(e))
+
     logger.info("crawler starting up, preloading match ids from postgres")
 
     try:
-        from crawler.db.postgres import get_all_match_ids
-        from crawler.services.deduplication import preload_match_ids
+        from crawler.services.deduplication import get_memory_report, preload_from_postgres
 
-        match_ids = get_all_match_ids()
-        preload_match_ids(match_ids)
+        loaded = preload_from_postgres()
+        if loaded is not None:
+            logger.info("startup complete", preloaded_match_ids=loaded)
 
-        logger.info("startup complete", preloaded_match_ids=len(match_ids))
+        logger.info("dedup store memory", **get_memory_report())
     except Exception as e:
         logger.error("startup preload failed", error=str(e))
         # Do not raise — crawler should still start even if preload fails
         # Deduplication will still work via PostgreSQL fallback in save task
+
+
+# ---------------------------------------------------------------------------
+# Process start — subscribe to broadcast rate limit pauses
+# worker_process_init fires in each prefork child. worker_init fires in the
+# main process before any pool exists — it only starts the subscriber for the
+# solo/threads pools where requests run there, so a prefork parent never
+# forks its children with the subscriber thread alive.
+# ---------------------------------------------------------------------------
+
+# Pools whose tasks run in the worker's main process
+MAIN_PROCESS_POOLS = ("solo", "threads")
+
+
+@worker_process_init.connect
+def on_process_start(**kwargs) -> None:
+    """Keeps pause state in memory so requests skip the Redis pause check."""
+    from crawler.services.rate_limiter import start_pause_subscriber
+
+    start_pause_subscriber()
+
+
+@worker_init.connect
+def on_worker_start(sender=None, **kwargs) -> None:
+    """Starts the pause subscriber in the main process for the solo/threads pools."""
+    if runs_tasks_in_main_process(sender.pool_cls):
+        on_process_start()
+
+
+def runs_tasks_in_main_process(pool_cls) -> bool:
+    """pool_cls is a pool name or class — worker_init fires before Celery resolves it."""
+    from celery.concurrency import get_implementation
+
+    pool = get_implementation(pool_cls)
+    return any(pool is get_implementation(name) for name in MAIN_PROCESS_POOLS)
+
+
+# ---------------------------------------------------------------------------
+# Shutdown — flush key usage and crawl budget metrics, buffered player crawls
+# and ClickHouse rows, and close pooled Riot API connections
+# worker_process_shutdown fires in prefork children, worker_shutdown covers
+# the solo/threads pools where requests run in the main process
+# ---------------------------------------------------------------------------
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def on_shutdown(**kwargs) -> None:
+    """
+    Flushes buffered key usage, crawl budget, player crawls and ClickHouse
+    unit rows, stops the pause subscriber and closes the keep-alive Riot API
+    clients owned by this process.
+    """
+    from crawler.services.key_pool import flush_usage
+    from crawler.services.rate_limiter import stop_pause_subscriber
+    from crawler.services.riot_client import close_clients
+    from crawler.services.scheduler import flush_budget
+    from crawler.db.clickhouse import close_unit_row_writer
+    from crawler.db.postgres import close_player_crawl_writer
+
+    flush_usage()
+    flush_budget()
+    close_player_crawl_writer()
+    close_unit_row_writer()
+    stop_pause_subscriber()
+    close_clients()
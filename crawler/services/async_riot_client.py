@@ -0,0 +1,286 @@
+import asyncio
+import time
+from typing import Callable
+
+import httpx
+
+from shared.config import settings
+from shared.logging import get_logger
+from crawler.services.concurrency import (
+    ERROR as CONCURRENCY_ERROR,
+    async_acquire_slot,
+    cancel_slot,
+    classify_response,
+    release_slot,
+)
+from crawler.services.key_pool import get_active_keys
+from crawler.services.rate_limiter import (
+    LEAGUE_METHOD,
+    MATCH_DETAIL_METHOD,
+    RateLimitPaused,
+    async_acquire_permit,
+    async_check_and_wait,
+    set_pause_for_retry,
+)
+from crawler.services.riot_client import (
+    HTTP2_ENABLED,
+    POOL_LIMITS,
+    REQUEST_TIMEOUT_SECONDS,
+    InvalidKeyError,
+    NotFoundError,
+    RateLimitError,
+    _get_base_url,
+    _get_headers,
+    _get_route,
+    _handle_response,
+    _pause_for_exhausted_pool,
+    league_path,
+    match_path,
+)
+
+logger = get_logger(__name__)
+
+# How many times a single match is attempted inside a batch after 429s
+# Each attempt first waits out the shared pause set by the previous 429
+MAX_RATE_LIMIT_ATTEMPTS = 3
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+def _create_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Creates a pooled AsyncClient for one batch.
+    Async clients are bound to the event loop that created them, so unlike the
+    sync pool in riot_client a fresh client is opened per batch run.
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=HTTP2_ENABLED,
+        limits=POOL_LIMITS,
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+
+
+async def _make_request(
+    client: httpx.AsyncClient,
+    route: str,
+    path: str,
+    method: str,
+    defer: bool = False,
+) -> dict:
+    """
+    Async counterpart of riot_client._make_request().
+    Waits out any shared pause and takes a permit from a key in the pool, then
+    reuses the sync response handling so rate limit headers, 429, 403 and 404
+    behave identically. Every Redis call runs through asyncio.to_thread(), so
+    the event loop keeps serving the other requests in the batch meanwhile.
+    With defer=True long waits raise RateLimitPaused instead of sleeping.
+    """
+    url = f"{client.base_url}{path}"
+
+    await async_check_and_wait(method, route=route, defer=defer)
+
+    while True:
+        try:
+            response, key_id = await _send(client, route, path, method, defer)
+            return await asyncio.to_thread(_handle_response, url, response, method, route, key_id)
+
+        except InvalidKeyError as e:
+            if e.pool_exhausted:
+                raise
+        except httpx.TimeoutException:
+            logger.error("request timed out", url=url)
+            raise
+        except httpx.HTTPError as e:
+            logger.error("http error", url=url, error=str(e))
+            raise
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    route: str,
+    path: str,
+    method: str,
+    defer: bool = False,
+) -> tuple[httpx.Response, str]:
+    """
+    Async counterpart of riot_client._send() — one GET with a key from the
+    pool, inside a concurrency slot taken before the permit.
+    """
+    if not settings.CONCURRENCY_CONTROL_ENABLED:
+        api_key, key_id = await _acquire_key(method, route, defer)
+        return await client.get(path, headers=_get_headers(api_key)), key_id
+
+    token = await async_acquire_slot(route, defer=defer)
+    try:
+        api_key, key_id = await _acquire_key(method, route, defer)
+    except BaseException:
+        await asyncio.to_thread(cancel_slot, route, token)
+        raise
+
+    outcome = CONCURRENCY_ERROR
+    started = time.monotonic()
+    try:
+        response = await client.get(path, headers=_get_headers(api_key))
+        outcome = classify_response(
+            time.monotonic() - started, response.status_code, response.headers
+        )
+        return response, key_id
+    finally:
+        await asyncio.to_thread(release_slot, route, token, outcome)
+
+
+async def _acquire_key(method: str, route: str, defer: bool = False) -> tuple[str, str]:
+    """Async counterpart of riot_client._acquire_key()."""
+    keys = await asyncio.to_thread(get_active_keys)
+    if not keys:
+        await asyncio.to_thread(_pause_for_exhausted_pool)
+    key_id = await async_acquire_permit(method, route=route, key_ids=list(keys), defer=defer)
+    return keys[key_id], key_id
+
+
+# ---------------------------------------------------------------------------
+# Batch match fetch
+# ---------------------------------------------------------------------------
+
+async def fetch_matches(
+    match_ids: list[str],
+    on_result: Callable[[dict], None],
+    region: str | None = None,
+    concurrency: int | None = None,
+    defer: bool = False,
+) -> dict:
+    """
+    Fetches many matches concurrently inside one event loop.
+
+    At most `concurrency` requests are in flight at once, and every request
+    still honours the shared pause_until flag and permit budget, so the batch
+    stays within the same rate budget as the rest of the fleet.
+
+    on_result(raw_json) is called as soon as each match completes — in
+    completion order, not request order. It runs in a worker thread so it
+    may block (e.g. publish a task) without stalling the batch; calls can
+    overlap.
+
+    With defer=True the batch never sleeps through a long pause or exhausted
+    budget, and never retries a 429 in-process: the first such wait stops
+    it, and every match not fetched yet is returned as deferred, together
+    with the countdown the caller should re-queue them with.
+
+    Returns a dict of match IDs grouped by outcome, plus that countdown:
+        {"fetched": [...], "not_found": [...], "failed": [...],
+         "deferred": [...], "countdown": 0.0}
+    """
+    route = _get_route(region, regional=True)
+    semaphore = asyncio.Semaphore(concurrency or settings.MATCH_DETAIL_BATCH_CONCURRENCY)
+    outcome: dict = {"fetched": [], "not_found": [], "failed": [], "deferred": [], "countdown": 0.0}
+    key_invalid = asyncio.Event()
+    deferred = asyncio.Event()
+
+    def defer_rest(match_id: str, countdown: float) -> None:
+        deferred.set()
+        outcome["countdown"] = max(outcome["countdown"], countdown)
+        outcome["deferred"].append(match_id)
+
+    async def fetch_one(client: httpx.AsyncClient, match_id: str) -> None:
+        async with semaphore:
+            for _ in range(MAX_RATE_LIMIT_ATTEMPTS):
+                if key_invalid.is_set():
+                    break
+                if deferred.is_set():
+                    outcome["deferred"].append(match_id)
+                    return
+
+                try:
+                    raw_json = await _make_request(
+                        client, route, match_path(match_id), MATCH_DETAIL_METHOD, defer
+                    )
+                except RateLimitPaused as e:
+                    defer_rest(match_id, e.countdown)
+                    return
+                except RateLimitError as e:
+                    await asyncio.to_thread(
+                        set_pause_for_retry,
+                        e.retry_after,
+                        method=e.method,
+                        route=e.route,
+                        key_id=e.key_id,
+                    )
+                    if defer:
+                        defer_rest(match_id, e.retry_after)
+                        return
+                    continue
+                except NotFoundError:
+                    logger.warning("match not found, discarding", match_id=match_id)
+                    outcome["not_found"].append(match_id)
+                    return
+                except InvalidKeyError:
+                    # Every remaining request would fail too — stop the batch
+                    key_invalid.set()
+                    break
+                except Exception as e:
+                    logger.error("match detail fetch failed", match_id=match_id, error=str(e))
+                    break
+
+                outcome["fetched"].append(match_id)
+                await asyncio.to_thread(on_result, raw_json)
+                return
+
+            outcome["failed"].append(match_id)
+
+    async with _create_client(_get_base_url(route)) as client:
+        await asyncio.gather(*(fetch_one(client, match_id) for match_id in match_ids))
+
+    return outcome
+
+
+# ---------------------------------------------------------------------------
+# Concurrent league fetch
+# ---------------------------------------------------------------------------
+
+async def fetch_league_pages(
+    pages: list[tuple[str, str, int]],
+    region: str | None = None,
+    concurrency: int | None = None,
+) -> dict[tuple[str, str, int], dict | list | Exception]:
+    """
+    Fetches several league pages — (tier, division, page) — concurrently.
+    Requests share the league method budget with the rest of the fleet, so
+    concurrency only overlaps latency, it never exceeds Riot's limits.
+
+    Returns {(tier, division, page): response} — a page that could not be
+    fetched maps to the exception that stopped it (NotFoundError, a
+    RateLimitError after MAX_RATE_LIMIT_ATTEMPTS, ...), like
+    asyncio.gather(return_exceptions=True).
+    """
+    route = _get_route(region, regional=False)
+    semaphore = asyncio.Semaphore(concurrency or settings.LEAGUE_FETCH_CONCURRENCY)
+    results: dict[tuple[str, str, int], dict | list | Exception] = {}
+
+    async def fetch_one(client: httpx.AsyncClient, page: tuple[str, str, int]) -> None:
+        async with semaphore:
+            for _ in range(MAX_RATE_LIMIT_ATTEMPTS):
+                try:
+                    results[page] = await _make_request(
+                        client, route, league_path(*page), LEAGUE_METHOD
+                    )
+                    return
+                except RateLimitError as e:
+                    await asyncio.to_thread(
+                        set_pause_for_retry,
+                        e.retry_after,
+                        method=e.method,
+                        route=e.route,
+                        key_id=e.key_id,
+                    )
+                    results[page] = e
+                except Exception as e:
+                    results[page] = e
+                    return
+
+    async with _create_client(_get_base_url(route)) as client:
+        await asyncio.gather(*(fetch_one(client, page) for page in pages))
+
+    return results
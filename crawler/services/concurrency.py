@@ -0,0 +1,290 @@
+import asyncio
+import random
+import time
+import uuid
+
+import redis
+
+from shared.config import settings
+from shared.logging import get_logger
+from crawler.services.rate_limiter import DEFER_JITTER_SECONDS, RateLimitPaused, get_headroom
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Redis keys — one controller per routing value, shared by the whole fleet
+#   concurrency:{route}:limit          current in-flight limit (float, AIMD state)
+#   concurrency:{route}:inflight       zset of held slots, scored by expiry (ms)
+#   concurrency:{route}:last_decrease  ms timestamp of the last multiplicative decrease
+#   concurrency:{route}:errors         zset of recent 5xx / transport errors (ms)
+#   concurrency:{route}:circuit_until  ms timestamp the open circuit closes at
+# ---------------------------------------------------------------------------
+
+# Response outcomes fed back into the controller
+OK = "ok"
+SLOW = "slow"
+LIMITED = "limited"
+ERROR = "error"
+
+# Limit a route starts from before any feedback
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+
+# Multiplicative decrease — applied at most once per cooldown so one burst of
+# slow responses does not collapse the limit to the floor
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN_SECONDS = 5
+
+# Below this share of a rate limit window left, responses count as LIMITED
+MIN_HEADROOM = 0.1
+
+# A slot not released within this time (worker crashed) is reclaimed
+SLOT_TTL_SECONDS = 30
+
+# How often a waiting caller re-checks for a free slot
+SLOT_POLL_SECONDS = 0.05
+
+# Circuit breaker — this many errors inside the window opens the circuit
+CIRCUIT_ERROR_THRESHOLD = 5
+CIRCUIT_ERROR_WINDOW_SECONDS = 30
+CIRCUIT_OPEN_SECONDS = 30
+
+# ---------------------------------------------------------------------------
+# Lua scripts
+# ---------------------------------------------------------------------------
+
+# Takes a slot if fewer than floor(limit) are held. Returns 0 when granted,
+# otherwise milliseconds to wait (until the circuit closes, or one poll).
+# KEYS: inflight, limit, circuit_until
+# ARGV: now_ms, token, slot_ttl_ms, initial_limit, poll_ms
+ACQUIRE_SLOT_SCRIPT = """
+    local now = tonumber(ARGV[1])
+
+    local circuit_until = tonumber(redis.call('GET', KEYS[3]) or '0')
+    if circuit_until > now then
+        return circuit_until - now
+    end
+
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    local limit = math.floor(tonumber(redis.call('GET', KEYS[2]) or ARGV[4]))
+    if redis.call('ZCARD', KEYS[1]) < limit then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+        redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]))
+        return 0
+    end
+    return tonumber(ARGV[5])
+"""
+
+# Releases a slot and applies one response outcome to the limit.
+# Returns {new limit as a string (Lua numbers are truncated to integers),
+#          1 if this outcome opened the circuit else 0}.
+# KEYS: inflight, limit, last_decrease, errors, circuit_until
+# ARGV: now_ms, token, outcome, min, max, initial, decrease_factor,
+#       decrease_cooldown_ms, error_window_ms, error_threshold, circuit_open_ms
+RELEASE_SLOT_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local outcome = ARGV[3]
+    local min_limit = tonumber(ARGV[4])
+    local max_limit = tonumber(ARGV[5])
+
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[6])
+    local opened = 0
+
+    local function decrease()
+        local last = tonumber(redis.call('GET', KEYS[3]) or '0')
+        if now - last >= tonumber(ARGV[8]) then
+            limit = math.max(min_limit, limit * tonumber(ARGV[7]))
+            redis.call('SET', KEYS[3], now)
+        end
+    end
+
+    if outcome == 'ok' then
+        -- Additive increase: +1 per full limit's worth of good responses
+        limit = math.min(max_limit, limit + 1 / limit)
+    elseif outcome == 'error' then
+        redis.call('ZADD', KEYS[4], now, ARGV[2])
+        redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now - tonumber(ARGV[9]))
+        redis.call('PEXPIRE', KEYS[4], tonumber(ARGV[9]))
+        if redis.call('ZCARD', KEYS[4]) >= tonumber(ARGV[10]) then
+            redis.call('SET', KEYS[5], now + tonumber(ARGV[11]), 'PX', tonumber(ARGV[11]))
+            redis.call('DEL', KEYS[4])
+            limit = min_limit
+            opened = 1
+        else
+            decrease()
+        end
+    else
+        decrease()
+    end
+
+    redis.call('SET', KEYS[2], tostring(limit))
+    return {tostring(limit), opened}
+"""
+
+
+# ---------------------------------------------------------------------------
+# Slots
+# ---------------------------------------------------------------------------
+
+def try_acquire_slot(route: str) -> tuple[str | None, float]:
+    """
+    Tries to take one of the route's fleet-wide in-flight slots.
+    Returns (token, 0.0) when granted, otherwise (None, seconds to wait).
+    """
+    token = uuid.uuid4().hex
+    wait_ms = redis_client.eval(
+        ACQUIRE_SLOT_SCRIPT,
+        3,
+        _key(route, "inflight"),
+        _key(route, "limit"),
+        _key(route, "circuit_until"),
+        _now_ms(),
+        token,
+        SLOT_TTL_SECONDS * 1000,
+        INITIAL_LIMIT,
+        int(SLOT_POLL_SECONDS * 1000),
+    )
+    if int(wait_ms) > 0:
+        return None, int(wait_ms) / 1000
+    return token, 0.0
+
+
+def acquire_slot(route: str, defer: bool = False) -> str:
+    """
+    Blocks until an in-flight slot is free on the route and returns its token.
+    While the circuit is open this waits for it to close — with defer=True a
+    wait longer than RATE_LIMIT_MAX_INLINE_WAIT_SECONDS raises RateLimitPaused.
+    """
+    while True:
+        token, wait_seconds = try_acquire_slot(route)
+        if token:
+            return token
+        if defer:
+            _raise_if_deferred(route, wait_seconds)
+        time.sleep(wait_seconds)
+
+
+async def async_acquire_slot(route: str, defer: bool = False) -> str:
+    """
+    Async variant of acquire_slot() for the asyncio batch fetcher.
+    The Redis call runs in a thread so it never blocks the event loop.
+    """
+    while True:
+        token, wait_seconds = await asyncio.to_thread(try_acquire_slot, route)
+        if token:
+            return token
+        if defer:
+            _raise_if_deferred(route, wait_seconds)
+        await asyncio.sleep(wait_seconds)
+
+
+def _raise_if_deferred(route: str, wait_seconds: float) -> None:
+    """Raises RateLimitPaused when an open circuit is too long to sit out inside the worker."""
+    if wait_seconds <= settings.RATE_LIMIT_MAX_INLINE_WAIT_SECONDS:
+        return
+
+    # Jittered like the rate limit deferrals so tasks parked on an open
+    # circuit do not all come back in the same instant
+    countdown = wait_seconds + random.uniform(0, DEFER_JITTER_SECONDS)
+    logger.info(
+        "concurrency circuit open, deferring task",
+        route=route,
+        wait_seconds=round(wait_seconds, 2),
+        countdown=round(countdown, 2),
+    )
+    raise RateLimitPaused(countdown)
+
+
+def cancel_slot(route: str, token: str) -> None:
+    """Frees a slot whose request was never sent — the limit is left untouched."""
+    redis_client.zrem(_key(route, "inflight"), token)
+
+
+def release_slot(route: str, token: str, outcome: str) -> float:
+    """
+    Frees a slot and feeds the response outcome into the route's limit:
+
+    - OK       additive increase, up to CONCURRENCY_MAX
+    - SLOW / LIMITED  multiplicative decrease, at most once per cooldown
+    - ERROR    counted towards the circuit breaker — CIRCUIT_ERROR_THRESHOLD
+               errors inside the window open the circuit for
+               CIRCUIT_OPEN_SECONDS and drop the limit to the floor
+
+    Returns the new limit.
+    """
+    limit, opened = redis_client.eval(
+        RELEASE_SLOT_SCRIPT,
+        5,
+        _key(route, "inflight"),
+        _key(route, "limit"),
+        _key(route, "last_decrease"),
+        _key(route, "errors"),
+        _key(route, "circuit_until"),
+        _now_ms(),
+        token,
+        outcome,
+        MIN_LIMIT,
+        settings.CONCURRENCY_MAX,
+        INITIAL_LIMIT,
+        DECREASE_FACTOR,
+        DECREASE_COOLDOWN_SECONDS * 1000,
+        CIRCUIT_ERROR_WINDOW_SECONDS * 1000,
+        CIRCUIT_ERROR_THRESHOLD,
+        CIRCUIT_OPEN_SECONDS * 1000,
+    )
+    if opened:
+        logger.warning(
+            "sustained riot api errors, circuit open",
+            route=route,
+            open_seconds=CIRCUIT_OPEN_SECONDS,
+        )
+    return float(limit)
+
+
+def classify_response(latency_seconds: float, status_code: int, headers) -> str:
+    """
+    Maps one response to a controller outcome.
+    404 / 403 say nothing about Riot's health and count as OK.
+    """
+    if status_code == 429:
+        return LIMITED
+    if status_code >= 500:
+        return ERROR
+    if get_headroom(headers) < MIN_HEADROOM:
+        return LIMITED
+    if latency_seconds * 1000 > settings.CONCURRENCY_TARGET_LATENCY_MS:
+        return SLOW
+    return OK
+
+
+# ---------------------------------------------------------------------------
+# State
+# ---------------------------------------------------------------------------
+
+def get_concurrency_limit(route: str) -> float:
+    value = redis_client.get(_key(route, "limit"))
+    return float(value) if value else float(INITIAL_LIMIT)
+
+
+def is_circuit_open(route: str) -> bool:
+    circuit_until = redis_client.get(_key(route, "circuit_until"))
+    return bool(circuit_until) and float(circuit_until) > _now_ms()
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def _key(route: str, name: str) -> str:
+    return f"concurrency:{route}:{name}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
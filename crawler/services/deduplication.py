@@ -1,7 +1,14 @@
+import functools
+import hashlib
+import math
+import time
+import uuid
+
 import redis
 
 from shared.config import settings
 from shared.logging import get_logger
+from crawler.services.match_parser import parse_game_version, patch_key
 
 logger = get_logger(__name__)
 
@@ -25,14 +32,23 @@ CRAWLED_PUUIDS_TTL_SECONDS = settings.CRAWLER_COOLDOWN_MINUTES * 60
 
 # ---------------------------------------------------------------------------
 # Match ID deduplication
+# DEDUP_BACKEND selects the store — every function below works with either.
+# Lookups check every live patch shard, new IDs go to the current one.
 # ---------------------------------------------------------------------------
 
 def is_match_fetched(match_id: str) -> bool:
     """
     Checks if a match ID has already been fetched.
-    Uses Redis SISMEMBER — O(1) operation.
+    Uses Redis SISMEMBER — O(1) operation per live shard. With the Bloom
+    backend a positive is confirmed against in-flight claims and PostgreSQL.
     """
-    return bool(redis_client.sismember(FETCHED_MATCH_IDS_KEY, match_id))
+    if _use_bloom():
+        return _bloom_contains(match_id) and _is_known_exactly(match_id)
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for shard in get_live_shards():
+        pipeline.sismember(_set_key(shard), match_id)
+    return any(pipeline.execute())
 
 
 def mark_match_fetched(match_id: str) -> None:
@@ -40,7 +56,10 @@ def mark_match_fetched(match_id: str) -> None:
     Marks a match ID as fetched in the Redis set.
     Called after a match is successfully saved to PostgreSQL and ClickHouse.
     """
-    redis_client.sadd(FETCHED_MATCH_IDS_KEY, match_id)
+    if _use_bloom():
+        _bloom_add([match_id])
+        return
+    redis_client.sadd(_set_key(get_live_shards()[-1]), match_id)
 
 
 def check_and_mark_match(match_id: str) -> bool:
@@ -52,18 +71,10 @@ def check_and_mark_match(match_id: str) -> bool:
     Returns True if the match is new and was successfully claimed.
     Returns False if the match was already fetched by another worker.
     """
-    # Lua script: atomically check + add to set
-    # Returns 1 if added (new match), 0 if already existed
-    lua_script = """
-        if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 0 then
-            redis.call('SADD', KEYS[1], ARGV[1])
-            return 1
-        else
-            return 0
-        end
-    """
-    result = redis_client.eval(lua_script, 1, FETCHED_MATCH_IDS_KEY, match_id)
-    is_new = bool(result)
+    if _use_bloom():
+        is_new = _bloom_claim(match_id)
+    else:
+        is_new = bool(_claim_in_sets([match_id]))
 
     if not is_new:
         logger.info("match already claimed, skipping", match_id=match_id)
@@ -71,28 +82,562 @@ def check_and_mark_match(match_id: str) -> bool:
     return is_new
 
 
-def preload_match_ids(match_ids: list[str]) -> None:
+def claim_matches(match_ids: list[str]) -> list[str]:
+    """
+    Bulk version of check_and_mark_match() — claims every new ID in the list
+    in a single script call and returns only the newly claimed ones, in input
+    order. An ID repeated in the list is claimed once.
+    """
+    if not match_ids:
+        return []
+
+    if _use_bloom():
+        return _bloom_claim_many(match_ids)
+    return _claim_in_sets(match_ids)
+
+
+def _claim_in_sets(match_ids: list[str]) -> list[str]:
+    # Lua script: an ID is new only if no live shard holds it — it is then
+    # added to the current shard (the last key)
+    lua_script = """
+        local claimed = {}
+        for _, match_id in ipairs(ARGV) do
+            local seen = false
+            for i = 1, #KEYS - 1 do
+                if redis.call('SISMEMBER', KEYS[i], match_id) == 1 then
+                    seen = true
+                    break
+                end
+            end
+            if not seen and redis.call('SADD', KEYS[#KEYS], match_id) == 1 then
+                claimed[#claimed + 1] = match_id
+            end
+        end
+        return claimed
+    """
+    keys = [_set_key(shard) for shard in get_live_shards()]
+    return list(redis_client.eval(lua_script, len(keys), *keys, *match_ids))
+
+
+def preload_match_ids(match_ids: list[str], shard: str | None = None) -> None:
     """
     Bulk loads match IDs into the Redis deduplication set.
     Called on crawler startup to pre-populate from PostgreSQL,
     ensuring deduplication survives restarts.
 
-    Uses a pipeline for efficiency when loading large sets.
+    IDs go to the given patch shard, or the current one.
+    Sends one multi-member SADD per PRELOAD_CHUNK_SIZE IDs.
     """
     if not match_ids:
         return
 
+    if shard is None:
+        shard = get_live_shards()[-1]
+
+    if _use_bloom():
+        _bloom_add(match_ids, shard)
+    else:
+        for start in range(0, len(match_ids), PRELOAD_CHUNK_SIZE):
+            redis_client.sadd(_set_key(shard), *match_ids[start:start + PRELOAD_CHUNK_SIZE])
+
+    logger.info("match ids preloaded into redis", count=len(match_ids), backend=settings.DEDUP_BACKEND)
+
+
+def preload_from_postgres() -> int | None:
+    """
+    Streams match IDs from PostgreSQL into the dedup store in fixed-size chunks.
+
+    Only IDs newer than the store's high-water mark (the last matches.id loaded)
+    are read, so a warm Redis only catches up on what it missed. The mark is
+    advanced after every chunk — an interrupted preload resumes where it stopped.
+
+    Each ID goes to its patch's shard. Matches from patches without a live
+    shard (already dropped from ClickHouse) are skipped. Before any patch is
+    recorded the shard of the newest stored match is started first, so the
+    history never lands in the unsharded store that the first patch retires.
+
+    Only one process preloads at a time: the leader holds PRELOAD_LOCK_KEY.
+    Every other caller waits for the lock to be released and then catches up
+    itself — usually nothing is left — so no worker starts consuming against
+    a partly loaded store, and a leader that died is taken over. Returns the
+    number of IDs loaded, or None if the lock was still held after
+    PRELOAD_WAIT_SECONDS.
+    """
+    from crawler.db.postgres import get_latest_game_version, iter_match_ids
+
+    token = uuid.uuid4().hex
+    if not _acquire_preload_lock(token):
+        logger.warning("dedup preload still running elsewhere, starting anyway", waited=PRELOAD_WAIT_SECONDS)
+        return None
+
+    try:
+        if get_live_shards() == [""]:
+            latest = get_latest_game_version()
+            if latest:
+                start_shard(parse_game_version(latest))
+
+        high_water = get_preload_high_water()
+        live_shards = get_live_shards()
+        loaded = 0
+        for chunk in iter_match_ids(after_id=high_water, chunk_size=PRELOAD_CHUNK_SIZE):
+            by_shard: dict[str, list[str]] = {}
+            for _, match_id, game_version in chunk:
+                # No patch recorded yet — everything belongs to the unsharded store
+                shard = parse_game_version(game_version or "") if live_shards != [""] else ""
+                if shard in live_shards:
+                    by_shard.setdefault(shard, []).append(match_id)
+
+            for shard, match_ids in by_shard.items():
+                preload_match_ids(match_ids, shard)
+                loaded += len(match_ids)
+            high_water = chunk[-1][0]
+
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.set(_high_water_key(), high_water)
+            # Long preloads keep the lock for as long as they make progress
+            pipeline.expire(PRELOAD_LOCK_KEY, PRELOAD_LOCK_TTL_SECONDS)
+            pipeline.execute()
+
+        logger.info("dedup preload complete", loaded=loaded, high_water=high_water)
+        return loaded
+    finally:
+        redis_client.eval(RELEASE_LOCK_SCRIPT, 1, PRELOAD_LOCK_KEY, token)
+
+
+def _acquire_preload_lock(token: str) -> bool:
+    """Takes the preload lock, waiting up to PRELOAD_WAIT_SECONDS for a running leader."""
+    deadline = time.monotonic() + PRELOAD_WAIT_SECONDS
+    waiting = False
+    while not redis_client.set(PRELOAD_LOCK_KEY, token, nx=True, ex=PRELOAD_LOCK_TTL_SECONDS):
+        if time.monotonic() >= deadline:
+            return False
+        if not waiting:
+            logger.info("dedup preload running elsewhere, waiting", high_water=get_preload_high_water())
+            waiting = True
+        time.sleep(PRELOAD_POLL_SECONDS)
+    return True
+
+
+def get_preload_high_water() -> int:
+    """matches.id of the last row preloaded into the active store — 0 if never preloaded."""
+    return int(redis_client.get(_high_water_key()) or 0)
+
+
+def get_fetched_match_count() -> int:
+    """
+    Returns the total number of match IDs currently in the dedup set.
+    The Bloom backend counts IDs it added — an ID it wrongly reported as
+    present on insert is not counted.
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    for shard in get_live_shards():
+        if _use_bloom():
+            pipeline.hget(_bloom_keys(shard)[1], "items")
+        else:
+            pipeline.scard(_set_key(shard))
+    return sum(int(count or 0) for count in pipeline.execute())
+
+
+def get_memory_report() -> dict:
+    """
+    Compares the memory the active backend uses with what the other one
+    would need for the same number of match IDs:
+
+        {"backend": "bloom", "items": 2400000, "used_bytes": 4521984,
+         "set_bytes": 172800000, "bloom_bytes": 4521984, "bloom_filters": 2}
+
+    used_bytes comes from MEMORY USAGE where the server supports it, the
+    other figures are estimates.
+    """
+    items = get_fetched_match_count()
+    shards = get_live_shards()
+    filters = _bloom_filters()
+    active = sum(int(redis_client.hget(_bloom_keys(shard)[1], "filters") or 1) for shard in shards)
+
+    # Bloom memory is the bitmap up to the end of the filter that would hold items
+    needed, remaining = 1, items
+    for _, _, _, capacity in filters:
+        if remaining <= capacity:
+            break
+        remaining -= capacity
+        needed += 1
+    last_offset, last_bits, _, _ = filters[min(needed, len(filters)) - 1]
+    bloom_bytes = (last_offset + last_bits + 7) // 8
+
+    keys = [_bloom_keys(shard)[0] if _use_bloom() else _set_key(shard) for shard in shards]
+    try:
+        used_bytes = sum(redis_client.memory_usage(key, samples=0) or 0 for key in keys)
+    except redis.ResponseError:
+        used_bytes = bloom_bytes if _use_bloom() else items * SET_BYTES_PER_MEMBER
+
+    return {
+        "backend": settings.DEDUP_BACKEND,
+        "items": items,
+        "used_bytes": used_bytes,
+        "set_bytes": items * SET_BYTES_PER_MEMBER,
+        "bloom_bytes": bloom_bytes,
+        "bloom_filters": active if _use_bloom() else needed,
+        "shards": shards,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Patch shards
+#
+# Match IDs are stored per patch — dedup:fetched_match_ids:{patch}, or
+# dedup:bloom:bits:{patch} / dedup:bloom:meta:{patch} — so dedup state can be
+# dropped together with the ClickHouse partitions it protects. When
+# patch_detector moves to a new patch, every older shard is retired: it stays
+# readable for DEDUP_SHARD_GRACE_HOURS (match lists still return last patch's
+# games for a while) and then expires.
+#
+# Until the first patch is recorded IDs live in the unsharded keys ("" shard).
+# ---------------------------------------------------------------------------
+
+# Hash {shard: retire_at unix seconds, 0 for the current shard}
+SHARDS_KEY = "dedup:shards"
+
+# How long a worker trusts its in-process copy of the live shards (seconds)
+SHARDS_CACHE_SECONDS = 5
+
+# Per-process copy of the live shards: (expires_at, [shard, ..., current])
+_shards_cache: tuple[float, list[str]] | None = None
+
+
+def get_live_shards() -> list[str]:
+    """
+    Shards lookups have to check, oldest first — the current shard, which new
+    IDs are written to, is always last. Cached in-process for SHARDS_CACHE_SECONDS.
+    """
+    global _shards_cache
+
+    if _shards_cache and _shards_cache[0] > time.monotonic():
+        return _shards_cache[1]
+
+    now = time.time()
+    registry = {shard: float(retire_at) for shard, retire_at in redis_client.hgetall(SHARDS_KEY).items()}
+    current = next((shard for shard, retire_at in registry.items() if retire_at == 0), "")
+    retiring = sorted(
+        (shard for shard, retire_at in registry.items() if 0 < retire_at and retire_at > now),
+        key=lambda shard: registry[shard],
+    )
+    shards = retiring + [current]
+
+    _shards_cache = (time.monotonic() + SHARDS_CACHE_SECONDS, shards)
+    return shards
+
+
+def start_shard(patch: str) -> None:
+    """
+    Makes patch the current shard and retires every other one, including
+    the unsharded store. Called by patch_detector when a new patch is recorded.
+
+    Retiring the unsharded store also resets the preload high-water mark, so
+    the next preload moves the IDs it held into their patch shards before
+    the store expires.
+
+    A patch older than the current shard is ignored — retiring the newer
+    shard would forget the current patch's IDs and fetch its matches again.
+    """
+    global _shards_cache
+
+    now = time.time()
+    grace_seconds = int(settings.DEDUP_SHARD_GRACE_HOURS * 3600)
+    registry = redis_client.hgetall(SHARDS_KEY)
+    if not registry:
+        registry = {"": "0"}
+
+    current = next((shard for shard, retire_at in registry.items() if float(retire_at) == 0), "")
+    if current and patch_key(current) > patch_key(patch):
+        logger.warning("dedup shard older than current, ignored", patch=patch, current=current)
+        return
+
     pipeline = redis_client.pipeline()
-    for match_id in match_ids:
-        pipeline.sadd(FETCHED_MATCH_IDS_KEY, match_id)
+    for shard, retire_at in registry.items():
+        if shard == patch:
+            continue
+        if float(retire_at) == 0:
+            pipeline.hset(SHARDS_KEY, shard, now + grace_seconds)
+            for key in (_set_key(shard), *_bloom_keys(shard)):
+                pipeline.expire(key, grace_seconds)
+            if not shard:
+                pipeline.delete(_high_water_key())
+        elif float(retire_at) <= now:
+            pipeline.hdel(SHARDS_KEY, shard)
+    pipeline.hset(SHARDS_KEY, patch, 0)
+    for key in (_set_key(patch), *_bloom_keys(patch)):
+        pipeline.persist(key)
     pipeline.execute()
 
-    logger.info("match ids preloaded into redis", count=len(match_ids))
+    _shards_cache = None
+    logger.info("dedup shard started", patch=patch, grace_hours=settings.DEDUP_SHARD_GRACE_HOURS)
 
 
-def get_fetched_match_count() -> int:
-    """Returns the total number of match IDs currently in the dedup set."""
-    return redis_client.scard(FETCHED_MATCH_IDS_KEY)
+def _set_key(shard: str) -> str:
+    return f"{FETCHED_MATCH_IDS_KEY}:{shard}" if shard else FETCHED_MATCH_IDS_KEY
+
+
+def _bloom_keys(shard: str) -> tuple[str, str]:
+    if not shard:
+        return BLOOM_BITS_KEY, BLOOM_META_KEY
+    return f"{BLOOM_BITS_KEY}:{shard}", f"{BLOOM_META_KEY}:{shard}"
+
+
+# ---------------------------------------------------------------------------
+# Startup preload
+# ---------------------------------------------------------------------------
+
+# dedup:preload:{backend}:high_water — per backend, so switching stores reloads
+PRELOAD_HIGH_WATER_KEY_PREFIX = "dedup:preload"
+PRELOAD_LOCK_KEY = "dedup:preload:lock"
+
+# A leader that stops making progress for this long loses the lock
+PRELOAD_LOCK_TTL_SECONDS = 120
+
+# Other workers wait this long for the leader before they start consuming,
+# checking the lock every PRELOAD_POLL_SECONDS
+PRELOAD_WAIT_SECONDS = 600
+PRELOAD_POLL_SECONDS = 1
+
+# Rows per Postgres fetch and IDs per Redis round trip
+PRELOAD_CHUNK_SIZE = 10_000
+
+# Deletes the lock only if this caller still holds it
+RELEASE_LOCK_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+"""
+
+
+def _high_water_key() -> str:
+    return f"{PRELOAD_HIGH_WATER_KEY_PREFIX}:{settings.DEDUP_BACKEND}:high_water"
+
+
+# ---------------------------------------------------------------------------
+# Bloom filter backend
+#
+# A scalable Bloom filter (Almeida et al.): a series of filters, each twice
+# the capacity of the previous one with half its error rate, so the combined
+# false positive rate stays under DEDUP_BLOOM_ERROR_RATE however far it grows.
+# All filters live back to back in one Redis bitmap — a filter's bits are only
+# allocated once it becomes active.
+#
+# A Bloom filter never misses an ID it holds, but may report an ID it does not
+# hold. Those positives are confirmed exactly: first against the claim marker
+# of matches still in flight, then against the PostgreSQL matches table.
+# ---------------------------------------------------------------------------
+
+BLOOM_BITS_KEY = "dedup:bloom:bits"
+# Hash {filters: active filter count, items: IDs added, count:{n}: IDs in filter n}
+BLOOM_META_KEY = "dedup:bloom:meta"
+# dedup:bloom:claim:{match_id} — set when a match is claimed, until it is saved
+BLOOM_CLAIM_KEY_PREFIX = "dedup:bloom:claim"
+
+# Claim markers outlive task retries and deferrals; a match that was never
+# saved can be claimed again once its marker expires
+BLOOM_CLAIM_TTL_SECONDS = 6 * 60 * 60
+
+BLOOM_GROWTH = 2
+BLOOM_TIGHTENING = 0.5
+
+# Redis bitmaps are limited to 2^32 bits (512 MB)
+BLOOM_MAX_BITS = 2 ** 32
+
+# Approximate cost of one ~15 byte match ID in a large Redis set — dict entry,
+# bucket and sds string after jemalloc rounding
+SET_BYTES_PER_MEMBER = 72
+
+# Checks every active filter of every shard for the ID. With ARGV[1] = 1 an ID
+# none of them holds is added to the newest filter of the last (current) shard,
+# activating its next filter when that one is full.
+# Returns 1 if the ID was added, 0 if it was (probably) present.
+# KEYS: claim marker (only written on add), then bits, meta per shard
+# ARGV: add, h1, h2, claim_ttl_seconds, then (offset, bits, hashes, capacity) per filter
+BLOOM_SCRIPT = """
+    local add = ARGV[1] == '1'
+    local h1 = tonumber(ARGV[2])
+    local h2 = tonumber(ARGV[3])
+    local n_filters = (#ARGV - 4) / 4
+    local n_shards = (#KEYS - 1) / 2
+
+    local function positions(filter)
+        local base = 5 + (filter - 1) * 4
+        local offset = tonumber(ARGV[base])
+        local bits = tonumber(ARGV[base + 1])
+        local result = {}
+        for i = 0, tonumber(ARGV[base + 2]) - 1 do
+            result[#result + 1] = offset + (h1 + i * h2) % bits
+        end
+        return result
+    end
+
+    for shard = 1, n_shards do
+        local bits_key = KEYS[shard * 2]
+        local active = tonumber(redis.call('HGET', KEYS[shard * 2 + 1], 'filters') or '1')
+        for filter = 1, active do
+            local present = true
+            for _, position in ipairs(positions(filter)) do
+                if redis.call('GETBIT', bits_key, position) == 0 then
+                    present = false
+                    break
+                end
+            end
+            if present then
+                return 0
+            end
+        end
+    end
+
+    if not add then
+        return 1
+    end
+
+    local bits_key = KEYS[n_shards * 2]
+    local meta_key = KEYS[n_shards * 2 + 1]
+    local active = tonumber(redis.call('HGET', meta_key, 'filters') or '1')
+    local capacity = tonumber(ARGV[5 + (active - 1) * 4 + 3])
+    local count = tonumber(redis.call('HGET', meta_key, 'count:' .. active) or '0')
+    if count >= capacity and active < n_filters then
+        active = active + 1
+        redis.call('HSET', meta_key, 'filters', active)
+    end
+
+    for _, position in ipairs(positions(active)) do
+        redis.call('SETBIT', bits_key, position, 1)
+    end
+    redis.call('HINCRBY', meta_key, 'count:' .. active, 1)
+    redis.call('HINCRBY', meta_key, 'items', 1)
+    if KEYS[1] ~= '' then
+        redis.call('SET', KEYS[1], 1, 'EX', tonumber(ARGV[4]))
+    end
+    return 1
+"""
+
+# Registered once so calls — and pipelined bulk loads — send EVALSHA, not the script
+_bloom_script = redis_client.register_script(BLOOM_SCRIPT)
+
+
+def _use_bloom() -> bool:
+    return settings.DEDUP_BACKEND == "bloom"
+
+
+def _bloom_claim(match_id: str) -> bool:
+    if _run_bloom_script(redis_client, match_id, add=True, claim=True):
+        return True
+
+    # Probably seen — only a false positive if nobody holds a claim on it and
+    # it was never saved. The claim marker is taken with NX so exactly one
+    # worker wins the fallback too.
+    if _is_known_exactly(match_id):
+        return False
+    return bool(redis_client.set(_claim_key(match_id), 1, nx=True, ex=BLOOM_CLAIM_TTL_SECONDS))
+
+
+def _bloom_claim_many(match_ids: list[str]) -> list[str]:
+    pipeline = redis_client.pipeline(transaction=False)
+    for match_id in match_ids:
+        _run_bloom_script(pipeline, match_id, add=True, claim=True)
+    results = pipeline.execute()
+
+    claimed = {match_id for match_id, added in zip(match_ids, results) if added}
+    maybe_seen = list(dict.fromkeys(
+        match_id for match_id, added in zip(match_ids, results) if not added
+    ))
+    if maybe_seen:
+        claimed.update(_claim_false_positives(maybe_seen))
+
+    return [match_id for match_id in dict.fromkeys(match_ids) if match_id in claimed]
+
+
+def _claim_false_positives(match_ids: list[str]) -> set[str]:
+    """Same exact check as _bloom_claim(), batched — one Redis and one Postgres round trip each."""
+    from crawler.db.postgres import get_existing_match_ids
+
+    in_flight = redis_client.mget([_claim_key(match_id) for match_id in match_ids])
+    candidates = [match_id for match_id, marker in zip(match_ids, in_flight) if not marker]
+    if not candidates:
+        return set()
+
+    saved = get_existing_match_ids(candidates)
+    candidates = [match_id for match_id in candidates if match_id not in saved]
+    if not candidates:
+        return set()
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for match_id in candidates:
+        pipeline.set(_claim_key(match_id), 1, nx=True, ex=BLOOM_CLAIM_TTL_SECONDS)
+    return {match_id for match_id, won in zip(candidates, pipeline.execute()) if won}
+
+
+def _bloom_contains(match_id: str) -> bool:
+    return not _run_bloom_script(redis_client, match_id, add=False, claim=False)
+
+
+def _bloom_add(match_ids: list[str], shard: str | None = None) -> None:
+    # Loading into one shard only checks that shard — a preload must not skip
+    # an ID because an older shard already holds it
+    shards = [shard] if shard is not None else None
+    for start in range(0, len(match_ids), PRELOAD_CHUNK_SIZE):
+        pipeline = redis_client.pipeline(transaction=False)
+        for match_id in match_ids[start:start + PRELOAD_CHUNK_SIZE]:
+            _run_bloom_script(pipeline, match_id, add=True, claim=False, shards=shards)
+        pipeline.execute()
+
+
+def _is_known_exactly(match_id: str) -> bool:
+    """Exact membership for a Bloom positive — claimed and in flight, or saved."""
+    from crawler.db.postgres import match_exists
+
+    if redis_client.exists(_claim_key(match_id)):
+        return True
+    return match_exists(match_id)
+
+
+def _run_bloom_script(client, match_id: str, add: bool, claim: bool, shards: list[str] | None = None):
+    h1, h2 = _bloom_hashes(match_id)
+    args = [int(add), h1, h2, BLOOM_CLAIM_TTL_SECONDS]
+    for params in _bloom_filters():
+        args.extend(params)
+
+    keys = [_claim_key(match_id) if claim else ""]
+    for shard in shards if shards is not None else get_live_shards():
+        keys.extend(_bloom_keys(shard))
+    return _bloom_script(keys=keys, args=args, client=client)
+
+
+def _bloom_hashes(match_id: str) -> tuple[int, int]:
+    """
+    Two independent 32-bit hashes — bit i of a filter is h1 + i * h2 (double
+    hashing). Kept to 32 bits so Lua's double arithmetic stays exact.
+    """
+    digest = hashlib.blake2b(match_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "big"), int.from_bytes(digest[4:], "big") | 1
+
+
+@functools.lru_cache(maxsize=4)
+def _bloom_layout(capacity: int, error_rate: float) -> tuple[tuple[int, int, int, int], ...]:
+    filters, offset = [], 0
+    for n in range(32):
+        filter_capacity = capacity * BLOOM_GROWTH ** n
+        filter_error_rate = error_rate * BLOOM_TIGHTENING ** (n + 1)
+        bits = math.ceil(-filter_capacity * math.log(filter_error_rate) / math.log(2) ** 2)
+        if offset + bits > BLOOM_MAX_BITS:
+            break
+        hashes = max(1, round(bits / filter_capacity * math.log(2)))
+        filters.append((offset, bits, hashes, filter_capacity))
+        offset += bits
+    return tuple(filters)
+
+
+def _bloom_filters() -> tuple[tuple[int, int, int, int], ...]:
+    """(bit offset, bits, hash count, capacity) of every filter the store can grow to."""
+    return _bloom_layout(settings.DEDUP_BLOOM_CAPACITY, settings.DEDUP_BLOOM_ERROR_RATE)
+
+
+def _claim_key(match_id: str) -> str:
+    return f"{BLOOM_CLAIM_KEY_PREFIX}:{match_id}"
 
 
 # ---------------------------------------------------------------------------
@@ -121,6 +666,31 @@ def mark_puuid_crawled(puuid: str) -> None:
     pipeline.execute()
 
 
+def filter_uncrawled_puuids(puuids: list[str]) -> list[str]:
+    """
+    Bulk counterpart of is_puuid_crawled_this_cycle() — returns the puuids
+    not crawled in the current cycle, in order, with one SMISMEMBER call.
+    """
+    if not puuids:
+        return []
+    crawled = redis_client.smismember(CRAWLED_PUUIDS_CYCLE_KEY, puuids)
+    return [puuid for puuid, is_crawled in zip(puuids, crawled) if not is_crawled]
+
+
+def mark_puuids_crawled(puuids: list[str]) -> None:
+    """
+    Bulk counterpart of mark_puuid_crawled() — one pipelined round trip with
+    a multi-member SADD per PRELOAD_CHUNK_SIZE puuids.
+    """
+    if not puuids:
+        return
+    pipeline = redis_client.pipeline()
+    for i in range(0, len(puuids), PRELOAD_CHUNK_SIZE):
+        pipeline.sadd(CRAWLED_PUUIDS_CYCLE_KEY, *puuids[i:i + PRELOAD_CHUNK_SIZE])
+    pipeline.expire(CRAWLED_PUUIDS_CYCLE_KEY, CRAWLED_PUUIDS_TTL_SECONDS)
+    pipeline.execute()
+
+
 def get_crawled_puuid_count() -> int:
     """Returns the number of puuids crawled in the current cycle."""
     return redis_client.scard(CRAWLED_PUUIDS_CYCLE_KEY)
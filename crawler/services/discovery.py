@@ -0,0 +1,152 @@
+import redis
+
+from shared.config import settings
+from shared.logging import get_logger
+from crawler.services.deduplication import CRAWLED_PUUIDS_CYCLE_KEY, CRAWLED_PUUIDS_TTL_SECONDS
+from crawler.services.riot_client import PLATFORM_REGIONS
+from crawler.services.scheduler import TIER_WEIGHTS, priority_for, score_player
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Snowball discovery
+#
+# Every saved match lists its eight participants. With DISCOVERY_ENABLED the
+# save stage hands them to discover_players(), which queues a match list
+# crawl for those not crawled this cycle yet — they are demonstrably playing
+# right now, and finding them costs no league endpoint budget.
+#
+# Ranks come from the league entries already in PostgreSQL, so only players
+# the league seeder has seen at some point can qualify. That is what bounds
+# discovery to DISCOVERY_MIN_TIER / DISCOVERY_MIN_LP; unranked participants
+# are never queued.
+# ---------------------------------------------------------------------------
+
+# discovery:count:{region} — players discovered in the region this cycle
+DISCOVERY_COUNT_KEY_PREFIX = "discovery:count"
+
+# {platform prefix of a match ID: region}, e.g. "EUN1" → "europe"
+MATCH_ID_REGIONS = {platform.upper(): region for platform, region in PLATFORM_REGIONS.items()}
+
+# Claims players for this cycle until the region's cap is reached.
+# Claiming adds them to the per-cycle puuid set, so neither the league seeder
+# nor another save worker queues them again. The set's TTL is only set when
+# it has none (EXPIRE NX) — save workers claim continuously, and refreshing
+# it would keep the seeder's cycle window from ever expiring.
+# Returns the claimed puuids.
+# KEYS: crawled puuids set, discovery count
+# ARGV: cap, ttl_seconds, puuid...
+CLAIM_DISCOVERED_SCRIPT = """
+    local count = tonumber(redis.call('GET', KEYS[2]) or '0')
+    local cap = tonumber(ARGV[1])
+    local claimed = {}
+
+    for i = 3, #ARGV do
+        if count >= cap then
+            break
+        end
+        if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+            count = count + 1
+            table.insert(claimed, ARGV[i])
+        end
+    end
+
+    if #claimed > 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[2], 'NX')
+        redis.call('SET', KEYS[2], count)
+        redis.call('EXPIRE', KEYS[2], ARGV[2], 'NX')
+    end
+    return claimed
+"""
+
+_claim_discovered_script = redis_client.register_script(CLAIM_DISCOVERED_SCRIPT)
+
+
+def discover_players(
+    match_id: str,
+    puuids: list[str],
+    player_ranks: dict[str, dict],
+) -> list[dict]:
+    """
+    Picks the participants of a saved match worth crawling next.
+
+    player_ranks is {puuid: {"tier", "rank", "lp"}} from get_player_ranks().
+    Participants below DISCOVERY_MIN_TIER / DISCOVERY_MIN_LP, without a known
+    rank, or already crawled this cycle are skipped, and at most
+    DISCOVERY_MAX_PER_CYCLE players are discovered per region and cycle.
+
+    Returns [{"puuid", "region", "tier", "priority"}, ...], best first, for
+    the caller to queue fetch_match_list with. Empty unless DISCOVERY_ENABLED.
+    """
+    if not settings.DISCOVERY_ENABLED:
+        return []
+
+    region = region_for_match(match_id)
+    if region is None or region not in settings.crawl_regions:
+        return []
+
+    scores = {
+        puuid: score_player(player_ranks[puuid]["tier"], player_ranks[puuid]["lp"])
+        for puuid in puuids
+        if _qualifies(player_ranks.get(puuid))
+    }
+    if not scores:
+        return []
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    claimed = _claim_discovered_script(
+        keys=[CRAWLED_PUUIDS_CYCLE_KEY, _count_key(region)],
+        args=[settings.DISCOVERY_MAX_PER_CYCLE, CRAWLED_PUUIDS_TTL_SECONDS, *ranked],
+    )
+
+    if claimed:
+        logger.info("players discovered", match_id=match_id, region=region, count=len(claimed))
+
+    return [
+        {
+            "puuid": puuid,
+            "region": region,
+            "tier": player_ranks[puuid]["tier"],
+            "priority": priority_for(scores[puuid]),
+        }
+        for puuid in claimed
+    ]
+
+
+def pop_discovered_count(region: str | None) -> int:
+    """
+    Returns how many players were discovered in the region since the last
+    call and starts a new cycle's cap — called by the league task.
+    """
+    region = (region or settings.RIOT_REGION).lower()
+    return int(redis_client.getdel(_count_key(region)) or 0)
+
+
+def region_for_match(match_id: str) -> str | None:
+    """Crawl region of a match ID from its platform prefix ("EUW1_123" → "europe")."""
+    platform, _, _ = match_id.partition("_")
+    return MATCH_ID_REGIONS.get(platform.upper())
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def _qualifies(rank: dict | None) -> bool:
+    if rank is None:
+        return False
+    min_weight = TIER_WEIGHTS.get(settings.DISCOVERY_MIN_TIER.upper(), 0)
+    return (
+        TIER_WEIGHTS.get((rank["tier"] or "").upper(), 0) >= min_weight
+        and (rank["lp"] or 0) >= settings.DISCOVERY_MIN_LP
+    )
+
+
+def _count_key(region: str) -> str:
+    return f"{DISCOVERY_COUNT_KEY_PREFIX}:{region}"
@@ -0,0 +1,210 @@
+import hashlib
+import threading
+import time
+
+import redis
+
+from shared.config import settings
+from shared.logging import get_logger
+from crawler.services.rate_limiter import app_scope, get_scope_usage
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Redis keys
+# Keys are never written to Redis or logs — only their key_id (a short hash)
+# ---------------------------------------------------------------------------
+
+# Sorted set of key_ids that returned 403 and were taken out of the pool,
+# scored by the time they return to it (DISABLED_KEY_TTL_HOURS later)
+DISABLED_KEYS_KEY = "key_pool:disabled_until"
+
+# Per-key usage counters: key_pool:usage:{key_id} hash {requests, rate_limited, forbidden}
+USAGE_KEY_PREFIX = "key_pool:usage"
+
+# How long a worker trusts its in-process copy of the disabled set (seconds)
+ACTIVE_KEYS_CACHE_SECONDS = 5
+
+# Usage counters are buffered in-process and flushed at most this often (seconds)
+USAGE_FLUSH_SECONDS = 10
+
+# Per-process copy of the disabled set: (expires_at, {key_id, ...})
+_disabled_cache: tuple[float, set[str]] | None = None
+
+# Per-process usage not yet flushed: {key_id: {counter: increment}}
+_pending_usage: dict[str, dict[str, int]] = {}
+_last_flush = time.monotonic()
+# The asyncio batch fetcher records responses from worker threads
+_usage_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Pool membership
+# ---------------------------------------------------------------------------
+
+def key_id(api_key: str) -> str:
+    """Stable, non-secret identifier for an API key — used in Redis keys and logs."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def get_active_keys() -> dict[str, str]:
+    """
+    Returns {key_id: api_key} for every configured key that has not been disabled.
+    The disabled set is cached in-process for ACTIVE_KEYS_CACHE_SECONDS so this
+    does not cost a Redis round trip per request.
+    """
+    disabled = _get_disabled_key_ids()
+    return {
+        key_id(api_key): api_key
+        for api_key in settings.api_keys
+        if key_id(api_key) not in disabled
+    }
+
+
+def disable_key(key_id: str) -> int:
+    """
+    Takes a key out of the pool for every worker after Riot returned 403 for it.
+    The key returns to the pool after DISABLED_KEY_TTL_HOURS — restarting the
+    crawler does not re-enable it. Returns how many keys are still active.
+    """
+    global _disabled_cache
+
+    now = time.time()
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.zadd(DISABLED_KEYS_KEY, {key_id: now + settings.DISABLED_KEY_TTL_HOURS * 3600})
+    # Forget keys whose disable period is over
+    pipeline.zremrangebyscore(DISABLED_KEYS_KEY, "-inf", now)
+    pipeline.execute()
+    _disabled_cache = None
+
+    remaining = len(get_active_keys())
+    logger.error(
+        "riot api key invalid or expired — removed from key pool",
+        key_id=key_id,
+        remaining_keys=remaining,
+    )
+    return remaining
+
+
+def reset_disabled_keys() -> None:
+    """
+    Puts every configured key back into the pool before their disable period
+    is over. An admin action, never run automatically — e.g. after fixing a
+    key that Riot rejected by mistake:
+
+        python -c "from crawler.services.key_pool import reset_disabled_keys; reset_disabled_keys()"
+    """
+    global _disabled_cache
+
+    redis_client.delete(DISABLED_KEYS_KEY)
+    _disabled_cache = None
+
+
+def _get_disabled_key_ids() -> set[str]:
+    global _disabled_cache
+
+    if _disabled_cache and _disabled_cache[0] > time.monotonic():
+        return _disabled_cache[1]
+
+    disabled = set(redis_client.zrangebyscore(DISABLED_KEYS_KEY, time.time(), "+inf"))
+    _disabled_cache = (time.monotonic() + ACTIVE_KEYS_CACHE_SECONDS, disabled)
+    return disabled
+
+
+# ---------------------------------------------------------------------------
+# Usage metrics
+# ---------------------------------------------------------------------------
+
+def record_response(key_id: str, status_code: int) -> None:
+    """
+    Counts one response against the key that sent it.
+    Called by riot_client._handle_response() after every API response.
+    """
+    with _usage_lock:
+        usage = _pending_usage.setdefault(key_id, {})
+        usage["requests"] = usage.get("requests", 0) + 1
+        if status_code == 429:
+            usage["rate_limited"] = usage.get("rate_limited", 0) + 1
+        elif status_code == 403:
+            usage["forbidden"] = usage.get("forbidden", 0) + 1
+
+    if time.monotonic() - _last_flush >= USAGE_FLUSH_SECONDS:
+        flush_usage()
+
+
+def flush_usage() -> None:
+    """Writes buffered usage counters to Redis in one round trip."""
+    global _last_flush
+
+    _last_flush = time.monotonic()
+    with _usage_lock:
+        pending = dict(_pending_usage)
+        _pending_usage.clear()
+    if not pending:
+        return
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for key_id, usage in pending.items():
+        for counter, increment in usage.items():
+            pipeline.hincrby(_usage_key(key_id), counter, increment)
+
+    try:
+        pipeline.execute()
+    except Exception as e:
+        # Metrics must never break a request — keep the counts for the next flush
+        logger.warning("failed to flush key usage", error=str(e))
+        with _usage_lock:
+            for key_id, usage in pending.items():
+                merged = _pending_usage.setdefault(key_id, {})
+                for counter, increment in usage.items():
+                    merged[counter] = merged.get(counter, 0) + increment
+
+
+def get_key_stats(route: str) -> list[dict]:
+    """
+    Returns one dict per configured key with its lifetime counters and how much
+    of each app rate limit window on the route it is currently using:
+
+        {"key_id": "...", "active": True, "requests": 1200, "rate_limited": 2,
+         "forbidden": 0, "utilisation": {10: 0.85, 600: 0.41}}
+    """
+    flush_usage()
+    disabled = _get_disabled_key_ids()
+
+    stats = []
+    for api_key in settings.api_keys:
+        kid = key_id(api_key)
+        usage = redis_client.hgetall(_usage_key(kid))
+        window_usage = get_scope_usage(app_scope(route, kid))
+        stats.append({
+            "key_id": kid,
+            "active": kid not in disabled,
+            "requests": int(usage.get("requests", 0)),
+            "rate_limited": int(usage.get("rate_limited", 0)),
+            "forbidden": int(usage.get("forbidden", 0)),
+            "utilisation": {
+                window_seconds: round(used / max_calls, 3)
+                for window_seconds, (used, max_calls) in window_usage.items()
+            },
+        })
+    return stats
+
+
+def log_key_stats(route: str) -> None:
+    """Logs per-key utilisation — called once per crawl cycle by the league task."""
+    for stats in get_key_stats(route):
+        logger.info("api key utilisation", route=route, **stats)
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def _usage_key(key_id: str) -> str:
+    return f"{USAGE_KEY_PREFIX}:{key_id}"
@@ -1,16 +1,44 @@
+import asyncio
+import time
+
+import redis
+
 from shared.config import settings
 from shared.logging import get_logger
 from shared.models.league import LeagueResponseModel
-from crawler.services.riot_client import fetch_league, NotFoundError
+from crawler.services.async_riot_client import fetch_league_pages
+from crawler.services.riot_client import APEX_TIERS, NotFoundError
+from crawler.services.rank_cache import cache_ranks
+from crawler.services.scheduler import SEED_TIER
 from crawler.services.deduplication import (
-    is_puuid_crawled_this_cycle,
-    mark_puuid_crawled,
+    filter_uncrawled_puuids,
+    mark_puuids_crawled,
     get_crawled_puuid_count,
 )
-from crawler.db.postgres import save_league_entries
+from crawler.db.postgres import copy_league_entries, get_matches_found, save_league_entries
 
 logger = get_logger(__name__)
 
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Redis keys
+# ---------------------------------------------------------------------------
+
+# league:games_played:{region} — hash {puuid: wins + losses at the last cycle}
+GAMES_PLAYED_KEY_PREFIX = "league:games_played"
+
+# league:games_played_seen:{region} — zset {puuid: last cycle the player was on the ladder}
+GAMES_PLAYED_SEEN_KEY_PREFIX = "league:games_played_seen"
+
+# Snapshots of players not seen on the ladder for this many cycles are dropped —
+# long enough that a tier the cascade skips for a while keeps its snapshots
+GAMES_PLAYED_TTL_SECONDS = 48 * settings.CRAWLER_COOLDOWN_MINUTES * 60
+
 # ---------------------------------------------------------------------------
 # Tier cascade order for season start fallback
 # Starts from top tiers and works down until MIN_PLAYERS_THRESHOLD is met
@@ -26,108 +54,289 @@ TIER_CASCADE = [
     "GOLD"
 ]
 
+# Divisions of the lower tiers — each is a separately paged entry list
+DIVISIONS = ["I", "II", "III", "IV"]
+
 
 # ---------------------------------------------------------------------------
 # Main seeder
 # ---------------------------------------------------------------------------
 
-def collect_puuids_for_cycle() -> list[str]:
+def collect_puuids_for_cycle(region: str | None = None) -> dict[str, dict]:
     """
-    Collects puuids for the current crawl cycle using a cascading tier strategy.
+    Collects puuids for the current crawl cycle of one region using a
+    cascading tier strategy.
 
-    1. Starts with Challenger, Grandmaster, Master
-    2. If total unique puuids < MIN_PLAYERS_THRESHOLD, continues down the ladder
-    3. Always injects SEED_PUUIDS from config as additional fallback
+    1. Starts with Challenger, Grandmaster, Master — fetched together
+    2. If total unique puuids < MIN_PLAYERS_THRESHOLD, continues down the
+       ladder one tier at a time, fetching divisions I–IV page by page
+    3. Injects SEED_PUUIDS from config as additional fallback (RIOT_REGION only)
     4. Skips puuids already crawled this cycle
+    5. Skips ladder players whose wins + losses have not changed since the
+       previous cycle (LEAGUE_SKIP_IDLE_PLAYERS) — they have no new games
+
+    League pages are fetched in waves of up to LEAGUE_FETCH_CONCURRENCY
+    concurrent requests (see _next_wave), and the threshold is checked
+    after every wave.
 
-    Returns a list of new puuids to queue for match list fetching.
+    Each region runs its own cascade against its own league endpoints, so
+    the threshold applies per region. Idle players count towards it, so
+    skipping them never pushes the cascade further down the ladder.
+
+    Returns {puuid: {"tier", "league_points", "expected_matches"}} for the
+    puuids to queue for match list fetching — the scheduler scores them from
+    these. expected_matches is None when unknown (seed puuids, players seen
+    for the first time).
     """
-    collected_puuids: set[str] = set()
-
-    # Always inject seed puuids first as baseline
-    if settings.SEED_PUUIDS:
-        for puuid in settings.SEED_PUUIDS:
-            if puuid and not is_puuid_crawled_this_cycle(puuid):
-                collected_puuids.add(puuid)
-        logger.info("seed puuids injected", count=len(collected_puuids))
-
-    # Cascade through tiers until threshold is met
-    for tier in TIER_CASCADE:
-        if len(collected_puuids) >= settings.MIN_PLAYERS_THRESHOLD:
-            logger.info(
-                "player threshold reached, stopping cascade",
-                count=len(collected_puuids),
-                threshold=settings.MIN_PLAYERS_THRESHOLD,
-            )
-            break
+    region = (region or settings.RIOT_REGION).lower()
+    collected_puuids: dict[str, dict] = {}
 
-        try:
-            new_puuids = _fetch_tier_puuids(tier)
-            before = len(collected_puuids)
-            collected_puuids.update(new_puuids)
-            added = len(collected_puuids) - before
-
-            logger.info(
-                "tier fetched",
-                tier=tier,
-                new_puuids=added,
-                total=len(collected_puuids),
-            )
+    # Seed puuids belong to the primary region — injecting them elsewhere
+    # would only produce 404s from the wrong routing value
+    if settings.SEED_PUUIDS and region == settings.RIOT_REGION.lower():
+        for puuid in filter_uncrawled_puuids([puuid for puuid in settings.SEED_PUUIDS if puuid]):
+            collected_puuids[puuid] = {
+                "tier": SEED_TIER,
+                "league_points": 0,
+                "expected_matches": None,
+            }
+        logger.info("seed puuids injected", region=region, count=len(collected_puuids))
+    seen_puuids = len(collected_puuids)
 
-        except NotFoundError:
-            logger.warning("tier endpoint not found, skipping", tier=tier)
-            continue
-        except Exception as e:
-            logger.error("failed to fetch tier", tier=tier, error=str(e))
-            continue
+    # Apex tiers are one request each — fetch them together, then page
+    # through the lower tiers one tier at a time
+    apex_pages = [(tier, "I", 1) for tier in TIER_CASCADE if tier.lower() in APEX_TIERS]
+    lower_tiers = [tier for tier in TIER_CASCADE if tier.lower() not in APEX_TIERS]
+
+    if seen_puuids < settings.MIN_PLAYERS_THRESHOLD:
+        _, seen = _collect_pages(region, apex_pages, collected_puuids)
+        seen_puuids += seen
+
+    for tier in lower_tiers:
+        # {division: next page number} — dropped once a page comes back empty
+        next_pages = {division: 1 for division in DIVISIONS}
+        while next_pages and seen_puuids < settings.MIN_PLAYERS_THRESHOLD:
+            exhausted, seen = _collect_pages(region, _next_wave(tier, next_pages), collected_puuids)
+            seen_puuids += seen
+            for division in exhausted:
+                next_pages.pop(division, None)
+
+    if seen_puuids >= settings.MIN_PLAYERS_THRESHOLD:
+        logger.info(
+            "player threshold reached, stopping cascade",
+            region=region,
+            count=seen_puuids,
+            threshold=settings.MIN_PLAYERS_THRESHOLD,
+        )
 
     # Mark all collected puuids as crawled this cycle
-    for puuid in collected_puuids:
-        mark_puuid_crawled(puuid)
+    mark_puuids_crawled(list(collected_puuids))
 
     logger.info(
         "cycle seeding complete",
+        region=region,
         total_puuids=len(collected_puuids),
+        idle_puuids=seen_puuids - len(collected_puuids),
         already_crawled_this_cycle=get_crawled_puuid_count() - len(collected_puuids),
     )
 
-    return list(collected_puuids)
+    return collected_puuids
+
+
+# ---------------------------------------------------------------------------
+# League pages
+# ---------------------------------------------------------------------------
+
+def _next_wave(tier: str, next_pages: dict[str, int]) -> list[tuple[str, str, int]]:
+    """
+    Picks up to LEAGUE_FETCH_CONCURRENCY pages of a lower tier, taking the
+    next page of each division in turn — with fewer divisions left than
+    slots, divisions are paged several pages deep. Advances next_pages.
+    """
+    pages = []
+    while len(pages) < settings.LEAGUE_FETCH_CONCURRENCY:
+        for division in next_pages:
+            if len(pages) >= settings.LEAGUE_FETCH_CONCURRENCY:
+                break
+            pages.append((tier, division, next_pages[division]))
+            next_pages[division] += 1
+    return pages
 
 
-def _fetch_tier_puuids(tier: str) -> list[str]:
+def _collect_pages(
+    region: str,
+    pages: list[tuple[str, str, int]],
+    collected_puuids: dict[str, dict],
+) -> tuple[set[str], int]:
     """
-    Fetches all puuids from a single tier league endpoint.
-    Saves league entries to PostgreSQL and returns list of new puuids
-    (excluding those already crawled this cycle).
+    Fetches league pages concurrently and adds their active players to
+    collected_puuids, in cascade order.
+
+    Returns (divisions whose page came back empty or failed, puuids seen
+    that were not crawled this cycle yet — idle ones included).
     """
-    raw_response = fetch_league(tier)
+    responses = asyncio.run(fetch_league_pages(pages, region=region))
+    exhausted: set[str] = set()
+    seen = 0
 
+    for page in pages:
+        tier, division, page_number = page
+        response = responses[page]
+
+        if isinstance(response, NotFoundError):
+            logger.warning("tier endpoint not found, skipping", region=region, tier=tier, division=division)
+            exhausted.add(division)
+            continue
+
+        try:
+            if isinstance(response, Exception):
+                raise response
+            entries = _parse_league_page(tier, response)
+        except Exception as e:
+            logger.error(
+                "failed to fetch tier",
+                region=region, tier=tier, division=division, page=page_number, error=str(e),
+            )
+            exhausted.add(division)
+            continue
+
+        if not entries:
+            exhausted.add(division)
+            continue
+
+        new_puuids = filter_uncrawled_puuids([puuid for puuid in entries if puuid not in collected_puuids])
+        games_played = {puuid: entries[puuid]["games"] for puuid in new_puuids}
+        active = get_active_players(region, games_played)
+        for puuid, expected_matches in active.items():
+            collected_puuids[puuid] = {
+                "tier": tier.upper(),
+                "league_points": entries[puuid]["league_points"],
+                "expected_matches": expected_matches,
+            }
+        seen += len(games_played)
+
+        logger.info(
+            "tier fetched",
+            region=region,
+            tier=tier,
+            division=division,
+            page=page_number,
+            new_puuids=len(active),
+            idle_puuids=len(games_played) - len(active),
+            total=len(collected_puuids),
+        )
+
+    return exhausted, seen
+
+
+def _parse_league_page(tier: str, response: dict | list) -> dict[str, dict]:
+    """
+    Saves one league response to PostgreSQL, refreshes the rank cache and
+    returns {puuid: {"games": wins + losses, "league_points": LP}} for its entries.
+    """
     # Top tiers return a single object with entries[]
     # Lower tiers (Diamond+) return a list of entries directly
     tier_upper = tier.upper()
 
-    if tier_upper in ("CHALLENGER", "GRANDMASTER", "MASTER"):
-        league_response = LeagueResponseModel(**raw_response)
+    if tier.lower() in APEX_TIERS:
+        league_response = LeagueResponseModel(**response)
         save_league_entries(league_response)
-        all_puuids = [entry.puuid for entry in league_response.entries]
-    else:
-        # Entries endpoint returns a list — wrap it to reuse LeagueResponseModel
-        entries = raw_response if isinstance(raw_response, list) else []
-        all_puuids = [
-            entry["puuid"]
-            for entry in entries
-            if "puuid" in entry
-        ]
-        # Save raw entries individually
-        _save_lower_tier_entries(entries, tier_upper)
-
-    # Filter out puuids already crawled this cycle
-    new_puuids = [
-        puuid for puuid in all_puuids
-        if not is_puuid_crawled_this_cycle(puuid)
-    ]
-
-    return new_puuids
+        cache_ranks({
+            entry.puuid: {"tier": league_response.tier, "rank": entry.rank or "", "lp": entry.leaguePoints}
+            for entry in league_response.entries
+        })
+        return {
+            entry.puuid: {"games": entry.wins + entry.losses, "league_points": entry.leaguePoints}
+            for entry in league_response.entries
+        }
+
+    entries = response if isinstance(response, list) else []
+    # Save raw entries individually
+    _save_lower_tier_entries(entries, tier_upper)
+    cache_ranks({
+        entry["puuid"]: {"tier": tier_upper, "rank": entry.get("rank", "I"), "lp": entry.get("leaguePoints", 0)}
+        for entry in entries
+        if "puuid" in entry
+    })
+    return {
+        entry["puuid"]: {
+            "games": entry.get("wins", 0) + entry.get("losses", 0),
+            "league_points": entry.get("leaguePoints", 0),
+        }
+        for entry in entries
+        if "puuid" in entry
+    }
+
+
+# ---------------------------------------------------------------------------
+# Idle player filter
+# ---------------------------------------------------------------------------
+
+def get_active_players(region: str, games_played: dict[str, int]) -> dict[str, int | None]:
+    """
+    Compares each player's wins + losses with the previous cycle's snapshot
+    and returns {puuid: games played since} for players who played — None
+    for players without a snapshot. The snapshot is then updated.
+
+    Only players with a player_crawls row get a snapshot. A player never
+    crawled, or whose first crawl failed, stays active every cycle until a
+    crawl succeeds — otherwise it would look idle until its next game. Once
+    crawled, a failed crawl is still covered: the next crawl fetches every
+    game since the last successful one (see match_list).
+
+    Snapshots of players who left the ladder are pruned once they have not
+    been seen for GAMES_PLAYED_TTL_SECONDS.
+    """
+    if not games_played:
+        return {}
+
+    key = _games_played_key(region)
+    puuids = list(games_played)
+    previous = redis_client.hmget(key, puuids)
+    crawled = get_matches_found(puuids)
+    if crawled:
+        _save_snapshots(region, {puuid: games_played[puuid] for puuid in crawled})
+
+    active: dict[str, int | None] = {}
+    for puuid, before in zip(puuids, previous):
+        if before is None:
+            active[puuid] = None
+        elif games_played[puuid] != int(before) or not settings.LEAGUE_SKIP_IDLE_PLAYERS:
+            # A lower count means a reset (new season) — crawl as unknown
+            delta = games_played[puuid] - int(before)
+            active[puuid] = delta if delta > 0 else None
+    return active
+
+
+def _save_snapshots(region: str, snapshots: dict[str, int]) -> None:
+    """Writes the snapshots and drops those of players gone from the ladder."""
+    key = _games_played_key(region)
+    seen_key = _games_played_seen_key(region)
+    now = time.time()
+
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.hset(key, mapping=snapshots)
+    pipeline.zadd(seen_key, dict.fromkeys(snapshots, now))
+    # Both keys vanish if seeding stops for a region
+    pipeline.expire(key, GAMES_PLAYED_TTL_SECONDS)
+    pipeline.expire(seen_key, GAMES_PLAYED_TTL_SECONDS)
+    pipeline.execute()
+
+    departed = redis_client.zrangebyscore(seen_key, "-inf", now - GAMES_PLAYED_TTL_SECONDS)
+    if departed:
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.hdel(key, *departed)
+        pipeline.zrem(seen_key, *departed)
+        pipeline.execute()
+        logger.info("games played snapshots pruned", region=region, count=len(departed))
+
+
+def _games_played_key(region: str) -> str:
+    return f"{GAMES_PLAYED_KEY_PREFIX}:{region}"
+
+
+def _games_played_seen_key(region: str) -> str:
+    return f"{GAMES_PLAYED_SEEN_KEY_PREFIX}:{region}"
 
 
 def _save_lower_tier_entries(entries: list[dict], tier: str) -> None:
@@ -135,26 +344,6 @@ def _save_lower_tier_entries(entries: list[dict], tier: str) -> None:
     Saves lower tier (Diamond and below) league entries to PostgreSQL.
     These come from a different endpoint format than top tiers.
     """
-    from crawler.db.models import LeagueEntry
-    from crawler.db.postgres import get_session
-
-    rows = []
-    for entry in entries:
-        rows.append(LeagueEntry(
-            puuid=entry.get("puuid", ""),
-            tier=tier,
-            rank=entry.get("rank", "I"),
-            league_points=entry.get("leaguePoints", 0),
-            wins=entry.get("wins", 0),
-            losses=entry.get("losses", 0),
-            veteran=entry.get("veteran", False),
-            inactive=entry.get("inactive", False),
-            fresh_blood=entry.get("freshBlood", False),
-            hot_streak=entry.get("hotStreak", False),
-            raw_response=entry,
-        ))
-
-    if rows:
-        with get_session() as session:
-            session.add_all(rows)
-        logger.info("lower tier entries saved", tier=tier, count=len(rows))
+    count = copy_league_entries(tier, entries)
+    if count:
+        logger.info("lower tier entries saved", tier=tier, count=count)
@@ -21,6 +21,11 @@ def parse_game_version(raw_version: str) -> str:
     return raw_version.strip()
 
 
+def patch_key(patch: str) -> tuple[int, ...]:
+    """"16.3" → (16, 3) so patches compare numerically — "16.10" is newer than "16.9"."""
+    return tuple(int(part) for part in patch.split(".") if part.isdigit())
+
+
 def get_item_slots(item_names: list[str]) -> tuple[str, str, str]:
     """
     Maps a list of item names (0-3 items) to exactly three slots.
@@ -2,8 +2,9 @@ import redis
 
 from shared.config import settings
 from shared.logging import get_logger
-from crawler.db.clickhouse import drop_patch_partition, get_existing_patches
-from crawler.services.match_parser import parse_game_version
+from crawler.db.clickhouse import discard_stale_rows, drop_patch_partition, get_existing_patches
+from crawler.services.deduplication import start_shard
+from crawler.services.match_parser import parse_game_version, patch_key
 
 logger = get_logger(__name__)
 
@@ -44,6 +45,11 @@ def detect_patch_change(raw_game_version: str) -> bool:
     Checks if the given game version represents a new patch.
     Called by the save worker when processing each match.
 
+    Only a strictly newer patch counts. Older versions — a region that has
+    not rolled out the patch yet, or a first crawl's match history — are
+    stale: they never roll the current patch back, which would drop the
+    newer patch's partitions and retire its dedup shard.
+
     If a new patch is detected:
     - Drops old partitions from ClickHouse
     - Updates the current patch in Redis
@@ -56,10 +62,11 @@ def detect_patch_change(raw_game_version: str) -> bool:
     if current_patch is None:
         # First time running — just record the current patch, no drop needed
         set_current_patch(new_patch)
+        start_shard(new_patch)
         logger.info("initial patch recorded", patch=new_patch)
         return False
 
-    if new_patch == current_patch:
+    if patch_key(new_patch) <= patch_key(current_patch):
         return False
 
     # Patch has changed
@@ -76,12 +83,19 @@ def detect_patch_change(raw_game_version: str) -> bool:
 def _handle_patch_change(old_patch: str, new_patch: str) -> None:
     """
     Handles the transition to a new patch:
-    1. Drops all existing ClickHouse partitions except the new patch
-    2. Updates the current patch in Redis
+    1. Updates the current patch in Redis — from here on every worker's
+       ClickHouse flush leaves out rows of older patches
+    2. Discards this process's buffered rows of older patches
+    3. Drops all existing ClickHouse partitions except the new patch
+    4. Retires the older match ID dedup shards — they expire after a grace period
 
     Drops all old partitions rather than just the previous one,
     in case the crawler was offline for multiple patches.
     """
+    set_current_patch(new_patch)
+    logger.info("patch updated in redis", patch=new_patch)
+    discard_stale_rows(new_patch)
+
     existing_patches = get_existing_patches()
 
     for patch in existing_patches:
@@ -96,5 +110,4 @@ def _handle_patch_change(old_patch: str, new_patch: str) -> None:
                     error=str(e),
                 )
 
-    set_current_patch(new_patch)
-    logger.info("patch updated in redis", patch=new_patch)
+    start_shard(new_patch)
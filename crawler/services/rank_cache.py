@@ -0,0 +1,85 @@
+import json
+
+import redis
+
+from shared.config import settings
+from shared.logging import get_logger
+from crawler.db import postgres
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Rank cache
+#
+# The save stage denormalizes every participant's rank into ClickHouse rows.
+# The league seeder already holds each ladder player's latest rank when it
+# saves a league page, so it writes them here as well. The save stage then
+# reads ranks with one MGET and only asks PostgreSQL about players missing
+# from the cache. Players without any league entry are cached as unranked,
+# so they are not looked up again for every match they appear in. A seeder
+# refresh overwrites them once they show up on a ladder.
+# ---------------------------------------------------------------------------
+
+# rank:{puuid} — JSON {"tier", "rank", "lp"}, or null for unranked players
+RANK_KEY_PREFIX = "rank"
+
+_UNRANKED = "null"
+
+
+def get_player_ranks(puuids: list[str]) -> dict[str, dict]:
+    """
+    Returns {puuid: {"tier", "rank", "lp"}} for the ranked players among
+    puuids — same result as postgres.get_player_ranks().
+
+    Cached ranks are served from Redis, the rest come from PostgreSQL in one
+    query and are cached for the next lookup.
+    """
+    puuids = list(dict.fromkeys(puuids))
+    if not puuids:
+        return {}
+
+    ranks: dict[str, dict] = {}
+    missing: list[str] = []
+    for puuid, cached in zip(puuids, redis_client.mget([_rank_key(p) for p in puuids])):
+        if cached is None:
+            missing.append(puuid)
+        elif cached != _UNRANKED:
+            ranks[puuid] = json.loads(cached)
+
+    if missing:
+        found = postgres.get_player_ranks(missing)
+        cache_ranks({puuid: found.get(puuid) for puuid in missing})
+        ranks.update(found)
+
+    logger.debug("player ranks looked up", count=len(puuids), cache_misses=len(missing))
+    return ranks
+
+
+def cache_ranks(ranks: dict[str, dict | None]) -> None:
+    """
+    Caches {puuid: {"tier", "rank", "lp"}} for RANK_CACHE_TTL_HOURS — None
+    caches the player as unranked. Called by the league seeder with every
+    page it saves, which keeps the cache current each cycle.
+    """
+    if not ranks:
+        return
+
+    ttl = int(settings.RANK_CACHE_TTL_HOURS * 3600)
+    pipeline = redis_client.pipeline(transaction=False)
+    for puuid, rank in ranks.items():
+        pipeline.set(_rank_key(puuid), json.dumps(rank), ex=ttl)
+    pipeline.execute()
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def _rank_key(puuid: str) -> str:
+    return f"{RANK_KEY_PREFIX}:{puuid}"
@@ -1,5 +1,11 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
 import time
-from datetime import datetime, timezone
+import uuid
 
 import redis
 
@@ -18,8 +24,29 @@ redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 # Redis keys
 # ---------------------------------------------------------------------------
 
+# Global pause — applies to every route (e.g. after a 403 invalid key)
 PAUSE_UNTIL_KEY = "rate_limit:pause_until"
 
+# Every pause set by set_pause_for_retry() is also published here, so workers
+# can keep pause state in memory instead of reading it before every request
+PAUSE_CHANNEL = "rate_limit:pauses"
+
+# Riot enforces limits per API key and routing value (europe, euw1, americas,
+# na1, ...), so all budget state is scoped by route and key — "{route}:{key_id}:app"
+# for the key-wide budget and "{route}:{key_id}:method:{method}" for each
+# endpoint budget. Without a key id the scopes drop that segment:
+#   rate_limit:{scope}:limits           hash  {window_seconds: max_calls} from the limit header
+#   rate_limit:{scope}:window:{seconds} zset  one member per permit, scored by grant time (ms)
+#   rate_limit:{scope}:pause_until      key   pause after a 429 scoped to that budget
+#
+# Functions below take an optional route; budgets default to RIOT_REGION.
+
+# Riot method names — one per Celery fetch queue, so each queue is throttled
+# against its own method budget
+LEAGUE_METHOD = "league"
+MATCH_LIST_METHOD = "match_list"
+MATCH_DETAIL_METHOD = "match_detail"
+
 # ---------------------------------------------------------------------------
 # Rate limit window in seconds — matches Riot's 2 minute window
 # Used as TTL on the pause_until key so it never blocks after restart
@@ -27,112 +54,667 @@ PAUSE_UNTIL_KEY = "rate_limit:pause_until"
 
 RATE_LIMIT_WINDOW_SECONDS = 120
 
+# How long a worker trusts its in-process copy of the limits hash (seconds)
+LIMITS_CACHE_SECONDS = 30
+
+# ---------------------------------------------------------------------------
+# Lua scripts
+# ---------------------------------------------------------------------------
+
+# Atomically grants one permit across every window passed in, or returns how
+# many milliseconds to wait until the fullest window frees a slot or the
+# longest active pause on those budgets ends.
+# KEYS: pause_until keys, then one sliding window zset per window
+# ARGV: now_ms, member, number of pause keys, then (window_ms, max_permits) per window
+ACQUIRE_PERMIT_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local member = ARGV[2]
+    local pauses = tonumber(ARGV[3])
+    local wait = 0
+
+    for i = 1, pauses do
+        local pause_until = redis.call('GET', KEYS[i])
+        if pause_until then
+            local key_wait = math.ceil(tonumber(pause_until) * 1000 - now)
+            if key_wait > wait then
+                wait = key_wait
+            end
+        end
+    end
+
+    for i = pauses + 1, #KEYS do
+        local key = KEYS[i]
+        local n = i - pauses
+        local window = tonumber(ARGV[2 + n * 2])
+        local limit = tonumber(ARGV[3 + n * 2])
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        local used = redis.call('ZCARD', key)
+        if used >= limit then
+            -- The slot frees up when the entry that pushed us over the limit ages out
+            local entry = redis.call('ZRANGE', key, used - limit, used - limit, 'WITHSCORES')
+            local key_wait = tonumber(entry[2]) + window - now
+            if key_wait > wait then
+                wait = key_wait
+            end
+        end
+    end
+
+    if wait > 0 then
+        return wait
+    end
+
+    for i = pauses + 1, #KEYS do
+        redis.call('ZADD', KEYS[i], now, member)
+        redis.call('PEXPIRE', KEYS[i], tonumber(ARGV[2 + (i - pauses) * 2]))
+    end
+    return 0
+"""
+
+# Tops a window up to the call count Riot reports, so calls this limiter never
+# saw (other processes, restarts, clock drift) still count against the budget.
+# KEYS: one sliding window zset per window
+# ARGV: now_ms, member prefix, then (window_ms, reported_count) per key
+SYNC_COUNTS_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local prefix = ARGV[2]
+
+    for i, key in ipairs(KEYS) do
+        local window = tonumber(ARGV[1 + i * 2])
+        local reported = tonumber(ARGV[2 + i * 2])
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        local used = redis.call('ZCARD', key)
+        for n = used + 1, reported do
+            redis.call('ZADD', key, now, prefix .. ':' .. n)
+        end
+        redis.call('PEXPIRE', key, window)
+    end
+    return 0
+"""
+
+# Deferred tasks are re-scheduled up to this many seconds after the pause ends,
+# so a batch of tasks deferred by the same pause does not all wake at once
+DEFER_JITTER_SECONDS = 2.0
+
+# Per-process copy of each scope's limits: {scope: (expires_at, {window: max_calls})}
+_limits_cache: dict[str, tuple[float, dict[int, int]]] = {}
+
+# Rotates which key acquire_permit() tries first so load spreads across the pool
+_key_cursor = itertools.count()
+
+# While subscribed to PAUSE_CHANNEL a worker trusts its in-process copy of a
+# pause key for this long before re-reading it — a safety net for missed messages
+PAUSE_CACHE_SECONDS = 5
+
+# Delay before the subscriber reconnects after its connection dropped (seconds)
+PAUSE_RESUBSCRIBE_SECONDS = 5
+
+# Per-process copy of pause keys: {key: (pause_until, valid_until)}
+_pause_cache: dict[str, tuple[float, float]] = {}
+
+# Process id whose subscriber thread is currently connected, None when polling.
+# Compared with os.getpid() so a forked child never trusts its parent's thread
+_subscribed_pid: int | None = None
+_subscriber_thread: threading.Thread | None = None
+_subscriber_stop = threading.Event()
+
 
 # ---------------------------------------------------------------------------
 # Core functions
 # ---------------------------------------------------------------------------
 
-def check_and_wait() -> None:
+def get_pause_remaining(method: str | None = None, route: str | None = None) -> float:
+    """
+    Returns how many seconds are left before a request may be sent.
+    Checks the global pause_until flag and, when given, the route's and the
+    method's own pauses. These are shared by every key in the pool — pauses
+    for a single key are honoured by try_acquire_permit().
+
+    While the pause subscriber is connected the answer normally comes from
+    memory with no Redis round trip; otherwise all keys are read in one MGET.
+    Returns 0.0 when no pause is active.
     """
-    Checks if the shared pause_until flag is set in Redis.
-    If set and still in the future, sleeps until the pause expires.
+    keys = [PAUSE_UNTIL_KEY]
+    if route:
+        keys.append(_pause_key(app_scope(route)))
+    if method:
+        keys.append(_pause_key(method_scope(method, route)))
+
+    pause_until = max(_get_pauses(keys), default=0.0)
+    return max(0.0, pause_until - time.time())
+
+
+def _get_pauses(keys: list[str]) -> list[float]:
+    """pause_until per key — from the in-process cache when subscribed, else Redis."""
+    if not is_pause_subscriber_connected():
+        return [float(value) if value else 0.0 for value in redis_client.mget(keys)]
+
+    # The subscriber thread may clear the cache at any point, so the answer is
+    # built from values read here rather than looked up again afterwards
+    now = time.monotonic()
+    cached = {key: _pause_cache.get(key) for key in keys}
+    pauses = {key: entry[0] for key, entry in cached.items() if entry and entry[1] >= now}
+    stale = [key for key in keys if key not in pauses]
+    if stale:
+        for key, value in zip(stale, redis_client.mget(stale)):
+            pauses[key] = float(value) if value else 0.0
+            _pause_cache[key] = (pauses[key], now + PAUSE_CACHE_SECONDS)
+
+    return [pauses[key] for key in keys]
+
+
+def check_and_wait(
+    method: str | None = None,
+    route: str | None = None,
+    defer: bool = False,
+) -> None:
+    """
+    Checks if the global pause_until flag (or the route's / method's pause) is
+    set in Redis. If set and still in the future, sleeps until the pause expires.
+
+    With defer=True a pause longer than RATE_LIMIT_MAX_INLINE_WAIT_SECONDS
+    raises RateLimitPaused instead, so the calling task can re-schedule itself
+    and free its worker slot.
 
     Called by riot_client._make_request() before every API request.
     All workers share this signal through Redis — no direct coordination needed.
     """
-    pause_until_str = redis_client.get(PAUSE_UNTIL_KEY)
-    if not pause_until_str:
-        return
+    sleep_seconds = get_pause_remaining(method, route)
+    if defer:
+        _raise_if_deferred(sleep_seconds, method, route)
+    if sleep_seconds > 0:
+        logger.info(
+            "rate limit pause active, sleeping",
+            route=route,
+            method=method,
+            sleep_seconds=round(sleep_seconds, 2),
+        )
+        time.sleep(sleep_seconds)
 
-    pause_until = float(pause_until_str)
-    now = time.time()
 
-    if now < pause_until:
-        sleep_seconds = pause_until - now
+async def async_check_and_wait(
+    method: str | None = None,
+    route: str | None = None,
+    defer: bool = False,
+) -> None:
+    """
+    Async variant of check_and_wait() for the asyncio batch fetcher.
+    Yields to the event loop instead of blocking the worker process, and
+    reads the pause from a thread. defer behaves as in check_and_wait().
+    """
+    sleep_seconds = await asyncio.to_thread(get_pause_remaining, method, route)
+    if defer:
+        _raise_if_deferred(sleep_seconds, method, route)
+    if sleep_seconds > 0:
         logger.info(
             "rate limit pause active, sleeping",
+            route=route,
+            method=method,
             sleep_seconds=round(sleep_seconds, 2),
         )
-        time.sleep(sleep_seconds)
+        await asyncio.sleep(sleep_seconds)
 
 
-def update_rate_limit(headers: dict) -> None:
+def try_acquire_permit(
+    method: str | None = None,
+    route: str | None = None,
+    key_id: str | None = None,
+) -> float:
     """
-    Parses rate limit headers from a Riot API response and sets
-    the shared pause_until key in Redis if remaining calls are low.
+    Tries to take one permit from the route's shared app-level budget and, if a
+    method is given, from that method's budget as well. With a key_id the
+    budgets are the ones belonging to that API key.
+
+    Every window reported by Riot (e.g. 10s and 600s) is modelled as a sliding
+    window in Redis and checked in one atomic Lua call, so concurrent workers
+    can never over-grant. Each window is capped at RATE_LIMIT_TARGET_UTILISATION
+    of its limit, less RATE_LIMIT_BUFFER calls held back for in-flight requests.
+    A pause set on either budget by a 429 is honoured in the same call.
+
+    A saturated method only makes callers of that method wait — other methods
+    keep drawing on the app budget. Routes and keys never share a budget.
+
+    Returns 0.0 if the permit was granted, otherwise the seconds to wait before
+    a permit can be granted.
+    """
+    route = route or _default_route()
+    scopes = [app_scope(route, key_id)]
+    if method:
+        scopes.append(method_scope(method, route, key_id))
+
+    pause_keys = [_pause_key(scope) for scope in scopes]
+    window_keys: list[str] = []
+    args: list = [_now_ms(), uuid.uuid4().hex, len(pause_keys)]
+    for scope in scopes:
+        limits = get_scope_limits(scope)
+        for window_seconds in sorted(limits):
+            window_keys.append(_window_key(scope, window_seconds))
+            args.extend([window_seconds * 1000, _effective_limit(limits[window_seconds])])
+
+    keys = pause_keys + window_keys
+    wait_ms = redis_client.eval(ACQUIRE_PERMIT_SCRIPT, len(keys), *keys, *args)
+    return int(wait_ms) / 1000
+
+
+def try_acquire_any_permit(
+    method: str | None = None,
+    route: str | None = None,
+    key_ids: list[str] | None = None,
+) -> tuple[str | None, float]:
+    """
+    Tries each key's budget in turn, starting from a rotating offset so
+    requests spread evenly across the pool.
+
+    Returns (key_id, 0.0) for the first key that granted a permit, otherwise
+    (None, seconds until the soonest key frees up). Without key_ids the
+    route's unkeyed budget is used and the granted key_id is None.
+    """
+    if not key_ids:
+        return None, try_acquire_permit(method, route)
+
+    start = next(_key_cursor)
+    wait_seconds = float("inf")
+    for offset in range(len(key_ids)):
+        key_id = key_ids[(start + offset) % len(key_ids)]
+        key_wait = try_acquire_permit(method, route, key_id)
+        if key_wait <= 0:
+            return key_id, 0.0
+        wait_seconds = min(wait_seconds, key_wait)
+
+    return None, wait_seconds
+
+
+def acquire_permit(
+    method: str | None = None,
+    route: str | None = None,
+    key_ids: list[str] | None = None,
+    defer: bool = False,
+) -> str | None:
+    """
+    Blocks until one of the keys' budgets on the route grants a permit.
+    Called by riot_client._make_request() before every API request.
+
+    With defer=True a wait longer than RATE_LIMIT_MAX_INLINE_WAIT_SECONDS
+    raises RateLimitPaused instead of sleeping.
+
+    Returns the key_id the permit was taken from (None without key_ids).
+    """
+    while True:
+        key_id, wait_seconds = try_acquire_any_permit(method, route, key_ids)
+        if wait_seconds <= 0:
+            return key_id
+        if defer:
+            _raise_if_deferred(wait_seconds, method, route)
+        logger.debug(
+            "rate limit budget exhausted, waiting",
+            route=route,
+            method=method,
+            wait_seconds=wait_seconds,
+        )
+        time.sleep(wait_seconds)
+
+
+async def async_acquire_permit(
+    method: str | None = None,
+    route: str | None = None,
+    key_ids: list[str] | None = None,
+    defer: bool = False,
+) -> str | None:
+    """
+    Async variant of acquire_permit() for the asyncio batch fetcher.
+    The Redis call runs in a thread so it never blocks the event loop.
+    defer behaves as in acquire_permit().
+    """
+    while True:
+        key_id, wait_seconds = await asyncio.to_thread(try_acquire_any_permit, method, route, key_ids)
+        if wait_seconds <= 0:
+            return key_id
+        if defer:
+            _raise_if_deferred(wait_seconds, method, route)
+        logger.debug(
+            "rate limit budget exhausted, waiting",
+            route=route,
+            method=method,
+            wait_seconds=wait_seconds,
+        )
+        await asyncio.sleep(wait_seconds)
+
+
+def _raise_if_deferred(wait_seconds: float, method: str | None, route: str | None) -> None:
+    """Raises RateLimitPaused when a wait is too long to sit out inside the worker."""
+    if wait_seconds <= settings.RATE_LIMIT_MAX_INLINE_WAIT_SECONDS:
+        return
+
+    countdown = wait_seconds + random.uniform(0, DEFER_JITTER_SECONDS)
+    logger.info(
+        "rate limit wait too long, deferring task",
+        route=route,
+        method=method,
+        wait_seconds=round(wait_seconds, 2),
+        countdown=round(countdown, 2),
+    )
+    raise RateLimitPaused(countdown)
+
+
+def update_rate_limit(
+    headers: dict,
+    method: str | None = None,
+    route: str | None = None,
+    key_id: str | None = None,
+) -> None:
+    """
+    Seeds and corrects the shared sliding windows from a Riot API response.
 
     Called by riot_client._make_request() after every API response.
 
+    - X-App-Rate-Limit / X-Method-Rate-Limit update the stored limits when
+      Riot reports new values
+    - X-App-Rate-Limit-Count / X-Method-Rate-Limit-Count top up each window to
+      the count Riot reports, so the proactive limiter never believes it has
+      more budget than it does
+
+    Method headers are only applied when the caller names the method the
+    request was made against. State is written to the route's budget of the
+    key the request was sent with.
+
     Riot headers:
         X-App-Rate-Limit-Count: "8:10,45:600"  (calls made : window seconds)
         X-App-Rate-Limit: "20:10,100:600"       (max calls : window seconds)
+        X-Method-Rate-Limit-Count: "3:10"
+        X-Method-Rate-Limit: "250:10"
     """
+    route = route or _default_route()
     try:
-        count_header = headers.get("x-app-rate-limit-count", "")
-        limit_header = headers.get("x-app-rate-limit", "")
-
-        if not count_header or not limit_header:
-            return
-
-        # Parse both windows (short 10s and long 120s)
-        # We care most about the 2-minute window
-        counts = _parse_rate_limit_header(count_header)
-        limits = _parse_rate_limit_header(limit_header)
-
-        for window_seconds, calls_made in counts.items():
-            max_calls = limits.get(window_seconds, 0)
-            if max_calls == 0:
-                continue
-
-            remaining = max_calls - calls_made
-
-            if remaining < settings.RATE_LIMIT_BUFFER:
-                # Set pause until the window resets
-                pause_until = time.time() + window_seconds
-                redis_client.set(
-                    PAUSE_UNTIL_KEY,
-                    str(pause_until),
-                    ex=window_seconds,  # TTL = window duration, auto-expires
-                )
-                logger.warning(
-                    "rate limit buffer reached, pausing all workers",
-                    remaining=remaining,
-                    window_seconds=window_seconds,
-                    pause_until=datetime.fromtimestamp(
-                        pause_until, tz=timezone.utc
-                    ).isoformat(),
-                )
-                break  # most conservative window takes priority
+        _sync_scope(
+            app_scope(route, key_id),
+            headers.get("x-app-rate-limit", ""),
+            headers.get("x-app-rate-limit-count", ""),
+        )
+        if method:
+            _sync_scope(
+                method_scope(method, route, key_id),
+                headers.get("x-method-rate-limit", ""),
+                headers.get("x-method-rate-limit-count", ""),
+            )
 
     except Exception as e:
         # Never let rate limit parsing crash the crawler
         logger.error("failed to parse rate limit headers", error=str(e))
 
 
-def set_pause_for_retry(retry_after_seconds: int) -> None:
+def get_headroom(headers) -> float:
+    """
+    Share of the tightest reported window still unused according to a
+    response's app and method rate limit headers — 1.0 when none are present.
+    """
+    headroom = 1.0
+    for limit_header, count_header in (
+        ("x-app-rate-limit", "x-app-rate-limit-count"),
+        ("x-method-rate-limit", "x-method-rate-limit-count"),
+    ):
+        limits = _parse_rate_limit_header(headers.get(limit_header, ""))
+        counts = _parse_rate_limit_header(headers.get(count_header, ""))
+        for window_seconds, max_calls in limits.items():
+            if window_seconds in counts and max_calls > 0:
+                headroom = min(headroom, 1 - counts[window_seconds] / max_calls)
+    return max(0.0, headroom)
+
+
+def _sync_scope(scope: str, limit_header: str, count_header: str) -> None:
+    """Stores one scope's limits and tops its windows up to Riot's counts."""
+    if not count_header or not limit_header:
+        return
+
+    counts = _parse_rate_limit_header(count_header)
+    limits = _parse_rate_limit_header(limit_header)
+
+    if not counts or not limits:
+        return
+
+    _store_scope_limits(scope, limits)
+
+    windows = [w for w in sorted(counts) if w in limits]
+    if not windows:
+        return
+
+    args: list = [_now_ms(), f"sync:{uuid.uuid4().hex}"]
+    for window_seconds in windows:
+        args.extend([window_seconds * 1000, counts[window_seconds]])
+
+    redis_client.eval(
+        SYNC_COUNTS_SCRIPT,
+        len(windows),
+        *[_window_key(scope, window_seconds) for window_seconds in windows],
+        *args,
+    )
+
+
+def set_pause_for_retry(
+    retry_after_seconds: int,
+    method: str | None = None,
+    route: str | None = None,
+    key_id: str | None = None,
+) -> None:
     """
     Sets pause_until based on a 429 Retry-After header value.
     Called by Celery tasks when they catch a RateLimitError.
 
     Args:
         retry_after_seconds: Value from Retry-After response header
+        method: Set when the 429 was method-scoped — only that method is
+                paused, every other endpoint keeps running
+        route: Routing value the 429 came from — other routes keep running.
+               Without a route every worker is paused (used for the 403 pause)
+        key_id: API key the 429 was returned for — other keys in the pool
+                keep running. None pauses the budget for every key
     """
+    if method:
+        key = _pause_key(method_scope(method, route, key_id))
+    elif route:
+        key = _pause_key(app_scope(route, key_id))
+    else:
+        key = PAUSE_UNTIL_KEY
+
     pause_until = time.time() + retry_after_seconds
-    redis_client.set(
-        PAUSE_UNTIL_KEY,
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.set(
+        key,
         str(pause_until),
         ex=retry_after_seconds + 5,  # small buffer on TTL
     )
+    pipeline.publish(PAUSE_CHANNEL, json.dumps({"key": key, "pause_until": pause_until}))
+    pipeline.execute()
     logger.warning(
-        "429 received, pausing all workers",
+        "429 received, pausing workers",
+        route=route,
+        method=method,
+        key_id=key_id,
         retry_after_seconds=retry_after_seconds,
     )
 
 
+# ---------------------------------------------------------------------------
+# Pause subscriber
+# ---------------------------------------------------------------------------
+
+def start_pause_subscriber() -> None:
+    """
+    Starts a daemon thread that listens on PAUSE_CHANNEL and keeps this
+    process's pause cache current. Called once per worker process from the
+    Celery worker_process_init signal in crawler/main.py.
+    Until it has subscribed — and whenever the connection drops —
+    get_pause_remaining() falls back to reading Redis on every call.
+    """
+    global _subscriber_thread
+
+    if _subscriber_thread and _subscriber_thread.is_alive():
+        return
+
+    _subscriber_stop.clear()
+    _subscriber_thread = threading.Thread(
+        target=_listen_for_pauses,
+        name="pause-subscriber",
+        daemon=True,
+    )
+    _subscriber_thread.start()
+
+
+def stop_pause_subscriber() -> None:
+    """Stops the subscriber thread — this process goes back to polling Redis."""
+    global _subscriber_thread
+
+    _subscriber_stop.set()
+    if _subscriber_thread and _subscriber_thread.is_alive():
+        _subscriber_thread.join(timeout=PAUSE_RESUBSCRIBE_SECONDS)
+    _subscriber_thread = None
+
+
+def is_pause_subscriber_connected() -> bool:
+    return _subscribed_pid == os.getpid()
+
+
+def _listen_for_pauses() -> None:
+    global _subscribed_pid
+
+    while not _subscriber_stop.is_set():
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(PAUSE_CHANNEL)
+            # Anything cached before this point may have missed messages
+            _pause_cache.clear()
+            _subscribed_pid = os.getpid()
+            logger.info("pause subscriber connected", channel=PAUSE_CHANNEL)
+
+            # Short timeout so a stop request is noticed promptly
+            while not _subscriber_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    _apply_pause_message(message.get("data"))
+
+        except Exception as e:
+            logger.warning("pause subscriber disconnected, polling redis", error=str(e))
+        finally:
+            _subscribed_pid = None
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+        _subscriber_stop.wait(PAUSE_RESUBSCRIBE_SECONDS)
+
+
+def _apply_pause_message(data) -> None:
+    """Stores one published pause in the in-process cache."""
+    try:
+        pause = json.loads(data)
+        _pause_cache[pause["key"]] = (
+            float(pause["pause_until"]),
+            time.monotonic() + PAUSE_CACHE_SECONDS,
+        )
+    except (TypeError, ValueError, KeyError) as e:
+        logger.warning("ignoring malformed pause message", data=data, error=str(e))
+
+
+# ---------------------------------------------------------------------------
+# Limits
+# ---------------------------------------------------------------------------
+
+def get_scope_limits(scope: str) -> dict[int, int]:
+    """
+    Returns {window_seconds: max_calls} for a scope.
+
+    Served from a short-lived in-process cache, then the Redis hash written by
+    update_rate_limit(). Before Riot has reported anything the app scope falls
+    back to the RIOT_APP_RATE_LIMIT setting and method scopes are unlimited.
+    """
+    cached = _limits_cache.get(scope)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    stored = redis_client.hgetall(_limits_key(scope))
+    limits = {int(window): int(max_calls) for window, max_calls in stored.items()}
+    if not limits and scope.endswith(":app"):
+        limits = _parse_rate_limit_header(settings.RIOT_APP_RATE_LIMIT)
+
+    _limits_cache[scope] = (time.monotonic() + LIMITS_CACHE_SECONDS, limits)
+    return limits
+
+
+def get_scope_usage(scope: str) -> dict[int, tuple[int, int]]:
+    """
+    Returns {window_seconds: (permits_used, max_calls)} for a scope.
+    Used for utilisation reporting — read-only, never grants a permit.
+    """
+    limits = get_scope_limits(scope)
+    now_ms = _now_ms()
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for window_seconds in sorted(limits):
+        pipeline.zcount(_window_key(scope, window_seconds), now_ms - window_seconds * 1000, "+inf")
+    used = pipeline.execute()
+
+    return {
+        window_seconds: (count, limits[window_seconds])
+        for window_seconds, count in zip(sorted(limits), used)
+    }
+
+
+def _store_scope_limits(scope: str, limits: dict[int, int]) -> None:
+    """Writes limits to Redis only when they differ from what this process knows."""
+    cached = _limits_cache.get(scope)
+    if cached and cached[1] == limits:
+        return
+
+    pipeline = redis_client.pipeline()
+    pipeline.delete(_limits_key(scope))
+    pipeline.hset(_limits_key(scope), mapping={str(w): str(c) for w, c in limits.items()})
+    pipeline.execute()
+
+    _limits_cache[scope] = (time.monotonic() + LIMITS_CACHE_SECONDS, limits)
+    logger.info("rate limits updated", scope=scope, limits=limits)
+
+
+def _effective_limit(max_calls: int) -> int:
+    """Permits granted per window — target utilisation less the safety buffer."""
+    target = int(max_calls * settings.RATE_LIMIT_TARGET_UTILISATION)
+    return max(1, min(target, max_calls - settings.RATE_LIMIT_BUFFER))
+
+
 # ---------------------------------------------------------------------------
 # Helper
 # ---------------------------------------------------------------------------
 
+def app_scope(route: str, key_id: str | None = None) -> str:
+    return f"{_budget(route, key_id)}:app"
+
+
+def method_scope(method: str, route: str | None = None, key_id: str | None = None) -> str:
+    return f"{_budget(route or _default_route(), key_id)}:method:{method}"
+
+
+def _budget(route: str, key_id: str | None) -> str:
+    return f"{route}:{key_id}" if key_id else route
+
+
+def _default_route() -> str:
+    return settings.RIOT_REGION.lower()
+
+
+def _pause_key(scope: str) -> str:
+    return f"rate_limit:{scope}:pause_until"
+
+
+def _limits_key(scope: str) -> str:
+    return f"rate_limit:{scope}:limits"
+
+
+def _window_key(scope: str, window_seconds: int) -> str:
+    return f"rate_limit:{scope}:window:{window_seconds}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
 def _parse_rate_limit_header(header: str) -> dict[int, int]:
     """
     Parses a Riot rate limit header into a dict of {window_seconds: count}.
@@ -148,3 +730,17 @@ def _parse_rate_limit_header(header: str) -> dict[int, int]:
     except Exception:
         pass
     return result
+
+
+# ---------------------------------------------------------------------------
+# Custom exceptions
+# ---------------------------------------------------------------------------
+
+class RateLimitPaused(Exception):
+    """Raised instead of sleeping when a caller opted into deferral.
+    countdown is how long the task should wait before running again — the
+    task re-schedules itself with it and returns, freeing the worker slot.
+    """
+    def __init__(self, countdown: float):
+        self.countdown = countdown
+        super().__init__(f"Rate limit pause active, defer for {countdown:.1f}s")
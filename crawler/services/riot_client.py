@@ -1,153 +1,411 @@
+import os
+import time
+
 import httpx
 
 from shared.config import settings
 from shared.logging import get_logger
-from crawler.services.rate_limiter import check_and_wait, update_rate_limit, set_pause_for_retry
+from crawler.services.concurrency import (
+    ERROR as CONCURRENCY_ERROR,
+    acquire_slot,
+    cancel_slot,
+    classify_response,
+    release_slot,
+)
+from crawler.services.key_pool import disable_key, get_active_keys, record_response
+from crawler.services.rate_limiter import (
+    LEAGUE_METHOD,
+    MATCH_DETAIL_METHOD,
+    MATCH_LIST_METHOD,
+    acquire_permit,
+    check_and_wait,
+    update_rate_limit,
+    set_pause_for_retry,
+)
 
 logger = get_logger(__name__)
 
 # ---------------------------------------------------------------------------
-# Base URLs per region
+# Routing values per region
+# Match endpoints use the regional route, league endpoints the platform route.
+# Riot enforces rate limits per routing value, so the limiter is keyed by it too.
 # ---------------------------------------------------------------------------
 
-REGION_BASE_URLS = {
-    "europe": "https://europe.api.riotgames.com",
-    "americas": "https://americas.api.riotgames.com",
-    "asia": "https://asia.api.riotgames.com",
-    "sea": "https://sea.api.riotgames.com",
+REGION_ROUTES = {
+    "europe": "europe",
+    "americas": "americas",
+    "asia": "asia",
+    "sea": "sea",
+}
+
+PLATFORM_ROUTES = {
+    "europe": "euw1",
+    "americas": "na1",
+    "asia": "kr",
+    "sea": "sg2",
 }
 
-PLATFORM_BASE_URLS = {
-    "europe": "https://euw1.api.riotgames.com",
-    "americas": "https://na1.api.riotgames.com",
-    "asia": "https://kr.api.riotgames.com",
-    "sea": "https://sg2.api.riotgames.com",
+# Regional route of every platform — match IDs are prefixed with their platform
+PLATFORM_REGIONS = {
+    "br1": "americas",
+    "la1": "americas",
+    "la2": "americas",
+    "na1": "americas",
+    "eun1": "europe",
+    "euw1": "europe",
+    "me1": "europe",
+    "ru": "europe",
+    "tr1": "europe",
+    "jp1": "asia",
+    "kr": "asia",
+    "oc1": "sea",
+    "ph2": "sea",
+    "sg2": "sea",
+    "th2": "sea",
+    "tw2": "sea",
+    "vn2": "sea",
 }
 
-# How long to pause all workers when a 403 is detected (seconds)
-# Long enough to update the key and restart the crawler
+# Tiers served as one league object — lower tiers are paged entry lists per division
+APEX_TIERS = ("challenger", "grandmaster", "master")
+
+# How long to pause all workers when the last key in the pool returns 403 (seconds)
+# Long enough to update the keys and restart the crawler
 INVALID_KEY_PAUSE_SECONDS = 3600
 
 
-def _get_headers() -> dict:
+# ---------------------------------------------------------------------------
+# Connection pool
+# One keep-alive client per base URL, created lazily inside each worker process
+# so every request after the first skips the TCP + TLS handshake
+# ---------------------------------------------------------------------------
+
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=10,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0,   # seconds an idle connection is kept open
+)
+
+_clients: dict[str, httpx.Client] = {}
+_clients_pid: int | None = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (installed via httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+HTTP2_ENABLED = _http2_available()
+
+
+def _get_headers(api_key: str) -> dict:
     return {
-        "X-Riot-Token": settings.RIOT_API_KEY,
+        "X-Riot-Token": api_key,
         "Accept": "application/json",
+        "Accept-Encoding": "gzip",
     }
 
 
-def _get_base_url(regional: bool = True) -> str:
-    region = settings.RIOT_REGION.lower()
-    if regional:
-        return REGION_BASE_URLS.get(region, REGION_BASE_URLS["europe"])
-    return PLATFORM_BASE_URLS.get(region, PLATFORM_BASE_URLS["europe"])
+def _get_route(region: str | None = None, regional: bool = True) -> str:
+    """
+    Maps a crawl region (e.g. "europe") to its Riot routing value.
+    Defaults to RIOT_REGION when no region is given.
+    """
+    region = (region or settings.RIOT_REGION).lower()
+    routes = REGION_ROUTES if regional else PLATFORM_ROUTES
+    return routes.get(region, routes["europe"])
+
+
+def _get_base_url(route: str) -> str:
+    return settings.RIOT_API_BASE_URL.format(route=route)
+
+
+def _get_client(base_url: str) -> httpx.Client:
+    """
+    Returns the pooled client for a base URL, creating it on first use.
+
+    Clients are tracked per process id — a forked Celery child never reuses
+    sockets inherited from its parent, it opens its own pool instead.
+    """
+    global _clients_pid
+
+    pid = os.getpid()
+    if _clients_pid != pid:
+        _clients.clear()
+        _clients_pid = pid
+
+    client = _clients.get(base_url)
+    if client is None:
+        client = httpx.Client(
+            base_url=base_url,
+            http2=HTTP2_ENABLED,
+            limits=POOL_LIMITS,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+        _clients[base_url] = client
+        logger.info("riot api client created", base_url=base_url, http2=HTTP2_ENABLED)
+
+    return client
+
+
+def close_clients() -> None:
+    """
+    Closes every pooled client owned by this process.
+    Called from the Celery worker shutdown signals in crawler/main.py.
+    """
+    if _clients_pid != os.getpid():
+        _clients.clear()
+        return
+
+    for base_url, client in list(_clients.items()):
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning("failed to close riot api client", base_url=base_url, error=str(e))
+    _clients.clear()
 
 
 # ---------------------------------------------------------------------------
 # Core request function
 # ---------------------------------------------------------------------------
 
-def _make_request(url: str) -> dict:
+def _make_request(route: str, path: str, method: str, defer: bool = False) -> dict:
     """
-    Makes a single GET request to the Riot API.
+    Makes a single GET request to the Riot API over the pooled client for a route.
 
-    - Checks pause_until before firing (rate limit coordination)
-    - Parses rate limit headers from response and updates pause_until
+    - Checks global, route and method pause_until before firing (rate limit coordination)
+    - Acquires a permit from the app and method budgets of whichever key in
+      the pool has room, and sends the request with that key
+    - Parses rate limit headers from response and corrects that key's budgets
     - Raises on 4xx/5xx except handles 429 by raising with retry delay info
-    - Raises InvalidKeyError on 403 and pauses all workers for 1 hour
+    - On 403 drops the key from the pool and retries with the next one —
+      InvalidKeyError is only raised once every key has been dropped
+    - With defer=True raises RateLimitPaused instead of sleeping through a
+      long pause or exhausted budget, so the calling task can re-schedule
+    - With CONCURRENCY_CONTROL_ENABLED holds one of the route's fleet-wide
+      in-flight slots for the duration of the request
 
     Returns parsed JSON response as dict.
     """
+    base_url = _get_base_url(route)
+    url = f"{base_url}{path}"
+
     # Check shared rate limit pause before firing
-    check_and_wait()
+    check_and_wait(method, route=route, defer=defer)
+
+    while True:
+        try:
+            response, key_id = _send(_get_client(base_url), route, path, method, defer)
+            return _handle_response(url, response, method, route, key_id)
+
+        except InvalidKeyError as e:
+            if e.pool_exhausted:
+                raise
+        except httpx.TimeoutException:
+            logger.error("request timed out", url=url)
+            raise
+        except httpx.HTTPError as e:
+            logger.error("http error", url=url, error=str(e))
+            raise
+
+
+def _send(
+    client: httpx.Client,
+    route: str,
+    path: str,
+    method: str,
+    defer: bool,
+) -> tuple[httpx.Response, str]:
+    """
+    Sends one GET with a key from the pool, inside an adaptive concurrency
+    slot when enabled. The slot is taken before the rate limit permit, so a
+    task deferred while waiting for a slot has not spent any of the budget.
+    The response's latency, status and rate limit headroom are fed back to
+    the controller, and transport failures count as errors.
+
+    Returns (response, key_id of the key that sent it).
+    """
+    if not settings.CONCURRENCY_CONTROL_ENABLED:
+        api_key, key_id = _acquire_key(method, route, defer)
+        return client.get(path, headers=_get_headers(api_key)), key_id
 
+    token = acquire_slot(route, defer=defer)
     try:
-        with httpx.Client(timeout=10.0) as client:
-            response = client.get(url, headers=_get_headers())
-
-        # Always update rate limit state from response headers
-        update_rate_limit(response.headers)
-
-        if response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", 60))
-            logger.warning(
-                "rate limit exceeded",
-                url=url,
-                retry_after=retry_after,
-            )
-            raise RateLimitError(retry_after=retry_after)
-
-        if response.status_code == 403:
-            logger.error(
-                "riot api key invalid or expired — pausing all workers for 1 hour, "
-                "update RIOT_API_KEY in .env and restart the crawler",
-                url=url,
-            )
-            set_pause_for_retry(retry_after_seconds=INVALID_KEY_PAUSE_SECONDS)
-            raise InvalidKeyError()
-
-        if response.status_code == 404:
-            raise NotFoundError(url=url)
-
-        response.raise_for_status()
-        return response.json()
-
-    except httpx.TimeoutException:
-        logger.error("request timed out", url=url)
-        raise
-    except httpx.HTTPError as e:
-        logger.error("http error", url=url, error=str(e))
+        api_key, key_id = _acquire_key(method, route, defer)
+    except BaseException:
+        cancel_slot(route, token)
         raise
 
+    outcome = CONCURRENCY_ERROR
+    started = time.monotonic()
+    try:
+        response = client.get(path, headers=_get_headers(api_key))
+        outcome = classify_response(
+            time.monotonic() - started, response.status_code, response.headers
+        )
+        return response, key_id
+    finally:
+        release_slot(route, token, outcome)
+
+
+def _acquire_key(method: str, route: str, defer: bool = False) -> tuple[str, str]:
+    """
+    Takes a permit from the first key in the pool with budget left.
+    Returns (api_key, key_id). Raises InvalidKeyError if the pool is empty.
+    """
+    keys = get_active_keys()
+    if not keys:
+        _pause_for_exhausted_pool()
+    key_id = acquire_permit(method, route=route, key_ids=list(keys), defer=defer)
+    return keys[key_id], key_id
+
+
+def _pause_for_exhausted_pool() -> None:
+    """Pauses every worker once no valid key is left, then raises InvalidKeyError."""
+    logger.error(
+        "every riot api key is invalid or expired — pausing all workers for 1 hour, "
+        "update RIOT_API_KEYS in .env and restart the crawler",
+    )
+    set_pause_for_retry(retry_after_seconds=INVALID_KEY_PAUSE_SECONDS)
+    raise InvalidKeyError(pool_exhausted=True)
+
+
+def _handle_response(
+    url: str,
+    response: httpx.Response,
+    method: str,
+    route: str,
+    key_id: str | None = None,
+) -> dict:
+    """
+    Applies rate limit bookkeeping and status handling to a Riot API response.
+    Shared by the sync client above and crawler/services/async_riot_client.py.
+
+    Returns parsed JSON response as dict.
+    """
+    # Always update rate limit state from response headers
+    update_rate_limit(response.headers, method=method, route=route, key_id=key_id)
+    if key_id:
+        record_response(key_id, response.status_code)
+
+    if response.status_code == 429:
+        retry_after = int(response.headers.get("Retry-After", 60))
+        limit_type = response.headers.get("X-Rate-Limit-Type", "application")
+        logger.warning(
+            "rate limit exceeded",
+            url=url,
+            method=method,
+            limit_type=limit_type,
+            retry_after=retry_after,
+        )
+        # Method and service limits only concern this endpoint —
+        # an application limit pauses every endpoint on this route.
+        # Application and method limits belong to the key that sent the
+        # request, a service limit applies to every key
+        raise RateLimitError(
+            retry_after=retry_after,
+            method=None if limit_type == "application" else method,
+            route=route,
+            key_id=None if limit_type == "service" else key_id,
+        )
+
+    if response.status_code == 403:
+        if key_id and disable_key(key_id) > 0:
+            raise InvalidKeyError(key_id=key_id)
+        _pause_for_exhausted_pool()
+
+    if response.status_code == 404:
+        raise NotFoundError(url=url)
+
+    response.raise_for_status()
+    return response.json()
+
 
 # ---------------------------------------------------------------------------
 # Riot API endpoint wrappers
 # ---------------------------------------------------------------------------
 
-def fetch_league(tier: str) -> dict:
+def fetch_league(
+    tier: str,
+    region: str | None = None,
+    division: str = "I",
+    page: int = 1,
+) -> dict | list:
     """
-    Fetches the full league for a given tier.
-    e.g. tier = "challenger", "grandmaster", "master", "diamond"
+    Fetches the full league for a given tier, or one page of a lower tier
+    division. e.g. tier = "challenger", "grandmaster", "master", "diamond"
 
     For challenger/grandmaster/master:
         GET /tft/league/v1/{tier}
     For diamond and below:
-        GET /tft/league/v1/entries/RANKED_TFT/{tier}/I
+        GET /tft/league/v1/entries/RANKED_TFT/{tier}/{division}?page={page}
     """
-    base_url = _get_base_url(regional=False)
-    tier_lower = tier.lower()
+    route = _get_route(region, regional=False)
 
-    if tier_lower in ("challenger", "grandmaster", "master"):
-        url = f"{base_url}/tft/league/v1/{tier_lower}"
-    else:
-        url = f"{base_url}/tft/league/v1/entries/RANKED_TFT/{tier.upper()}/I"
+    logger.info("fetching league", tier=tier, division=division, page=page, route=route)
+    return _make_request(route, league_path(tier, division, page), LEAGUE_METHOD)
 
-    logger.info("fetching league", tier=tier)
-    return _make_request(url)
 
-
-def fetch_match_list(puuid: str, count: int = 20) -> list[str]:
+def fetch_match_list(
+    puuid: str,
+    count: int = 20,
+    region: str | None = None,
+    defer: bool = False,
+    start: int = 0,
+    start_time: int | None = None,
+) -> list[str]:
     """
-    Fetches the most recent match IDs for a given puuid.
+    Fetches the most recent match IDs for a given puuid, newest first.
     Returns a plain list of match ID strings.
+
+    start skips that many of the newest matches (paging), start_time (epoch
+    seconds) limits the list to games that started at or after it.
+    With defer=True long rate limit waits raise RateLimitPaused.
     """
-    base_url = _get_base_url(regional=True)
-    url = f"{base_url}/tft/match/v1/matches/by-puuid/{puuid}/ids?count={count}"
+    route = _get_route(region, regional=True)
+    path = f"/tft/match/v1/matches/by-puuid/{puuid}/ids?count={count}"
+    if start:
+        path += f"&start={start}"
+    if start_time is not None:
+        path += f"&startTime={start_time}"
 
-    logger.info("fetching match list", puuid=puuid)
-    return _make_request(url)
+    logger.info("fetching match list", puuid=puuid, route=route)
+    return _make_request(route, path, MATCH_LIST_METHOD, defer)
 
 
-def fetch_match(match_id: str) -> dict:
+def fetch_match(match_id: str, region: str | None = None, defer: bool = False) -> dict:
     """
     Fetches full match data for a given match ID.
     Returns the raw match JSON dict.
+    With defer=True long rate limit waits raise RateLimitPaused.
     """
-    base_url = _get_base_url(regional=True)
-    url = f"{base_url}/tft/match/v1/matches/{match_id}"
+    route = _get_route(region, regional=True)
+    path = match_path(match_id)
 
-    logger.info("fetching match", match_id=match_id)
-    return _make_request(url)
+    logger.info("fetching match", match_id=match_id, route=route)
+    return _make_request(route, path, MATCH_DETAIL_METHOD, defer)
+
+
+def match_path(match_id: str) -> str:
+    """Path of the match detail endpoint, shared with the async client."""
+    return f"/tft/match/v1/matches/{match_id}"
+
+
+def league_path(tier: str, division: str = "I", page: int = 1) -> str:
+    """
+    Path of a league endpoint, shared with the async client. Top tiers are
+    one league object — division and page only apply to the entries endpoint.
+    """
+    tier_lower = tier.lower()
+    if tier_lower in APEX_TIERS:
+        return f"/tft/league/v1/{tier_lower}"
+    return f"/tft/league/v1/entries/RANKED_TFT/{tier.upper()}/{division}?page={page}"
 
 
 # ---------------------------------------------------------------------------
@@ -155,9 +413,23 @@ def fetch_match(match_id: str) -> dict:
 # ---------------------------------------------------------------------------
 
 class RateLimitError(Exception):
-    """Raised when Riot API returns 429. Contains retry_after seconds."""
-    def __init__(self, retry_after: int = 60):
+    """Raised when Riot API returns 429. Contains retry_after seconds.
+    route is the routing value that was limited, and method is set when only
+    that endpoint's budget was exceeded, key_id names the API key whose budget
+    was exceeded — pass all three to set_pause_for_retry() so other routes,
+    endpoints and keys keep running.
+    """
+    def __init__(
+        self,
+        retry_after: int = 60,
+        method: str | None = None,
+        route: str | None = None,
+        key_id: str | None = None,
+    ):
         self.retry_after = retry_after
+        self.method = method
+        self.route = route
+        self.key_id = key_id
         super().__init__(f"Rate limit exceeded, retry after {retry_after}s")
 
 
@@ -170,11 +442,15 @@ class NotFoundError(Exception):
 
 class InvalidKeyError(Exception):
     """Raised when Riot API returns 403 — key is expired or invalid.
-    All workers are paused for INVALID_KEY_PAUSE_SECONDS automatically.
-    To recover: update RIOT_API_KEY in .env and restart the crawler.
+    The key is removed from the pool and the request is retried with the next
+    one. Once no key is left (pool_exhausted) all workers are paused for
+    INVALID_KEY_PAUSE_SECONDS automatically.
+    To recover: update RIOT_API_KEYS in .env and restart the crawler.
     """
-    def __init__(self):
+    def __init__(self, key_id: str | None = None, pool_exhausted: bool = False):
+        self.key_id = key_id
+        self.pool_exhausted = pool_exhausted
         super().__init__(
             "Riot API key invalid or expired. "
-            "Update RIOT_API_KEY in .env and restart the crawler."
+            "Update RIOT_API_KEYS in .env and restart the crawler."
         )
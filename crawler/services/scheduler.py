@@ -0,0 +1,211 @@
+import time
+
+import redis
+
+from shared.config import settings
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Redis client
+# ---------------------------------------------------------------------------
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# ---------------------------------------------------------------------------
+# Redis keys
+# ---------------------------------------------------------------------------
+
+# scheduler:budget:{region} — hash {tier: Riot requests spent this cycle}
+BUDGET_KEY_PREFIX = "scheduler:budget"
+
+# ---------------------------------------------------------------------------
+# Player scoring
+#
+# Every player gets a score from their tier, LP, games played since the last
+# cycle and how many new matches their last crawl found. The score becomes a
+# Celery priority — match list tasks are queued with it and every task they
+# spawn inherits it (task_inherit_parent_priority), so when the rate budget
+# is the bottleneck the queue drains Challenger games before Gold ones.
+# ---------------------------------------------------------------------------
+
+# Celery's Redis transport orders priorities 0 (highest) .. 9 (lowest)
+PRIORITY_STEPS = 10
+
+# Tier label of SEED_PUUIDS and of tasks queued without one
+SEED_TIER = "SEED"
+UNKNOWN_TIER = "UNKNOWN"
+
+# One point per tier — the bonuses below stay inside [0, 1] each, so a busy
+# player can overtake an idle one of the next tier up but never two tiers.
+# SEED_PUUIDS are hand-picked top players and the only work on day one of a
+# season — their weight clears Challenger plus every bonus, so they always
+# run first.
+TIER_WEIGHTS = {
+    SEED_TIER: 10,
+    "CHALLENGER": 7,
+    "GRANDMASTER": 6,
+    "MASTER": 5,
+    "DIAMOND": 4,
+    "EMERALD": 3,
+    "PLATINUM": 2,
+    "GOLD": 1,
+}
+
+# LP counted towards the full LP bonus — apex tiers share one open-ended
+# ladder, lower tiers reset every division
+APEX_LP_SCALE = 1000
+DIVISION_LP_SCALE = 100
+
+# Games played since the last cycle that earn the full activity bonus
+ACTIVITY_GAMES = 10
+
+# New matches found by the last crawl that earn the full yield bonus
+YIELD_MATCHES = 20
+
+# Activity bonus of players without a snapshot (first seen, seed puuids)
+UNKNOWN_ACTIVITY = 0.5
+
+# Budget counters are buffered in-process and flushed at most this often (seconds)
+BUDGET_FLUSH_SECONDS = 10
+
+# Per-process budget not yet flushed: {region: {tier: requests}}
+_pending_budget: dict[str, dict[str, int]] = {}
+_last_flush = time.monotonic()
+
+
+def score_player(
+    tier: str | None,
+    league_points: int = 0,
+    games_played: int | None = None,
+    matches_found: int | None = None,
+) -> float:
+    """
+    Crawl value of one player — higher is fetched first.
+
+    tier weight + LP bonus + activity bonus (games_played since the last
+    cycle, None when unknown) + yield bonus (matches_found by the last crawl).
+    """
+    tier = (tier or "").upper()
+    score = float(TIER_WEIGHTS.get(tier, 0))
+
+    lp_scale = APEX_LP_SCALE if tier in ("CHALLENGER", "GRANDMASTER", "MASTER") else DIVISION_LP_SCALE
+    score += min(max(league_points, 0) / lp_scale, 1.0)
+
+    if games_played is None:
+        score += UNKNOWN_ACTIVITY
+    else:
+        score += min(games_played / ACTIVITY_GAMES, 1.0)
+
+    score += min((matches_found or 0) / YIELD_MATCHES, 1.0)
+    return score
+
+
+def priority_for(score: float) -> int:
+    """Maps a score onto a Celery priority — 0 for the most valuable players."""
+    return max(0, min(PRIORITY_STEPS - 1, PRIORITY_STEPS - 1 - int(score)))
+
+
+def prioritise_players(
+    players: dict[str, dict],
+    matches_found: dict[str, int],
+) -> list[tuple[str, int]]:
+    """
+    Orders the players collected for a cycle, most valuable first.
+
+    players is {puuid: {"tier", "league_points", "expected_matches"}} from
+    collect_puuids_for_cycle(), matches_found is {puuid: matches found by the
+    last crawl}. Returns [(puuid, priority), ...] — queuing in this order
+    also keeps players of equal priority in score order.
+    """
+    scores = {
+        puuid: score_player(
+            player["tier"],
+            player["league_points"],
+            player["expected_matches"],
+            matches_found.get(puuid),
+        )
+        for puuid, player in players.items()
+    }
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [(puuid, priority_for(scores[puuid])) for puuid in ranked]
+
+
+# ---------------------------------------------------------------------------
+# Budget metrics
+# ---------------------------------------------------------------------------
+
+def record_budget(region: str | None, tier: str | None, requests: int = 1) -> None:
+    """
+    Counts Riot requests spent on a player of `tier`.
+    Called by the match list and match detail tasks after each fetch.
+    """
+    region = (region or settings.RIOT_REGION).lower()
+    usage = _pending_budget.setdefault(region, {})
+    tier = tier or UNKNOWN_TIER
+    usage[tier] = usage.get(tier, 0) + requests
+
+    if time.monotonic() - _last_flush >= BUDGET_FLUSH_SECONDS:
+        flush_budget()
+
+
+def flush_budget() -> None:
+    """Writes buffered budget counters to Redis in one round trip."""
+    global _last_flush
+
+    _last_flush = time.monotonic()
+    if not _pending_budget:
+        return
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for region, usage in _pending_budget.items():
+        for tier, requests in usage.items():
+            pipeline.hincrby(_budget_key(region), tier, requests)
+
+    try:
+        pipeline.execute()
+        _pending_budget.clear()
+    except Exception as e:
+        # Metrics must never break a request — keep the counts for the next flush
+        logger.warning("failed to flush crawl budget", error=str(e))
+
+
+def pop_tier_budget(region: str | None) -> dict[str, int]:
+    """
+    Returns {tier: requests} spent in the region since the last call and
+    resets the counters. Other workers flush their buffers every
+    BUDGET_FLUSH_SECONDS, so their last few seconds land in the next cycle.
+    """
+    flush_budget()
+    region = (region or settings.RIOT_REGION).lower()
+
+    pipeline = redis_client.pipeline()
+    pipeline.hgetall(_budget_key(region))
+    pipeline.delete(_budget_key(region))
+    usage, _ = pipeline.execute()
+    return {tier: int(requests) for tier, requests in usage.items()}
+
+
+def log_tier_budget(region: str | None) -> None:
+    """Logs the previous cycle's requests per tier — called by the league task."""
+    usage = pop_tier_budget(region)
+    total = sum(usage.values())
+    if not total:
+        return
+
+    logger.info(
+        "crawl budget by tier",
+        region=region,
+        requests=total,
+        tiers={tier: requests for tier, requests in sorted(usage.items(), key=lambda item: -item[1])},
+        share={tier: round(requests / total, 3) for tier, requests in usage.items()},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def _budget_key(region: str) -> str:
+    return f"{BUDGET_KEY_PREFIX}:{region}"
@@ -1,44 +1,84 @@
 from celery import shared_task
 
 from shared.logging import get_logger
+from crawler.db.postgres import get_matches_found
+from crawler.services.discovery import pop_discovered_count
+from crawler.services.fan_out import publish_many
+from crawler.services.key_pool import log_key_stats
 from crawler.services.league_seeder import collect_puuids_for_cycle
+from crawler.services.riot_client import _get_route
+from crawler.services.scheduler import log_tier_budget, prioritise_players
 
 logger = get_logger(__name__)
 
 
+# Queue is chosen per region by celeryconfig.route_task
 @shared_task(
     bind=True,
     name="crawler.tasks.league.fetch_league",
-    queue="league",
     max_retries=3,
     default_retry_delay=60,
     acks_late=True,
 )
-def fetch_league(self) -> None:
+def fetch_league(self, region: str | None = None) -> None:
     """
-    Entry point for each crawl cycle.
+    Entry point for each crawl cycle of one region.
     Collects puuids from top tier leagues using the cascading seeder strategy,
-    then queues a fetch_match_list task for each new puuid.
+    then queues a fetch_match_list task for each new puuid in the same region
+    that has played since the previous cycle.
+
+    Tasks are queued most valuable player first, with a Celery priority from
+    the scheduler's score — see crawler/services/scheduler.py.
 
     Triggered by Celery Beat when queue:match_list drains to empty.
     """
-    logger.info("league fetch started")
+    logger.info("league fetch started", region=region)
+
+    try:
+        log_key_stats(_get_route(region, regional=True))
+        log_tier_budget(region)
+        discovered = pop_discovered_count(region)
+        if discovered:
+            logger.info("players discovered last cycle", region=region, count=discovered)
+    except Exception as e:
+        logger.warning("cycle metrics unavailable", region=region, error=str(e))
 
     try:
         from crawler.tasks.match_list import fetch_match_list
 
-        puuids = collect_puuids_for_cycle()
+        players = collect_puuids_for_cycle(region)
 
-        if not puuids:
-            logger.warning("no new puuids collected, cycle ending")
+        if not players:
+            logger.warning("no new puuids collected, cycle ending", region=region)
             return
 
-        # Fan out — queue one match list task per puuid
-        for puuid in puuids:
-            fetch_match_list.apply_async(args=[puuid])
+        # Fan out — queue one match list task per puuid, best first,
+        # published in batches
+        ranked = prioritise_players(players, get_matches_found(list(players)))
+        publish_many(fetch_match_list, (
+            (
+                [puuid],
+                {
+                    "region": region,
+                    "expected_matches": players[puuid]["expected_matches"],
+                    "tier": players[puuid]["tier"],
+                },
+                {"priority": priority},
+            )
+            for puuid, priority in ranked
+        ))
+
+        priorities: dict[int, int] = {}
+        for _, priority in ranked:
+            priorities[priority] = priorities.get(priority, 0) + 1
 
-        logger.info("match list tasks queued", count=len(puuids))
+        logger.info(
+            "match list tasks queued",
+            region=region,
+            count=len(players),
+            priorities=dict(sorted(priorities.items())),
+        )
 
     except Exception as e:
-        logger.error("league fetch failed", error=str(e))
+        logger.error("league fetch failed", region=region, error=str(e))
         raise self.retry(exc=e)
@@ -1,31 +1,41 @@
+import asyncio
+import threading
+
 from celery import shared_task
 
+from shared.config import settings
 from shared.logging import get_logger
+from crawler.services.async_riot_client import fetch_matches as fetch_matches_api
 from crawler.services.riot_client import fetch_match as fetch_match_api, RateLimitError, NotFoundError
-from crawler.services.rate_limiter import set_pause_for_retry
+from crawler.services.rate_limiter import RateLimitPaused, set_pause_for_retry
+from crawler.services.scheduler import record_budget
 
 logger = get_logger(__name__)
 
 
+# Queue is chosen per region by celeryconfig.route_task
 @shared_task(
     bind=True,
     name="crawler.tasks.match_detail.fetch_match_detail",
-    queue="match_detail",
     max_retries=5,
     default_retry_delay=60,
     acks_late=True,
 )
-def fetch_match_detail(self, match_id: str) -> None:
+def fetch_match_detail(self, match_id: str, region: str | None = None, tier: str | None = None) -> None:
     """
     Fetches full match data for a given match ID from Riot API.
     On success, queues a save_match task with the raw JSON response.
+    tier labels the request in the per-tier budget metrics.
     """
     logger.info("fetching match detail", match_id=match_id)
 
     try:
         from crawler.tasks.save import save_match
 
-        raw_json = fetch_match_api(match_id)
+        raw_json = fetch_match_api(
+            match_id, region=region, defer=settings.RATE_LIMIT_DEFER_MODE
+        )
+        record_budget(region, tier)
 
         # Queue save task with raw JSON
         save_match.apply_async(args=[raw_json])
@@ -33,14 +43,107 @@ def fetch_match_detail(self, match_id: str) -> None:
         logger.info("match detail fetched, save task queued", match_id=match_id)
 
     except RateLimitError as e:
-        set_pause_for_retry(e.retry_after)
+        set_pause_for_retry(
+            e.retry_after, method=e.method, route=e.route, key_id=e.key_id
+        )
         raise self.retry(exc=e, countdown=e.retry_after)
 
+    except RateLimitPaused as e:
+        # Re-schedule instead of sleeping so this worker slot can run
+        # other queues (e.g. save) while the budget recovers
+        self.apply_async(args=[match_id], kwargs={"region": region, "tier": tier}, countdown=e.countdown)
+        logger.info("match detail deferred", match_id=match_id, countdown=round(e.countdown, 2))
+
     except NotFoundError:
         # Match not found — log and discard, no retry needed
+        record_budget(region, tier)
         logger.warning("match not found, discarding", match_id=match_id)
         return
 
     except Exception as e:
         logger.error("match detail fetch failed", match_id=match_id, error=str(e))
         raise self.retry(exc=e)
+
+
+# Queue is chosen per region by celeryconfig.route_task
+@shared_task(
+    bind=True,
+    name="crawler.tasks.match_detail.fetch_match_details_batch",
+    max_retries=5,
+    default_retry_delay=60,
+    acks_late=True,
+)
+def fetch_match_details_batch(
+    self,
+    match_ids: list[str],
+    region: str | None = None,
+    tier: str | None = None,
+) -> None:
+    """
+    Fetches a batch of matches concurrently inside this worker process.
+    Fetched matches are queued for saving as they complete, in save_matches
+    tasks of MATCH_DETAIL_BATCH_SAVE_SIZE — a slow match never holds back
+    the rest, and a crash loses at most one unsent group.
+
+    Matches that could not be fetched fall back to individual
+    fetch_match_detail tasks so they keep their own retry budget. With
+    RATE_LIMIT_DEFER_MODE a long rate limit wait re-schedules the matches
+    not fetched yet as one batch, instead of sleeping in the worker.
+    """
+    logger.info("fetching match detail batch", count=len(match_ids))
+
+    try:
+        from crawler.tasks.save import save_matches
+
+        pending: list[dict] = []
+        lock = threading.Lock()
+
+        def flush() -> None:
+            with lock:
+                raw_jsons = pending[:]
+                pending.clear()
+            if raw_jsons:
+                save_matches.apply_async(args=[raw_jsons])
+
+        def on_result(raw_json: dict) -> None:
+            with lock:
+                pending.append(raw_json)
+                full = len(pending) >= settings.MATCH_DETAIL_BATCH_SAVE_SIZE
+            if full:
+                flush()
+
+        try:
+            outcome = asyncio.run(fetch_matches_api(
+                match_ids, on_result, region=region, defer=settings.RATE_LIMIT_DEFER_MODE
+            ))
+        finally:
+            # Whatever was fetched is saved, even if the batch itself failed
+            flush()
+        record_budget(region, tier, len(outcome["fetched"]) + len(outcome["not_found"]))
+
+        if outcome["deferred"]:
+            # Re-schedule the rest instead of sleeping, like fetch_match_detail
+            self.apply_async(
+                args=[outcome["deferred"]],
+                kwargs={"region": region, "tier": tier},
+                countdown=outcome["countdown"],
+            )
+
+        for match_id in outcome["failed"]:
+            fetch_match_detail.apply_async(
+                args=[match_id],
+                kwargs={"region": region, "tier": tier},
+                countdown=self.default_retry_delay,
+            )
+
+        logger.info(
+            "match detail batch complete",
+            fetched=len(outcome["fetched"]),
+            not_found=len(outcome["not_found"]),
+            requeued=len(outcome["failed"]),
+            deferred=len(outcome["deferred"]),
+        )
+
+    except Exception as e:
+        logger.error("match detail batch failed", count=len(match_ids), error=str(e))
+        raise self.retry(exc=e)
@@ -1,70 +1,209 @@
+import math
+from datetime import datetime, timedelta, timezone
+
 from celery import shared_task
 
+from shared.config import settings
 from shared.logging import get_logger
 from crawler.services.riot_client import fetch_match_list as fetch_match_list_api, RateLimitError
-from crawler.services.deduplication import check_and_mark_match
-from crawler.services.rate_limiter import set_pause_for_retry
-from crawler.db.postgres import upsert_player_crawl
+from crawler.services.deduplication import claim_matches
+from crawler.services.fan_out import publish_many
+from crawler.services.rate_limiter import RateLimitPaused, set_pause_for_retry
+from crawler.services.scheduler import record_budget
+from crawler.db.postgres import get_player_crawl, record_player_crawl
 
 logger = get_logger(__name__)
 
+# ---------------------------------------------------------------------------
+# Incremental match lists
+#
+# A player crawled before only needs games started since that crawl. The
+# window reaches back WATERMARK_OVERLAP_MINUTES further so a game that was
+# still running at the last crawl is not missed — anything already known in
+# the overlap is dropped by the dedup claim.
+# ---------------------------------------------------------------------------
+
+# Longer than any TFT game
+WATERMARK_OVERLAP_MINUTES = 60
+
+# Page size for first crawls and players without a game rate yet
+DEFAULT_COUNT = 20
+
+# Page size bounds — a request costs the same rate limit whatever its size,
+# so pages are never tiny. 200 is Riot's maximum.
+MIN_COUNT = 5
+MAX_COUNT = 200
 
+# Expected games are padded by this factor so one page is usually enough
+COUNT_HEADROOM = 1.5
+
+# Weight of the newest observation in the smoothed games per hour
+GAME_RATE_SMOOTHING = 0.5
+
+
+# Queue is chosen per region by celeryconfig.route_task
 @shared_task(
     bind=True,
     name="crawler.tasks.match_list.fetch_match_list",
-    queue="match_list",
     max_retries=5,
     default_retry_delay=60,
     acks_late=True,
 )
-def fetch_match_list(self, puuid: str) -> None:
+def fetch_match_list(
+    self,
+    puuid: str,
+    region: str | None = None,
+    start: int = 0,
+    expected_matches: int | None = None,
+    tier: str | None = None,
+) -> None:
     """
-    Fetches the 20 most recent match IDs for a given puuid.
+    Fetches the match IDs a player played since their last crawl.
     For each new match ID, queues a fetch_match_detail task.
 
-    If all 20 IDs are already known, the player is up to date — stop.
+    First crawls fetch the 20 most recent IDs. After that only games started
+    since the last crawl are requested, with a page size sized from the
+    player's observed game rate. A full page means there may be more, so the
+    next page is fetched — heavy grinders are captured completely instead of
+    being cut off at 20. expected_matches — ranked games played since the
+    last cycle, from the league snapshot — raises the page size when the
+    game rate underestimates it. start resumes paging after a deferral or retry.
+
+    tier labels the requests in the per-tier budget metrics. The task's
+    Celery priority is inherited by the match detail tasks it queues.
+
+    If no returned ID is new, the player is up to date — stop.
     """
     logger.info("fetching match list", puuid=puuid)
+    crawl_started_at = datetime.utcnow()
 
     try:
-        from crawler.tasks.match_detail import fetch_match_detail
+        from crawler.tasks.match_detail import fetch_match_detail, fetch_match_details_batch
 
-        match_ids: list[str] = fetch_match_list_api(puuid, count=20)
+        crawl = get_player_crawl(puuid)
+        count, start_time = plan_match_list(crawl, crawl_started_at, expected_matches)
 
-        if not match_ids:
-            logger.info("empty match list returned", puuid=puuid)
-            upsert_player_crawl(puuid, matches_found=0)
-            return
+        match_ids: list[str] = []
+        new_match_ids: list[str] = []
+        while True:
+            page = fetch_match_list_api(
+                puuid,
+                count=count,
+                region=region,
+                defer=settings.RATE_LIMIT_DEFER_MODE,
+                start=start,
+                start_time=start_time,
+            )
+            match_ids.extend(page)
+            record_budget(region, tier)
+
+            # Claim all IDs in one round trip — queue only new ones
+            new_page_ids = claim_matches(page)
+            new_match_ids.extend(new_page_ids)
+
+            # Fan out per page so a deferral of the next page loses nothing
+            if new_page_ids:
+                if settings.MATCH_DETAIL_BATCH_MODE:
+                    fetch_match_details_batch.apply_async(
+                        args=[new_page_ids], kwargs={"region": region, "tier": tier}
+                    )
+                else:
+                    publish_many(fetch_match_detail, (
+                        ([match_id], {"region": region, "tier": tier}, {})
+                        for match_id in new_page_ids
+                    ))
 
-        # Check each match ID — queue only new ones
-        new_match_ids = []
-        for match_id in match_ids:
-            if check_and_mark_match(match_id):
-                new_match_ids.append(match_id)
+            # Only windowed lists are paged — first crawls stop at one page
+            if start_time is None or len(page) < count:
+                break
+            start += count
 
-        # If all 20 are already known, player is fully up to date
+        games_per_hour = estimate_games_per_hour(crawl, len(match_ids), start_time, crawl_started_at)
+
+        # If no returned ID is new, player is fully up to date
         if not new_match_ids:
             logger.info("player fully up to date, no new matches", puuid=puuid)
-            upsert_player_crawl(puuid, matches_found=0)
+            record_player_crawl(puuid, 0, games_per_hour, crawl_started_at)
             return
 
-        # Fan out — queue one match detail task per new match ID
-        for match_id in new_match_ids:
-            fetch_match_detail.apply_async(args=[match_id])
-
-        upsert_player_crawl(puuid, matches_found=len(new_match_ids))
+        record_player_crawl(puuid, len(new_match_ids), games_per_hour, crawl_started_at)
 
         logger.info(
             "match detail tasks queued",
             puuid=puuid,
             new_matches=len(new_match_ids),
             already_known=len(match_ids) - len(new_match_ids),
+            count=count,
+            pages=start // count + 1,
         )
 
     except RateLimitError as e:
-        set_pause_for_retry(e.retry_after)
-        raise self.retry(exc=e, countdown=e.retry_after)
+        set_pause_for_retry(
+            e.retry_after, method=e.method, route=e.route, key_id=e.key_id
+        )
+        raise self.retry(exc=e, countdown=e.retry_after, kwargs=_resume_kwargs(region, start, expected_matches, tier))
+
+    except RateLimitPaused as e:
+        # Re-schedule instead of sleeping so this worker slot can run
+        # other queues (e.g. save) while the budget recovers
+        self.apply_async(args=[puuid], kwargs=_resume_kwargs(region, start, expected_matches, tier), countdown=e.countdown)
+        logger.info("match list deferred", puuid=puuid, start=start, countdown=round(e.countdown, 2))
 
     except Exception as e:
         logger.error("match list fetch failed", puuid=puuid, error=str(e))
-        raise self.retry(exc=e)
+        raise self.retry(exc=e, kwargs=_resume_kwargs(region, start, expected_matches, tier))
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def plan_match_list(
+    crawl: dict | None,
+    now: datetime,
+    expected_matches: int | None = None,
+) -> tuple[int, int | None]:
+    """
+    Returns (count, start_time) for a player's next match list request.
+    start_time is None for players never crawled — they get DEFAULT_COUNT of
+    their most recent games. Otherwise count covers the games the player is
+    expected to have played since start_time — from the game rate, padded by
+    COUNT_HEADROOM, or expected_matches if that is higher.
+    """
+    if crawl is None:
+        return DEFAULT_COUNT, None
+
+    window_start = crawl["last_crawled_at"] - timedelta(minutes=WATERMARK_OVERLAP_MINUTES)
+    start_time = int(window_start.replace(tzinfo=timezone.utc).timestamp())
+
+    if crawl["games_per_hour"] is None and expected_matches is None:
+        return DEFAULT_COUNT, start_time
+
+    hours = (now - window_start).total_seconds() / 3600
+    expected = (crawl["games_per_hour"] or 0.0) * hours * COUNT_HEADROOM
+    expected = max(expected, expected_matches or 0)
+    return max(MIN_COUNT, min(MAX_COUNT, math.ceil(expected) + 1)), start_time
+
+
+def _resume_kwargs(region: str | None, start: int, expected_matches: int | None, tier: str | None) -> dict:
+    return {"region": region, "start": start, "expected_matches": expected_matches, "tier": tier}
+
+
+def estimate_games_per_hour(
+    crawl: dict | None,
+    games: int,
+    start_time: int | None,
+    now: datetime,
+) -> float | None:
+    """
+    Smoothed games per hour after a windowed crawl that returned `games` IDs.
+    Returns None when there is no window to measure (first crawls).
+    """
+    if start_time is None:
+        return None
+
+    hours = max(now.replace(tzinfo=timezone.utc).timestamp() - start_time, 60) / 3600
+    observed = games / hours
+    if crawl is None or crawl["games_per_hour"] is None:
+        return observed
+    return GAME_RATE_SMOOTHING * observed + (1 - GAME_RATE_SMOOTHING) * crawl["games_per_hour"]
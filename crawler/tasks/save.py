@@ -3,9 +3,12 @@ from pydantic import ValidationError
 
 from shared.logging import get_logger
 from shared.models.match import MatchResponseModel
+from crawler.services.discovery import discover_players
+from crawler.services.fan_out import publish_many
 from crawler.services.match_parser import explode_match_to_unit_rows
 from crawler.services.patch_detector import detect_patch_change
-from crawler.db.postgres import save_match as save_match_postgres, get_player_ranks
+from crawler.services.rank_cache import get_player_ranks
+from crawler.db.postgres import save_match as save_match_postgres, save_matches as save_matches_postgres
 from crawler.db.clickhouse import insert_unit_rows
 
 logger = get_logger(__name__)
@@ -28,8 +31,9 @@ def save_match(self, raw_json: dict) -> None:
     2. Save raw JSON to PostgreSQL
     3. Detect patch change — drop old ClickHouse partitions if needed
     4. Look up player ranks from PostgreSQL for LP denormalization
-    5. Explode match into flat unit rows
-    6. Batch insert unit rows into ClickHouse
+    5. Queue match list crawls for newly seen participants (DISCOVERY_ENABLED)
+    6. Explode match into flat unit rows
+    7. Batch insert unit rows into ClickHouse
     """
     match_id = raw_json.get("metadata", {}).get("match_id", "unknown")
     logger.info("save task started", match_id=match_id)
@@ -59,14 +63,20 @@ def save_match(self, raw_json: dict) -> None:
         puuids = [p.puuid for p in match.info.participants]
         player_ranks = get_player_ranks(puuids)
 
-        # Step 5 — Explode match into flat unit rows
+        # Step 5 — Snowball discovery — never worth failing the save over
+        try:
+            _queue_discovered_players(match_id, puuids, player_ranks)
+        except Exception as e:
+            logger.warning("player discovery failed", match_id=match_id, error=str(e))
+
+        # Step 6 — Explode match into flat unit rows
         unit_rows = explode_match_to_unit_rows(match, player_ranks)
 
         if not unit_rows:
             logger.warning("no unit rows produced", match_id=match_id)
             return
 
-        # Step 6 — Batch insert into ClickHouse
+        # Step 7 — Batch insert into ClickHouse
         insert_unit_rows(unit_rows)
 
         logger.info(
@@ -79,3 +89,109 @@ def save_match(self, raw_json: dict) -> None:
     except Exception as e:
         logger.error("save task failed", match_id=match_id, error=str(e))
         raise self.retry(exc=e)
+
+
+@shared_task(
+    bind=True,
+    name="crawler.tasks.save.save_matches",
+    queue="save",
+    max_retries=3,
+    default_retry_delay=30,
+    acks_late=True,
+)
+def save_matches(self, raw_jsons: list[dict], saved_ids: list[str] | None = None) -> None:
+    """
+    Batch version of save_match — queued by fetch_match_details_batch.
+
+    Same steps, but each database step runs once for the whole batch:
+    one multi-row INSERT ... ON CONFLICT DO NOTHING into PostgreSQL, one rank
+    lookup for every participant, one patch check (newest match) and one
+    ClickHouse insert. A match failing validation is discarded on its own.
+
+    The PostgreSQL insert commits before the later steps run. If one of them
+    fails, the retry carries the IDs this batch already saved in saved_ids,
+    so those matches are still processed instead of being skipped as
+    already stored.
+    """
+    logger.info("save batch started", count=len(raw_jsons), resumed=len(saved_ids or []))
+    saved_ids = set(saved_ids or [])
+
+    try:
+        # Step 1 — Validate with Pydantic, match by match
+        matches: dict[str, tuple[MatchResponseModel, dict]] = {}
+        for raw_json in raw_jsons:
+            match_id = raw_json.get("metadata", {}).get("match_id", "unknown")
+            try:
+                match = MatchResponseModel(**raw_json)
+            except ValidationError as e:
+                logger.error(
+                    "match validation failed, discarding",
+                    match_id=match_id,
+                    error=str(e),
+                )
+                continue
+            matches[match.metadata.match_id] = (match, raw_json)
+
+        # Step 2 — Save raw JSON to PostgreSQL in one statement
+        saved_ids |= save_matches_postgres(list(matches.values()))
+        saved = [match for match_id, (match, _) in matches.items() if match_id in saved_ids]
+        if not saved:
+            return
+
+        # Step 3 — Detect patch change from the newest match
+        newest = max(saved, key=lambda match: match.info.game_datetime)
+        detect_patch_change(newest.info.game_version)
+
+        # Step 4 — One rank lookup for every participant of the batch
+        participants = {
+            match.metadata.match_id: [p.puuid for p in match.info.participants]
+            for match in saved
+        }
+        player_ranks = get_player_ranks(list({
+            puuid for puuids in participants.values() for puuid in puuids
+        }))
+
+        # Step 5 — Snowball discovery — never worth failing the save over
+        for match_id, puuids in participants.items():
+            try:
+                _queue_discovered_players(match_id, puuids, player_ranks)
+            except Exception as e:
+                logger.warning("player discovery failed", match_id=match_id, error=str(e))
+
+        # Step 6 — Explode matches into flat unit rows
+        unit_rows = [
+            row for match in saved
+            for row in explode_match_to_unit_rows(match, player_ranks)
+        ]
+
+        if not unit_rows:
+            logger.warning("no unit rows produced", count=len(saved))
+            return
+
+        # Step 7 — One insert into ClickHouse for the whole batch
+        insert_unit_rows(unit_rows)
+
+        logger.info(
+            "save batch complete",
+            saved=len(saved),
+            skipped=len(raw_jsons) - len(saved),
+            unit_rows=len(unit_rows),
+        )
+
+    except Exception as e:
+        logger.error("save batch failed", count=len(raw_jsons), error=str(e))
+        raise self.retry(exc=e, args=[raw_jsons], kwargs={"saved_ids": sorted(saved_ids)})
+
+
+def _queue_discovered_players(match_id: str, puuids: list[str], player_ranks: dict[str, dict]) -> None:
+    from crawler.tasks.match_list import fetch_match_list
+
+    players = discover_players(match_id, puuids, player_ranks)
+    publish_many(fetch_match_list, (
+        (
+            [player["puuid"]],
+            {"region": player["region"], "tier": player["tier"]},
+            {"priority": player["priority"]},
+        )
+        for player in players
+    ))
@@ -0,0 +1,41 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class FakeRiotSettings(BaseSettings):
+    # -------------------------------------------------------------------------
+    # RATE LIMITS — "max_calls:window_seconds,..." like Riot's headers
+    # -------------------------------------------------------------------------
+    APP_RATE_LIMIT: str = "20:1,100:120"
+    LEAGUE_RATE_LIMIT: str = "30:10,500:600"
+    MATCH_LIST_RATE_LIMIT: str = "600:10"
+    MATCH_DETAIL_RATE_LIMIT: str = "250:10"
+
+    # Keys that are accepted — anything else gets a 403. Empty accepts any key
+    VALID_KEYS: list[str] = []
+
+    # -------------------------------------------------------------------------
+    # LATENCY AND ERRORS
+    # -------------------------------------------------------------------------
+    LATENCY_MS: float = 80.0
+    LATENCY_JITTER_MS: float = 40.0
+    # Share of requests answered with a 503 / 404 instead of a payload
+    ERROR_RATE: float = 0.0
+    NOT_FOUND_RATE: float = 0.0
+
+    # -------------------------------------------------------------------------
+    # SYNTHETIC DATA
+    # -------------------------------------------------------------------------
+    # Recorded match used as the template for every synthetic match
+    MATCH_TEMPLATE_PATH: str = "tests/fixtures/match_response.json"
+    PLAYERS_PER_TIER: int = 200
+    # How often each synthetic player finishes a new game
+    MINUTES_PER_GAME: int = 30
+
+    model_config = SettingsConfigDict(
+        env_prefix="FAKE_RIOT_",
+        case_sensitive=True,
+    )
+
+
+# Single instance imported across the fake server
+settings = FakeRiotSettings()
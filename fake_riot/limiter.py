@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from collections import deque
+
+from fake_riot.config import settings
+
+# ---------------------------------------------------------------------------
+# In-memory sliding window limiter mimicking Riot's enforcement
+#
+# Riot counts calls per API key and routing value, once for the application
+# and once for the method. Calls rejected with a 429 are not counted.
+# ---------------------------------------------------------------------------
+
+# Riot method names — same names the crawler's limiter uses — and the
+# setting holding each method's limits
+METHOD_LIMIT_SETTINGS = {
+    "league": "LEAGUE_RATE_LIMIT",
+    "match_list": "MATCH_LIST_RATE_LIMIT",
+    "match_detail": "MATCH_DETAIL_RATE_LIMIT",
+}
+
+# {(api_key, route, scope, window_seconds): deque of call timestamps}
+_windows: dict[tuple[str, str, str, int], deque] = {}
+_lock = threading.Lock()
+
+
+def check_and_record(api_key: str, route: str, method: str) -> tuple[int, dict[str, str]]:
+    """
+    Counts one call against the key's app and method budgets on a route.
+
+    Returns (status_code, headers): 200 with the current counts, or 429 with
+    Retry-After and X-Rate-Limit-Type when either budget is exhausted.
+    """
+    app_limits = parse_limits(settings.APP_RATE_LIMIT)
+    method_limits = parse_limits(getattr(settings, METHOD_LIMIT_SETTINGS[method]))
+    now = time.monotonic()
+
+    with _lock:
+        app_wait = _wait_seconds(api_key, route, "app", app_limits, now)
+        method_wait = _wait_seconds(api_key, route, method, method_limits, now)
+
+        if app_wait == 0 and method_wait == 0:
+            _record(api_key, route, "app", app_limits, now)
+            _record(api_key, route, method, method_limits, now)
+
+        headers = {
+            "X-App-Rate-Limit": format_limits(app_limits),
+            "X-App-Rate-Limit-Count": format_limits(_counts(api_key, route, "app", app_limits)),
+            "X-Method-Rate-Limit": format_limits(method_limits),
+            "X-Method-Rate-Limit-Count": format_limits(_counts(api_key, route, method, method_limits)),
+        }
+
+    if app_wait or method_wait:
+        headers["Retry-After"] = str(math.ceil(max(app_wait, method_wait)))
+        headers["X-Rate-Limit-Type"] = "application" if app_wait >= method_wait else "method"
+        return 429, headers
+
+    return 200, headers
+
+
+def reset() -> None:
+    """Forgets every recorded call."""
+    with _lock:
+        _windows.clear()
+
+
+def _wait_seconds(api_key: str, route: str, scope: str, limits: dict[int, int], now: float) -> float:
+    wait = 0.0
+    for window_seconds, max_calls in limits.items():
+        calls = _trimmed(api_key, route, scope, window_seconds, now)
+        if len(calls) >= max_calls:
+            wait = max(wait, calls[len(calls) - max_calls] + window_seconds - now)
+    return wait
+
+
+def _record(api_key: str, route: str, scope: str, limits: dict[int, int], now: float) -> None:
+    for window_seconds in limits:
+        _windows[(api_key, route, scope, window_seconds)].append(now)
+
+
+def _counts(api_key: str, route: str, scope: str, limits: dict[int, int]) -> dict[int, int]:
+    return {
+        window_seconds: len(_windows[(api_key, route, scope, window_seconds)])
+        for window_seconds in limits
+    }
+
+
+def _trimmed(api_key: str, route: str, scope: str, window_seconds: int, now: float) -> deque:
+    calls = _windows.setdefault((api_key, route, scope, window_seconds), deque())
+    while calls and calls[0] <= now - window_seconds:
+        calls.popleft()
+    return calls
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def parse_limits(header: str) -> dict[int, int]:
+    """'20:1,100:120' → {1: 20, 120: 100} ({window_seconds: max_calls})."""
+    limits = {}
+    for part in header.split(","):
+        if ":" in part:
+            max_calls, window_seconds = part.strip().split(":")
+            limits[int(window_seconds)] = int(max_calls)
+    return limits
+
+
+def format_limits(limits: dict[int, int]) -> str:
+    """{1: 20, 120: 100} → '20:1,100:120' — counts are formatted the same way."""
+    return ",".join(f"{value}:{window}" for window, value in sorted(limits.items()))
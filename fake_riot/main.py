@@ -0,0 +1,130 @@
+import asyncio
+import random
+
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import JSONResponse
+
+from shared.logging import get_logger
+from fake_riot import limiter, payloads
+from fake_riot.config import settings
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Local stand-in for the Riot TFT API
+#
+# Serves the league, match list and match endpoints the crawler uses under a
+# /{route} prefix, so the crawler can point RIOT_API_BASE_URL at
+# http://fake_riot:8080/{route} and keep one budget per routing value.
+# ---------------------------------------------------------------------------
+
+app = FastAPI(
+    title="Fake Riot API",
+    description="Synthetic TFT league and match data with Riot-style rate limits",
+    version="1.0.0",
+)
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.post("/reset")
+def reset():
+    """Clears every rate limit window — call between benchmark runs."""
+    limiter.reset()
+    return {"status": "ok"}
+
+
+# ---------------------------------------------------------------------------
+# Riot endpoints
+# ---------------------------------------------------------------------------
+
+@app.get("/{route}/tft/league/v1/entries/RANKED_TFT/{tier}/{division}")
+async def get_league_entries(
+    route: str,
+    tier: str,
+    division: str,
+    page: int = Query(default=1, ge=1),
+    x_riot_token: str = Header(default=""),
+):
+    return await _respond(
+        x_riot_token, route, "league",
+        lambda: payloads.league_entries(route, tier, division, page),
+    )
+
+
+@app.get("/{route}/tft/league/v1/{tier}")
+async def get_league(route: str, tier: str, x_riot_token: str = Header(default="")):
+    return await _respond(
+        x_riot_token, route, "league",
+        lambda: payloads.league_response(route, tier),
+    )
+
+
+@app.get("/{route}/tft/match/v1/matches/by-puuid/{puuid}/ids")
+async def get_match_ids(
+    route: str,
+    puuid: str,
+    start: int = 0,
+    count: int = Query(default=20, le=200),
+    startTime: int | None = None,
+    endTime: int | None = None,
+    x_riot_token: str = Header(default=""),
+):
+    return await _respond(
+        x_riot_token, route, "match_list",
+        lambda: payloads.match_ids(route, puuid, start, count, startTime, endTime),
+    )
+
+
+@app.get("/{route}/tft/match/v1/matches/{match_id}")
+async def get_match(route: str, match_id: str, x_riot_token: str = Header(default="")):
+    return await _respond(
+        x_riot_token, route, "match_detail",
+        lambda: payloads.match_detail(match_id),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+async def _respond(api_key: str, route: str, method: str, build_payload) -> JSONResponse:
+    """
+    Applies what every real endpoint does before returning a payload:
+    key check, rate limiting, latency and injected failures.
+    """
+    if settings.VALID_KEYS and api_key not in settings.VALID_KEYS:
+        return _error(403, "Forbidden")
+
+    status_code, headers = limiter.check_and_record(api_key, route, method)
+    if status_code == 429:
+        logger.info("fake riot rate limited", route=route, method=method, **headers)
+        return _error(429, "Rate limit exceeded", headers)
+
+    await asyncio.sleep(_latency_seconds())
+
+    if random.random() < settings.ERROR_RATE:
+        return _error(503, "Service unavailable", headers)
+
+    payload = build_payload()
+    if payload is None or random.random() < settings.NOT_FOUND_RATE:
+        return _error(404, "Data not found", headers)
+
+    return JSONResponse(payload, headers=headers)
+
+
+def _latency_seconds() -> float:
+    latency_ms = random.gauss(settings.LATENCY_MS, settings.LATENCY_JITTER_MS)
+    return max(0.0, latency_ms) / 1000
+
+
+def _error(status_code: int, message: str, headers: dict | None = None) -> JSONResponse:
+    # Same body shape the real API returns for errors
+    return JSONResponse(
+        {"status": {"message": message, "status_code": status_code}},
+        status_code=status_code,
+        headers=headers,
+    )
@@ -0,0 +1,241 @@
+import copy
+import functools
+import hashlib
+import json
+import random
+import time
+
+from fake_riot.config import settings
+
+# ---------------------------------------------------------------------------
+# Synthetic ladder
+#
+# Every route has PLAYERS_PER_TIER players in each tier below, numbered
+# 0..N-1 across the whole ladder. Every MINUTES_PER_GAME minutes a new game
+# slot starts and the ladder is split into lobbies of 8 consecutive players,
+# shifted by one each slot — so lobbies change over time and every match is
+# shared by 8 players, just like real match histories.
+# ---------------------------------------------------------------------------
+
+TIERS = [
+    "CHALLENGER",
+    "GRANDMASTER",
+    "MASTER",
+    "DIAMOND",
+    "EMERALD",
+    "PLATINUM",
+    "GOLD",
+]
+
+LOBBY_SIZE = 8
+
+# Lower tiers are split evenly across these divisions and served in pages
+DIVISIONS = ["I", "II", "III", "IV"]
+ENTRIES_PAGE_SIZE = 205
+
+# Platform prefix used in match IDs, per routing value
+MATCH_ID_PREFIXES = {
+    "europe": "EUW1",
+    "americas": "NA1",
+    "asia": "KR",
+    "sea": "SG2",
+}
+
+
+# ---------------------------------------------------------------------------
+# League
+# ---------------------------------------------------------------------------
+
+def league_response(route: str, tier: str) -> dict:
+    """Top tier league object — GET /tft/league/v1/{tier}."""
+    tier = tier.upper()
+    return {
+        "tier": tier,
+        "leagueId": f"fake-{route}-{tier.lower()}",
+        "queue": "RANKED_TFT",
+        "name": f"Fake {tier.title()}",
+        "entries": [_league_entry(route, tier, i, division="I") for i in _tier_players(tier)],
+    }
+
+
+def league_entries(route: str, tier: str, division: str, page: int = 1) -> list[dict]:
+    """
+    One page of a lower tier division — GET /tft/league/v1/entries/RANKED_TFT/{tier}/{division}?page=.
+    Pages past the last player are empty, like the real endpoint.
+    """
+    tier = tier.upper()
+    players = _division_players(tier, division)
+    first = (max(page, 1) - 1) * ENTRIES_PAGE_SIZE
+    return [
+        {**_league_entry(route, tier, i, division), "tier": tier, "queueType": "RANKED_TFT"}
+        for i in players[first:first + ENTRIES_PAGE_SIZE]
+    ]
+
+
+def _league_entry(route: str, tier: str, index: int, division: str) -> dict:
+    rng = random.Random(index)
+    games = _games_played(index)
+    wins = games // 4 + rng.randint(0, 10)
+    return {
+        "puuid": player_puuid(route, index),
+        "leaguePoints": rng.randint(0, 1000) if tier in TIERS[:3] else rng.randint(0, 99),
+        "rank": division,
+        "wins": wins,
+        "losses": max(0, games - wins),
+        "veteran": rng.random() < 0.2,
+        "inactive": False,
+        "freshBlood": rng.random() < 0.1,
+        "hotStreak": rng.random() < 0.1,
+    }
+
+
+def _tier_players(tier: str) -> range:
+    start = TIERS.index(tier) * settings.PLAYERS_PER_TIER if tier in TIERS else 0
+    return range(start, start + settings.PLAYERS_PER_TIER)
+
+
+def _division_players(tier: str, division: str) -> range:
+    if division not in DIVISIONS:
+        return range(0)
+    return _tier_players(tier)[DIVISIONS.index(division)::len(DIVISIONS)]
+
+
+# ---------------------------------------------------------------------------
+# Match list
+# ---------------------------------------------------------------------------
+
+def match_ids(
+    route: str,
+    puuid: str,
+    start: int = 0,
+    count: int = 20,
+    start_time: int | None = None,
+    end_time: int | None = None,
+) -> list[str]:
+    """
+    Most recent match IDs of a player, newest first — honours the same
+    start / count / startTime / endTime parameters as the real endpoint.
+    """
+    index = player_index(puuid)
+    newest_slot = _current_slot()
+    if end_time is not None:
+        newest_slot = min(newest_slot, end_time // _slot_seconds())
+
+    ids = []
+    for slot in range(newest_slot, -1, -1):
+        if start_time is not None and _slot_start(slot) < start_time:
+            break
+        ids.append(_match_id(route, slot, _lobby_of(index, slot)))
+        if len(ids) >= start + count:
+            break
+
+    return ids[start:start + count]
+
+
+# ---------------------------------------------------------------------------
+# Match detail
+# ---------------------------------------------------------------------------
+
+def match_detail(match_id: str) -> dict | None:
+    """
+    Builds the match for a synthetic match ID from the recorded template,
+    with the lobby's puuids, fresh placements and the slot's timestamps.
+    Returns None for IDs this server never handed out.
+    """
+    parsed = _parse_match_id(match_id)
+    if parsed is None:
+        return None
+    route, slot, lobby = parsed
+
+    puuids = [player_puuid(route, index) for index in _lobby_members(slot, lobby)]
+    placements = list(range(1, LOBBY_SIZE + 1))
+    random.Random(match_id).shuffle(placements)
+
+    match = copy.deepcopy(_match_template())
+    match["metadata"]["match_id"] = match_id
+    match["metadata"]["participants"] = puuids
+
+    info = match["info"]
+    info["gameId"] = int(match_id.split("_", 1)[1])
+    info["game_datetime"] = _slot_start(slot) * 1000
+    info["gameCreation"] = _slot_start(slot) * 1000
+    for participant, puuid, placement in zip(info["participants"], puuids, placements):
+        participant["puuid"] = puuid
+        participant["placement"] = placement
+        participant["win"] = placement <= 4
+
+    return match
+
+
+@functools.lru_cache(maxsize=1)
+def _match_template() -> dict:
+    with open(settings.MATCH_TEMPLATE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# Helper
+# ---------------------------------------------------------------------------
+
+def player_puuid(route: str, index: int) -> str:
+    return f"fake-{route}-{index:06d}"
+
+
+def player_index(puuid: str) -> int:
+    """Ladder index of a puuid — unknown puuids are hashed onto the ladder."""
+    prefix, _, suffix = puuid.rpartition("-")
+    if prefix.startswith("fake-") and suffix.isdigit():
+        return int(suffix) % _ladder_size()
+    return int(hashlib.sha256(puuid.encode()).hexdigest(), 16) % _ladder_size()
+
+
+def _ladder_size() -> int:
+    # Rounded up to whole lobbies so every lobby has 8 players
+    players = len(TIERS) * settings.PLAYERS_PER_TIER
+    return -(-players // LOBBY_SIZE) * LOBBY_SIZE
+
+
+def _lobbies_per_slot() -> int:
+    return _ladder_size() // LOBBY_SIZE
+
+
+def _lobby_of(index: int, slot: int) -> int:
+    return ((index + slot) % _ladder_size()) // LOBBY_SIZE
+
+
+def _lobby_members(slot: int, lobby: int) -> list[int]:
+    first = lobby * LOBBY_SIZE - slot
+    return [(first + offset) % _ladder_size() for offset in range(LOBBY_SIZE)]
+
+
+def _match_id(route: str, slot: int, lobby: int) -> str:
+    prefix = MATCH_ID_PREFIXES.get(route, route.upper())
+    return f"{prefix}_{slot * _lobbies_per_slot() + lobby}"
+
+
+def _parse_match_id(match_id: str) -> tuple[str, int, int] | None:
+    prefix, _, number = match_id.partition("_")
+    routes = {value: key for key, value in MATCH_ID_PREFIXES.items()}
+    if prefix not in routes or not number.isdigit():
+        return None
+    slot, lobby = divmod(int(number), _lobbies_per_slot())
+    if slot > _current_slot():
+        return None
+    return routes[prefix], slot, lobby
+
+
+def _games_played(index: int) -> int:
+    # Every player plays one game per slot — spread the season start per player
+    return max(0, _current_slot() % 2000 - index % 500)
+
+
+def _slot_seconds() -> int:
+    return settings.MINUTES_PER_GAME * 60
+
+
+def _slot_start(slot: int) -> int:
+    return slot * _slot_seconds()
+
+
+def _current_slot() -> int:
+    return int(time.time()) // _slot_seconds()
@@ -0,0 +1,28 @@
+"""player_crawls.games_per_hour: smoothed game rate for incremental match lists
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # -------------------------------------------------------------------------
+    # player_crawls
+    # Games per hour observed across crawls — sizes the next match list request
+    # -------------------------------------------------------------------------
+    op.add_column("player_crawls", sa.Column("games_per_hour", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drops the game rate column — reverses the upgrade migration."""
+    op.drop_column("player_crawls", "games_per_hour")
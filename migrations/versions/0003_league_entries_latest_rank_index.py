@@ -0,0 +1,35 @@
+"""league_entries: (puuid, fetched_at DESC) index for the latest rank lookup
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # -------------------------------------------------------------------------
+    # league_entries
+    # Serves the DISTINCT ON (puuid) ... ORDER BY puuid, fetched_at DESC rank
+    # lookup — also covers plain puuid lookups, so the single-column index goes
+    # -------------------------------------------------------------------------
+    op.create_index(
+        "ix_league_entries_puuid_fetched_at",
+        "league_entries",
+        ["puuid", sa.text("fetched_at DESC")],
+    )
+    op.drop_index("ix_league_entries_puuid", table_name="league_entries")
+
+
+def downgrade() -> None:
+    """Restores the single-column puuid index — reverses the upgrade migration."""
+    op.create_index("ix_league_entries_puuid", "league_entries", ["puuid"])
+    op.drop_index("ix_league_entries_puuid_fetched_at", table_name="league_entries")
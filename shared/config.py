@@ -1,3 +1,4 @@
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -5,8 +6,18 @@ class Settings(BaseSettings):
     # -------------------------------------------------------------------------
     # RIOT API
     # -------------------------------------------------------------------------
-    RIOT_API_KEY: str
+    # Required unless RIOT_API_KEYS is set — validated below
+    RIOT_API_KEY: str = ""
+    # Pool of keys requests are spread across — defaults to RIOT_API_KEY
+    RIOT_API_KEYS: list[str] = []
+    # A key that returned 403 stays out of the pool this long, across restarts
+    DISABLED_KEY_TTL_HOURS: float = 24
     RIOT_REGION: str = "europe"
+    # Regions crawled concurrently from one deployment — defaults to RIOT_REGION
+    RIOT_REGIONS: list[str] = []
+    # Base URL template — point at the bundled fake server for offline load tests,
+    # e.g. "http://fake_riot:8080/{route}"
+    RIOT_API_BASE_URL: str = "https://{route}.api.riotgames.com"
 
     # -------------------------------------------------------------------------
     # POSTGRESQL
@@ -22,6 +33,12 @@ class Settings(BaseSettings):
     CLICKHOUSE_HOST: str
     CLICKHOUSE_PORT: int = 8123
     CLICKHOUSE_DB: str
+    # "buffered" batches unit rows per save worker, "async" uses ClickHouse
+    # async_insert, "direct" inserts each match on its own
+    CLICKHOUSE_INSERT_MODE: str = "buffered"
+    # A buffered batch is inserted at this many rows or after this long
+    CLICKHOUSE_BATCH_ROWS: int = 5000
+    CLICKHOUSE_FLUSH_SECONDS: float = 5
 
     # -------------------------------------------------------------------------
     # REDIS
@@ -32,9 +49,56 @@ class Settings(BaseSettings):
     # CRAWLER
     # -------------------------------------------------------------------------
     RATE_LIMIT_BUFFER: int = 5
+    # Share of each Riot rate limit window the proactive limiter will use
+    RATE_LIMIT_TARGET_UTILISATION: float = 0.95
+    # App limits assumed until Riot reports real ones ("max_calls:window_seconds,...")
+    RIOT_APP_RATE_LIMIT: str = "20:1,100:120"
+    # Re-schedule match list / detail tasks that hit a rate limit wait instead
+    # of sleeping in the worker — waits up to the inline limit are still slept
+    RATE_LIMIT_DEFER_MODE: bool = False
+    RATE_LIMIT_MAX_INLINE_WAIT_SECONDS: float = 1.0
+    # Fleet-wide AIMD limit on in-flight Riot requests per route — grows while
+    # responses are fast with headroom, shrinks on latency, 429s and 5xx
+    CONCURRENCY_CONTROL_ENABLED: bool = False
+    CONCURRENCY_MAX: int = 32
+    CONCURRENCY_TARGET_LATENCY_MS: int = 500
     CRAWLER_COOLDOWN_MINUTES: int = 30
+    # Fetched match ID store — "set" (exact Redis set) or "bloom" (scalable
+    # Bloom filter with an exact Postgres check for positives)
+    DEDUP_BACKEND: str = "set"
+    # Matches the first Bloom filter holds before the next, larger one is added
+    DEDUP_BLOOM_CAPACITY: int = 1_000_000
+    # Target false positive rate across all Bloom filters
+    DEDUP_BLOOM_ERROR_RATE: float = 0.001
+    # Dedup state is sharded per patch — older shards stay readable this long
+    # after a patch change, then expire with the ClickHouse partitions
+    DEDUP_SHARD_GRACE_HOURS: float = 48
+    # Player ranks cached for the save stage — refreshed by every league cycle
+    RANK_CACHE_TTL_HOURS: float = 24
     MIN_PLAYERS_THRESHOLD: int = 300
+    # Only queue match list fetches for ladder players whose wins + losses
+    # changed since the previous cycle
+    LEAGUE_SKIP_IDLE_PLAYERS: bool = True
+    # League pages fetched at once while seeding a cycle — at least 1, a
+    # wave of zero pages would never finish the cycle
+    LEAGUE_FETCH_CONCURRENCY: int = Field(default=4, ge=1)
     SEED_PUUIDS: list[str] = []
+    # Snowball discovery — queue match list crawls for participants of saved
+    # matches with a known rank at or above these bounds, capped per cycle
+    DISCOVERY_ENABLED: bool = False
+    DISCOVERY_MIN_TIER: str = "MASTER"
+    DISCOVERY_MIN_LP: int = 0
+    DISCOVERY_MAX_PER_CYCLE: int = 500
+
+    # Fetch new match IDs as one asyncio batch task per player instead of
+    # one fetch_match_detail task per match
+    MATCH_DETAIL_BATCH_MODE: bool = False
+    MATCH_DETAIL_BATCH_CONCURRENCY: int = 8
+    # A batch queues a save_matches task every this many fetched matches
+    MATCH_DETAIL_BATCH_SAVE_SIZE: int = 10
+
+    # Tasks published per acquired broker producer when fanning out
+    FAN_OUT_BATCH_SIZE: int = 500
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -42,6 +106,24 @@ class Settings(BaseSettings):
         case_sensitive=True,
     )
 
+    @property
+    def crawl_regions(self) -> list[str]:
+        """Regions to crawl — RIOT_REGIONS if set, otherwise just RIOT_REGION."""
+        return [region.lower() for region in self.RIOT_REGIONS] or [self.RIOT_REGION.lower()]
+
+    @property
+    def api_keys(self) -> list[str]:
+        """API keys in the pool — RIOT_API_KEYS if set, otherwise just RIOT_API_KEY."""
+        keys = self.RIOT_API_KEYS or [self.RIOT_API_KEY]
+        return list(dict.fromkeys(key for key in keys if key))
+
+    @model_validator(mode="after")
+    def _require_api_key(self) -> "Settings":
+        """Fails at startup instead of crawling with an empty key."""
+        if not self.api_keys:
+            raise ValueError("RIOT_API_KEY or RIOT_API_KEYS must contain at least one non-empty key")
+        return self
+
 
 # Single instance imported across the entire project
 settings = Settings()
@@ -0,0 +1,243 @@
+import asyncio
+import threading
+import time
+
+import fakeredis
+import httpx
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.rate_limiter.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.key_pool.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.key_pool._disabled_cache", None)
+    monkeypatch.setattr("crawler.services.key_pool._pending_usage", {})
+    return fake_client
+
+
+from crawler.services import async_riot_client
+from crawler.services.async_riot_client import fetch_league_pages, fetch_matches
+from crawler.services.riot_client import NotFoundError
+from shared.config import settings
+
+
+def _mock_client(monkeypatch, handler) -> None:
+    """Routes the batch fetcher through an httpx.MockTransport instead of the network."""
+    monkeypatch.setattr(
+        async_riot_client,
+        "_create_client",
+        lambda base_url: httpx.AsyncClient(
+            base_url=base_url,
+            transport=httpx.MockTransport(handler),
+        ),
+    )
+
+
+def _match_id_from(request: httpx.Request) -> str:
+    return request.url.path.rsplit("/", 1)[-1]
+
+
+# ---------------------------------------------------------------------------
+# fetch_matches
+# ---------------------------------------------------------------------------
+
+class TestFetchMatches:
+
+    def test_fetches_every_match(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(200, json={"match_id": _match_id_from(request)}),
+        )
+        results = []
+        outcome = asyncio.run(fetch_matches(["EUW1_1", "EUW1_2", "EUW1_3"], results.append))
+
+        assert sorted(outcome["fetched"]) == ["EUW1_1", "EUW1_2", "EUW1_3"]
+        assert sorted(r["match_id"] for r in results) == ["EUW1_1", "EUW1_2", "EUW1_3"]
+
+    def test_respects_concurrency_bound(self, monkeypatch):
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={})
+
+        _mock_client(monkeypatch, handler)
+        match_ids = [f"EUW1_{i}" for i in range(10)]
+        asyncio.run(fetch_matches(match_ids, lambda raw: None, concurrency=3))
+
+        assert peak == 3
+
+    def test_not_found_is_discarded(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(404))
+        outcome = asyncio.run(fetch_matches(["EUW1_1"], lambda raw: None))
+
+        assert outcome["not_found"] == ["EUW1_1"]
+        assert outcome["fetched"] == []
+
+    def test_server_error_is_reported_as_failed(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(500))
+        outcome = asyncio.run(fetch_matches(["EUW1_1"], lambda raw: None))
+
+        assert outcome["failed"] == ["EUW1_1"]
+
+    def test_retries_after_rate_limit(self, monkeypatch):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={})
+
+        _mock_client(monkeypatch, handler)
+        outcome = asyncio.run(fetch_matches(["EUW1_1"], lambda raw: None))
+
+        assert outcome["fetched"] == ["EUW1_1"]
+        assert len(calls) == 2
+
+    def test_deferred_batch_returns_unfetched_matches(self, monkeypatch, fake_redis):
+        from crawler.services.rate_limiter import PAUSE_UNTIL_KEY
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json={}))
+        fake_redis.set(PAUSE_UNTIL_KEY, str(time.time() + 30))
+
+        outcome = asyncio.run(fetch_matches(["EUW1_1", "EUW1_2"], lambda raw: None, defer=True))
+
+        assert sorted(outcome["deferred"]) == ["EUW1_1", "EUW1_2"]
+        assert outcome["countdown"] >= 29
+        assert outcome["fetched"] == outcome["failed"] == []
+
+    def test_deferred_batch_does_not_retry_rate_limits(self, monkeypatch):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"Retry-After": "20"})
+
+        _mock_client(monkeypatch, handler)
+        outcome = asyncio.run(fetch_matches(["EUW1_1", "EUW1_2"], lambda raw: None, concurrency=1, defer=True))
+
+        assert len(calls) == 1
+        assert sorted(outcome["deferred"]) == ["EUW1_1", "EUW1_2"]
+        assert outcome["countdown"] == 20
+
+    def test_invalid_key_stops_batch(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(403))
+        monkeypatch.setattr(
+            "crawler.services.riot_client.set_pause_for_retry",
+            lambda retry_after_seconds: None,
+        )
+        outcome = asyncio.run(fetch_matches(["EUW1_1", "EUW1_2"], lambda raw: None))
+
+        assert sorted(outcome["failed"]) == ["EUW1_1", "EUW1_2"]
+
+
+# ---------------------------------------------------------------------------
+# fetch_league_pages
+# ---------------------------------------------------------------------------
+
+class TestFetchLeaguePages:
+
+    def test_fetches_every_page(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(200, json=[{"path": request.url.path, "page": request.url.params["page"]}]),
+        )
+        pages = [("DIAMOND", "I", 1), ("DIAMOND", "II", 1), ("DIAMOND", "I", 2)]
+        results = asyncio.run(fetch_league_pages(pages))
+
+        assert results[("DIAMOND", "I", 2)] == [
+            {"path": "/tft/league/v1/entries/RANKED_TFT/DIAMOND/I", "page": "2"}
+        ]
+        assert results[("DIAMOND", "II", 1)][0]["path"].endswith("/DIAMOND/II")
+
+    def test_apex_tier_ignores_division_and_page(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json={"path": request.url.path}))
+        results = asyncio.run(fetch_league_pages([("challenger", "I", 1)]))
+        assert results[("challenger", "I", 1)] == {"path": "/tft/league/v1/challenger"}
+
+    def test_respects_concurrency_bound(self, monkeypatch):
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json=[])
+
+        _mock_client(monkeypatch, handler)
+        pages = [("GOLD", "I", page) for page in range(1, 8)]
+        asyncio.run(fetch_league_pages(pages, concurrency=2))
+
+        assert peak == 2
+
+    def test_failures_are_returned_per_page(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(404 if "/GOLD/" in request.url.path else 200, json=[]),
+        )
+        results = asyncio.run(fetch_league_pages([("GOLD", "I", 1), ("DIAMOND", "I", 1)]))
+
+        assert isinstance(results[("GOLD", "I", 1)], NotFoundError)
+        assert results[("DIAMOND", "I", 1)] == []
+
+    def test_retries_after_rate_limit(self, monkeypatch):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(200, json=[])
+
+        _mock_client(monkeypatch, handler)
+        results = asyncio.run(fetch_league_pages([("GOLD", "I", 1)]))
+
+        assert results[("GOLD", "I", 1)] == []
+        assert len(calls) == 2
+
+
+# ---------------------------------------------------------------------------
+# Event loop
+# ---------------------------------------------------------------------------
+
+class TestEventLoop:
+
+    def test_redis_is_never_called_on_the_event_loop(self, monkeypatch, fake_redis):
+        monkeypatch.setattr(settings, "CONCURRENCY_CONTROL_ENABLED", True)
+        monkeypatch.setattr("crawler.services.concurrency.redis_client", fake_redis)
+        loop_thread = threading.get_ident()
+        commands = {"loop": [], "threads": []}
+        execute_command = fake_redis.execute_command
+
+        def recording(*args, **kwargs):
+            on_loop = threading.get_ident() == loop_thread
+            commands["loop" if on_loop else "threads"].append(args[0])
+            return execute_command(*args, **kwargs)
+
+        monkeypatch.setattr(fake_redis, "execute_command", recording)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={})
+
+        _mock_client(monkeypatch, handler)
+        outcome = asyncio.run(fetch_matches(["EUW1_1", "EUW1_2"], lambda raw: None))
+
+        assert sorted(outcome["fetched"]) == ["EUW1_1", "EUW1_2"]
+        assert commands["threads"]
+        assert commands["loop"] == []
@@ -0,0 +1,215 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from shared.config import settings
+from shared.models.match import MatchResponseModel
+from crawler.db import clickhouse
+from crawler.db.clickhouse import (
+    ASYNC,
+    BUFFERED,
+    DIRECT,
+    MAX_BUFFERED_BATCHES,
+    close_unit_row_writer,
+    discard_stale_rows,
+    flush_unit_rows,
+    get_flush_stats,
+    insert_unit_rows,
+)
+from crawler.services.match_parser import explode_match_to_unit_rows
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "match_response.json"
+
+
+class FakeClient:
+    """Records inserts instead of talking to ClickHouse."""
+
+    def __init__(self, inserts: list, fail: dict):
+        self.inserts = inserts
+        self.fail = fail
+
+    def insert(self, table, data, column_names, settings=None):
+        if self.fail["insert"]:
+            raise ConnectionError("clickhouse down")
+        self.inserts.append({"rows": len(data), "settings": settings, "buffer_free": _buffer_lock_free()})
+
+    def close(self):
+        pass
+
+
+def _buffer_lock_free() -> bool:
+    """Whether another thread could take the buffer lock right now."""
+    result = []
+
+    def try_lock():
+        acquired = clickhouse._buffer_lock.acquire(timeout=0.5)
+        result.append(acquired)
+        if acquired:
+            clickhouse._buffer_lock.release()
+
+    thread = threading.Thread(target=try_lock)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+@pytest.fixture
+def unit_rows() -> list:
+    match = MatchResponseModel(**json.loads(FIXTURE_PATH.read_text()))
+    return explode_match_to_unit_rows(match, {})
+
+
+@pytest.fixture(autouse=True)
+def clickhouse_client(monkeypatch):
+    """{"inserts": [...], "fail": {"insert": False}, "patch": None} — a fresh writer per test."""
+    state = {"inserts": [], "fail": {"insert": False}, "patch": None}
+    monkeypatch.setattr(clickhouse, "get_client", lambda: FakeClient(state["inserts"], state["fail"]))
+    monkeypatch.setattr(clickhouse, "_buffer", [])
+    monkeypatch.setattr(clickhouse, "_buffer_matches", 0)
+    monkeypatch.setattr(clickhouse, "_buffer_started", None)
+    monkeypatch.setattr(clickhouse, "_flush_stats", {
+        "flushes": 0, "rows": 0, "max_rows": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+    })
+    # No background flusher — tests flush explicitly
+    monkeypatch.setattr(clickhouse, "_ensure_flusher", lambda: None)
+    monkeypatch.setattr(settings, "CLICKHOUSE_INSERT_MODE", BUFFERED)
+    monkeypatch.setattr("crawler.services.patch_detector.get_current_patch", lambda: state["patch"])
+    return state
+
+
+def _inserted(state: dict) -> list:
+    return [{"rows": insert["rows"], "settings": insert["settings"]} for insert in state["inserts"]]
+
+
+# ---------------------------------------------------------------------------
+# Buffered writer
+# ---------------------------------------------------------------------------
+
+class TestBufferedWriter:
+
+    def test_rows_are_buffered_across_matches(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_BATCH_ROWS", len(unit_rows) * 3)
+        insert_unit_rows(unit_rows)
+        insert_unit_rows(unit_rows)
+        assert clickhouse_client["inserts"] == []
+
+        insert_unit_rows(unit_rows)
+        assert _inserted(clickhouse_client) == [{"rows": len(unit_rows) * 3, "settings": None}]
+        assert get_flush_stats()["buffered_rows"] == 0
+
+    def test_explicit_flush_inserts_the_rest(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        assert flush_unit_rows() == len(unit_rows)
+        assert flush_unit_rows() == 0
+        assert len(clickhouse_client["inserts"]) == 1
+
+    def test_stale_buffer_is_flushed(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_FLUSH_SECONDS", 0)
+        insert_unit_rows(unit_rows)
+        clickhouse._flush_if_stale()
+        assert len(clickhouse_client["inserts"]) == 1
+
+    def test_failed_flush_keeps_rows(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        clickhouse_client["fail"]["insert"] = True
+        with pytest.raises(ConnectionError):
+            flush_unit_rows()
+        assert get_flush_stats()["buffered_rows"] == len(unit_rows)
+
+        clickhouse_client["fail"]["insert"] = False
+        assert flush_unit_rows() == len(unit_rows)
+
+    def test_failed_size_flush_does_not_fail_the_save(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_BATCH_ROWS", len(unit_rows))
+        clickhouse_client["fail"]["insert"] = True
+        insert_unit_rows(unit_rows)
+        assert get_flush_stats()["buffered_rows"] == len(unit_rows)
+
+    def test_buffer_is_bounded_after_failures(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_BATCH_ROWS", 10)
+        clickhouse_client["fail"]["insert"] = True
+        for _ in range(5):
+            insert_unit_rows(unit_rows)
+        assert len(unit_rows) * 5 > MAX_BUFFERED_BATCHES * 10
+        assert get_flush_stats()["buffered_rows"] == MAX_BUFFERED_BATCHES * 10
+        # Only the matches still in the buffer are counted
+        assert clickhouse._buffer_matches == len({row[0] for row in clickhouse._buffer})
+
+    def test_insert_runs_outside_the_buffer_lock(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        flush_unit_rows()
+        assert clickhouse_client["inserts"][0]["buffer_free"] is True
+
+    def test_flush_stats(self, unit_rows, monkeypatch):
+        insert_unit_rows(unit_rows)
+        flush_unit_rows()
+        insert_unit_rows(unit_rows[:10])
+        flush_unit_rows()
+
+        stats = get_flush_stats()
+        assert stats["flushes"] == 2
+        assert stats["rows"] == len(unit_rows) + 10
+        assert stats["max_rows"] == len(unit_rows)
+        assert stats["avg_rows"] == (len(unit_rows) + 10) / 2
+
+    def test_close_flushes_and_swallows_errors(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        close_unit_row_writer()
+        assert len(clickhouse_client["inserts"]) == 1
+
+        insert_unit_rows(unit_rows)
+        clickhouse_client["fail"]["insert"] = True
+        close_unit_row_writer()
+
+
+# ---------------------------------------------------------------------------
+# Patch changes
+# ---------------------------------------------------------------------------
+
+class TestStaleRows:
+
+    def _newer_patch(self, unit_rows) -> str:
+        major, minor = unit_rows[0].game_version.split(".")[:2]
+        return f"{major}.{int(minor) + 1}"
+
+    def test_flush_leaves_out_rows_of_older_patches(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        clickhouse_client["patch"] = self._newer_patch(unit_rows)
+        assert flush_unit_rows() == 0
+        assert clickhouse_client["inserts"] == []
+
+    def test_flush_keeps_rows_of_the_current_patch(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        clickhouse_client["patch"] = unit_rows[0].game_version
+        assert flush_unit_rows() == len(unit_rows)
+
+    def test_patch_change_discards_buffered_rows(self, unit_rows, clickhouse_client):
+        insert_unit_rows(unit_rows)
+        assert discard_stale_rows(self._newer_patch(unit_rows)) == len(unit_rows)
+        assert get_flush_stats()["buffered_rows"] == 0
+        assert clickhouse._buffer_matches == 0
+
+
+# ---------------------------------------------------------------------------
+# Unbuffered modes
+# ---------------------------------------------------------------------------
+
+class TestUnbufferedModes:
+
+    def test_direct_inserts_each_match(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_INSERT_MODE", DIRECT)
+        insert_unit_rows(unit_rows)
+        assert _inserted(clickhouse_client) == [{"rows": len(unit_rows), "settings": None}]
+
+    def test_async_uses_server_side_buffering(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_INSERT_MODE", ASYNC)
+        insert_unit_rows(unit_rows)
+        assert clickhouse_client["inserts"][0]["settings"] == {"async_insert": 1, "wait_for_async_insert": 1}
+
+    def test_direct_insert_failure_is_raised(self, unit_rows, clickhouse_client, monkeypatch):
+        monkeypatch.setattr(settings, "CLICKHOUSE_INSERT_MODE", DIRECT)
+        clickhouse_client["fail"]["insert"] = True
+        with pytest.raises(ConnectionError):
+            insert_unit_rows(unit_rows)
@@ -0,0 +1,200 @@
+import time
+from unittest.mock import patch
+
+import fakeredis
+import httpx
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.concurrency.redis_client", fake_client)
+    return fake_client
+
+
+from crawler.services.concurrency import (
+    CIRCUIT_ERROR_THRESHOLD,
+    ERROR,
+    INITIAL_LIMIT,
+    LIMITED,
+    MIN_LIMIT,
+    OK,
+    SLOW,
+    acquire_slot,
+    cancel_slot,
+    classify_response,
+    get_concurrency_limit,
+    is_circuit_open,
+    release_slot,
+    try_acquire_slot,
+)
+from crawler.services.rate_limiter import RateLimitPaused, get_headroom
+
+ROUTE = "europe"
+
+
+def _hold_slots(count: int) -> list[str]:
+    tokens = []
+    for _ in range(count):
+        token, wait = try_acquire_slot(ROUTE)
+        assert token and wait == 0
+        tokens.append(token)
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# try_acquire_slot / acquire_slot
+# ---------------------------------------------------------------------------
+
+class TestSlots:
+
+    def test_grants_up_to_initial_limit(self):
+        _hold_slots(INITIAL_LIMIT)
+        token, wait = try_acquire_slot(ROUTE)
+        assert token is None
+        assert wait > 0
+
+    def test_release_frees_a_slot(self):
+        tokens = _hold_slots(INITIAL_LIMIT)
+        release_slot(ROUTE, tokens[0], OK)
+        assert try_acquire_slot(ROUTE)[0] is not None
+
+    def test_cancel_frees_a_slot_without_feedback(self):
+        tokens = _hold_slots(INITIAL_LIMIT)
+        cancel_slot(ROUTE, tokens[0])
+        assert try_acquire_slot(ROUTE)[0] is not None
+        assert get_concurrency_limit(ROUTE) == INITIAL_LIMIT
+
+    def test_routes_are_independent(self):
+        _hold_slots(INITIAL_LIMIT)
+        assert try_acquire_slot("americas")[0] is not None
+
+    def test_stale_slots_expire(self, fake_redis):
+        _hold_slots(INITIAL_LIMIT)
+        # Simulate workers that died holding their slots
+        for member in fake_redis.zrange("concurrency:europe:inflight", 0, -1):
+            fake_redis.zadd("concurrency:europe:inflight", {member: 0})
+        assert try_acquire_slot(ROUTE)[0] is not None
+
+    def test_acquire_waits_for_free_slot(self):
+        results = iter([(None, 0.05), ("token", 0.0)])
+        with patch(
+            "crawler.services.concurrency.try_acquire_slot",
+            side_effect=lambda route: next(results),
+        ), patch("time.sleep") as mock_sleep:
+            assert acquire_slot(ROUTE) == "token"
+            mock_sleep.assert_called_once_with(0.05)
+
+
+# ---------------------------------------------------------------------------
+# release_slot — AIMD
+# ---------------------------------------------------------------------------
+
+class TestAimd:
+
+    def test_ok_increases_additively(self):
+        token = _hold_slots(1)[0]
+        assert release_slot(ROUTE, token, OK) == pytest.approx(INITIAL_LIMIT + 1 / INITIAL_LIMIT)
+
+    def test_increase_is_capped(self, fake_redis, monkeypatch):
+        from shared.config import settings
+        monkeypatch.setattr(settings, "CONCURRENCY_MAX", 5)
+        fake_redis.set("concurrency:europe:limit", "4.99")
+        assert release_slot(ROUTE, "t", OK) == 5
+
+    def test_slow_decreases_multiplicatively(self):
+        assert release_slot(ROUTE, "t", SLOW) == INITIAL_LIMIT * 0.5
+
+    def test_decrease_applied_once_per_cooldown(self):
+        release_slot(ROUTE, "a", LIMITED)
+        assert release_slot(ROUTE, "b", LIMITED) == INITIAL_LIMIT * 0.5
+
+    def test_decrease_never_below_floor(self, fake_redis):
+        fake_redis.set("concurrency:europe:limit", "1.2")
+        assert release_slot(ROUTE, "t", LIMITED) == MIN_LIMIT
+
+    def test_limit_is_shared_by_the_fleet(self):
+        release_slot(ROUTE, "t", SLOW)
+        assert get_concurrency_limit(ROUTE) == INITIAL_LIMIT * 0.5
+        assert get_concurrency_limit("americas") == INITIAL_LIMIT
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+class TestCircuitBreaker:
+
+    def test_opens_after_sustained_errors(self):
+        for n in range(CIRCUIT_ERROR_THRESHOLD - 1):
+            release_slot(ROUTE, f"t{n}", ERROR)
+        assert not is_circuit_open(ROUTE)
+
+        assert release_slot(ROUTE, "last", ERROR) == MIN_LIMIT
+        assert is_circuit_open(ROUTE)
+
+    def test_open_circuit_blocks_slots(self):
+        for n in range(CIRCUIT_ERROR_THRESHOLD):
+            release_slot(ROUTE, f"t{n}", ERROR)
+        token, wait = try_acquire_slot(ROUTE)
+        assert token is None
+        assert wait > 1
+
+    def test_open_circuit_defers(self):
+        for n in range(CIRCUIT_ERROR_THRESHOLD):
+            release_slot(ROUTE, f"t{n}", ERROR)
+        with pytest.raises(RateLimitPaused):
+            acquire_slot(ROUTE, defer=True)
+
+    def test_open_circuit_deferral_is_jittered(self):
+        for n in range(CIRCUIT_ERROR_THRESHOLD):
+            release_slot(ROUTE, f"t{n}", ERROR)
+        _, wait = try_acquire_slot(ROUTE)
+        with patch("crawler.services.concurrency.random.uniform", return_value=1.5):
+            with pytest.raises(RateLimitPaused) as exc_info:
+                acquire_slot(ROUTE, defer=True)
+        assert exc_info.value.countdown == pytest.approx(wait + 1.5, abs=0.1)
+
+    def test_old_errors_do_not_count(self, fake_redis):
+        old = int(time.time() * 1000) - 60_000
+        fake_redis.zadd("concurrency:europe:errors", {f"old{n}": old for n in range(10)})
+        release_slot(ROUTE, "t", ERROR)
+        assert not is_circuit_open(ROUTE)
+
+
+# ---------------------------------------------------------------------------
+# classify_response / get_headroom
+# ---------------------------------------------------------------------------
+
+class TestClassifyResponse:
+
+    def test_fast_success_is_ok(self):
+        assert classify_response(0.05, 200, httpx.Headers()) == OK
+
+    def test_slow_success(self):
+        assert classify_response(5.0, 200, httpx.Headers()) == SLOW
+
+    def test_429_is_limited(self):
+        assert classify_response(0.05, 429, httpx.Headers()) == LIMITED
+
+    def test_5xx_is_error(self):
+        assert classify_response(0.05, 503, httpx.Headers()) == ERROR
+
+    def test_not_found_is_ok(self):
+        assert classify_response(0.05, 404, httpx.Headers()) == OK
+
+    def test_low_headroom_is_limited(self):
+        headers = httpx.Headers({"X-App-Rate-Limit": "100:120", "X-App-Rate-Limit-Count": "95:120"})
+        assert classify_response(0.05, 200, headers) == LIMITED
+
+    def test_headroom_uses_tightest_window(self):
+        headers = httpx.Headers({
+            "X-App-Rate-Limit": "20:1,100:120",
+            "X-App-Rate-Limit-Count": "1:1,50:120",
+            "X-Method-Rate-Limit": "250:10",
+            "X-Method-Rate-Limit-Count": "200:10",
+        })
+        assert get_headroom(headers) == pytest.approx(0.2)
@@ -1,6 +1,10 @@
+from unittest.mock import patch
+
 import fakeredis
 import pytest
 
+from shared.config import settings
+
 
 @pytest.fixture(autouse=True)
 def fake_redis(monkeypatch):
@@ -8,17 +12,35 @@ def fake_redis(monkeypatch):
     server = fakeredis.FakeServer()
     fake_client = fakeredis.FakeRedis(server=server, decode_responses=True, lua_modules=[])
     monkeypatch.setattr("crawler.services.deduplication.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.deduplication._shards_cache", None)
     return fake_client
 
 
 from crawler.services.deduplication import (
+    BLOOM_BITS_KEY,
+    BLOOM_CLAIM_KEY_PREFIX,
+    _bloom_contains,
+    _bloom_filters,
+    CRAWLED_PUUIDS_CYCLE_KEY,
+    FETCHED_MATCH_IDS_KEY,
+    PRELOAD_CHUNK_SIZE,
+    SHARDS_KEY,
+    PRELOAD_LOCK_KEY,
+    get_memory_report,
+    get_preload_high_water,
+    preload_from_postgres,
+    get_live_shards,
+    start_shard,
     is_match_fetched,
     mark_match_fetched,
     check_and_mark_match,
+    claim_matches,
     preload_match_ids,
     get_fetched_match_count,
     is_puuid_crawled_this_cycle,
     mark_puuid_crawled,
+    filter_uncrawled_puuids,
+    mark_puuids_crawled,
     get_crawled_puuid_count,
 )
 
@@ -69,6 +91,32 @@ class TestCheckAndMarkMatch:
         assert result_2 is False
 
 
+# ---------------------------------------------------------------------------
+# claim_matches (bulk, atomic)
+# ---------------------------------------------------------------------------
+
+class TestClaimMatches:
+
+    def test_returns_only_new_ids_in_order(self):
+        check_and_mark_match("EUW1_2")
+        assert claim_matches(["EUW1_3", "EUW1_2", "EUW1_1"]) == ["EUW1_3", "EUW1_1"]
+
+    def test_second_claim_returns_nothing(self):
+        claim_matches(["EUW1_1", "EUW1_2"])
+        assert claim_matches(["EUW1_1", "EUW1_2"]) == []
+
+    def test_repeated_id_claimed_once(self):
+        assert claim_matches(["EUW1_1", "EUW1_1"]) == ["EUW1_1"]
+
+    def test_empty_list(self):
+        assert claim_matches([]) == []
+
+    def test_single_round_trip(self, fake_redis):
+        with patch.object(fake_redis, "eval", wraps=fake_redis.eval) as mock_eval:
+            claim_matches([f"EUW1_{i}" for i in range(20)])
+        assert mock_eval.call_count == 1
+
+
 # ---------------------------------------------------------------------------
 # preload_match_ids
 # ---------------------------------------------------------------------------
@@ -93,6 +141,207 @@ class TestPreloadMatchIds:
         assert get_fetched_match_count() == 1
 
 
+# ---------------------------------------------------------------------------
+# preload_from_postgres
+# ---------------------------------------------------------------------------
+
+class TestPreloadFromPostgres:
+
+    @pytest.fixture
+    def matches(self, monkeypatch):
+        """Rows of the matches table as (id, match_id); records every read."""
+        rows = [(i, f"EUW1_{i}", "Version 16.3.745.7600") for i in range(1, 26)]
+        reads = []
+
+        def iter_match_ids(after_id=0, chunk_size=PRELOAD_CHUNK_SIZE):
+            reads.append(after_id)
+            pending = [row for row in rows if row[0] > after_id]
+            for start in range(0, len(pending), 10):
+                yield pending[start:start + 10]
+
+        monkeypatch.setattr("crawler.db.postgres.iter_match_ids", iter_match_ids)
+        monkeypatch.setattr(
+            "crawler.db.postgres.get_latest_game_version",
+            lambda: rows[-1][2] if rows else None,
+        )
+        return rows, reads
+
+    def test_loads_every_match(self, matches):
+        assert preload_from_postgres() == 25
+        assert get_fetched_match_count() == 25
+        assert get_preload_high_water() == 25
+
+    def test_warm_store_only_loads_newer_matches(self, matches):
+        rows, reads = matches
+        preload_from_postgres()
+        rows.append((26, "EUW1_26", "Version 16.3.745.7600"))
+        assert preload_from_postgres() == 1
+        assert reads == [0, 25]
+
+    def test_resumes_after_interruption(self, matches, monkeypatch):
+        rows, reads = matches
+        calls = []
+
+        def failing_preload(match_ids, shard=None):
+            calls.append(match_ids)
+            if len(calls) == 2:
+                raise ConnectionError("redis went away")
+            original_preload(match_ids, shard)
+
+        from crawler.services import deduplication
+        original_preload = deduplication.preload_match_ids
+        monkeypatch.setattr(deduplication, "preload_match_ids", failing_preload)
+        with pytest.raises(ConnectionError):
+            preload_from_postgres()
+        assert get_preload_high_water() == 10
+
+        monkeypatch.setattr(deduplication, "preload_match_ids", original_preload)
+        assert preload_from_postgres() == 15
+        assert reads == [0, 10]
+
+    def test_only_leader_preloads(self, matches, fake_redis, monkeypatch):
+        monkeypatch.setattr("crawler.services.deduplication.PRELOAD_WAIT_SECONDS", 0.1)
+        monkeypatch.setattr("crawler.services.deduplication.PRELOAD_POLL_SECONDS", 0.02)
+        fake_redis.set(PRELOAD_LOCK_KEY, "other-worker")
+        assert preload_from_postgres() is None
+        assert get_fetched_match_count() == 0
+
+    def test_waits_for_the_leader_before_starting(self, matches, fake_redis, monkeypatch):
+        rows, reads = matches
+        monkeypatch.setattr("crawler.services.deduplication.PRELOAD_POLL_SECONDS", 0.02)
+        # The leader has loaded everything and releases the lock shortly
+        from crawler.services.deduplication import _high_water_key
+        start_shard("16.3")
+        fake_redis.set(_high_water_key(), 25)
+        fake_redis.set(PRELOAD_LOCK_KEY, "other-worker", px=100)
+
+        assert preload_from_postgres() == 0
+        assert reads == [25]
+
+    def test_lock_released_after_preload(self, matches, fake_redis):
+        preload_from_postgres()
+        assert fake_redis.get(PRELOAD_LOCK_KEY) is None
+
+    def test_loads_live_patches_into_their_shards(self, matches, fake_redis):
+        rows, _ = matches
+        rows[:] = [
+            (1, "EUW1_1", "Version 16.1.1"),
+            (2, "EUW1_2", "Version 16.2.1"),
+            (3, "EUW1_3", "Version 16.3.1"),
+        ]
+        start_shard("16.2")
+        start_shard("16.3")
+        assert preload_from_postgres() == 2
+        assert fake_redis.smembers(f"{FETCHED_MATCH_IDS_KEY}:16.2") == {"EUW1_2"}
+        assert fake_redis.smembers(f"{FETCHED_MATCH_IDS_KEY}:16.3") == {"EUW1_3"}
+
+    def test_first_preload_starts_the_newest_patch_shard(self, matches, fake_redis):
+        rows, _ = matches
+        rows[:] = [(1, "EUW1_1", "Version 16.2.1"), (2, "EUW1_2", "Version 16.3.1")]
+
+        assert preload_from_postgres() == 1
+        assert get_live_shards() == ["", "16.3"]
+        assert fake_redis.smembers(f"{FETCHED_MATCH_IDS_KEY}:16.3") == {"EUW1_2"}
+
+    def test_empty_database_stays_unsharded(self, matches):
+        rows, _ = matches
+        rows.clear()
+        assert preload_from_postgres() == 0
+        assert get_live_shards() == [""]
+
+    def test_retiring_unsharded_store_resets_high_water(self, matches, fake_redis):
+        from crawler.services.deduplication import _high_water_key
+        # Loaded into the unsharded store before any patch was recorded
+        fake_redis.set(_high_water_key(), 25)
+        start_shard("16.3")
+
+        assert get_preload_high_water() == 0
+        assert preload_from_postgres() == 25
+        assert fake_redis.scard(f"{FETCHED_MATCH_IDS_KEY}:16.3") == 25
+
+    def test_retiring_patch_shard_keeps_high_water(self, matches):
+        start_shard("16.3")
+        preload_from_postgres()
+        start_shard("16.4")
+        assert get_preload_high_water() == 25
+
+    def test_high_water_mark_is_per_backend(self, matches, monkeypatch):
+        preload_from_postgres()
+        monkeypatch.setattr(settings, "DEDUP_BACKEND", "bloom")
+        assert get_preload_high_water() == 0
+
+
+# ---------------------------------------------------------------------------
+# Patch shards
+# ---------------------------------------------------------------------------
+
+class TestPatchShards:
+
+    @pytest.fixture(params=["set", "bloom"], autouse=True)
+    def backend(self, request, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUP_BACKEND", request.param)
+        monkeypatch.setattr(settings, "DEDUP_BLOOM_CAPACITY", 100)
+        # Bloom positives are confirmed exactly — nothing is saved in these tests,
+        # so only claim markers can confirm them
+        monkeypatch.setattr("crawler.db.postgres.match_exists", lambda match_id: False)
+        monkeypatch.setattr("crawler.db.postgres.get_existing_match_ids", lambda match_ids: set())
+        return request.param
+
+    def test_unsharded_until_first_patch(self):
+        assert get_live_shards() == [""]
+
+    def test_current_shard_is_last(self):
+        start_shard("16.2")
+        start_shard("16.3")
+        # The unsharded store is retired like any other shard
+        assert get_live_shards() == ["", "16.2", "16.3"]
+
+    def test_ids_from_retired_shard_still_deduplicated(self):
+        start_shard("16.2")
+        claim_matches(["EUW1_1"])
+        start_shard("16.3")
+        assert claim_matches(["EUW1_1", "EUW1_2"]) == ["EUW1_2"]
+        assert get_fetched_match_count() == 2
+
+    def test_retired_shard_expires_after_grace(self, fake_redis, backend):
+        start_shard("16.2")
+        preload_match_ids(["EUW1_1"])
+        start_shard("16.3")
+        key = f"{FETCHED_MATCH_IDS_KEY}:16.2" if backend == "set" else "dedup:bloom:bits:16.2"
+        assert 0 < fake_redis.ttl(key) <= settings.DEDUP_SHARD_GRACE_HOURS * 3600
+
+    def test_retired_shard_dropped_from_lookups_after_grace(self, fake_redis, monkeypatch):
+        start_shard("16.2")
+        preload_match_ids(["EUW1_1"])
+        monkeypatch.setattr(settings, "DEDUP_SHARD_GRACE_HOURS", 0)
+        start_shard("16.3")
+        assert get_live_shards() == ["", "16.3"]
+        assert check_and_mark_match("EUW1_1") is True
+
+    def test_expired_registry_entries_are_cleaned_up(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUP_SHARD_GRACE_HOURS", 0)
+        start_shard("16.1")
+        start_shard("16.2")
+        start_shard("16.3")
+        assert set(fake_redis.hkeys(SHARDS_KEY)) == {"16.2", "16.3"}
+
+    def test_older_patch_never_retires_newer_shard(self, fake_redis, backend):
+        start_shard("16.3")
+        claim_matches(["EUW1_1"])
+        start_shard("16.2")
+        assert get_live_shards() == ["", "16.3"]
+        assert claim_matches(["EUW1_1"]) == []
+        key = f"{FETCHED_MATCH_IDS_KEY}:16.3" if backend == "set" else "dedup:bloom:bits:16.3"
+        assert fake_redis.ttl(key) == -1
+
+    def test_restarting_current_shard_keeps_it(self):
+        start_shard("16.3")
+        claim_matches(["EUW1_1"])
+        start_shard("16.3")
+        assert get_live_shards() == ["", "16.3"]
+        assert claim_matches(["EUW1_1"]) == []
+
+
 # ---------------------------------------------------------------------------
 # puuid cycle deduplication
 # ---------------------------------------------------------------------------
@@ -120,3 +369,113 @@ class TestPuuidCycleDedup:
         mark_puuid_crawled("puuid_1")
         mark_puuid_crawled("puuid_1")
         assert get_crawled_puuid_count() == 1
+
+    def test_filter_keeps_uncrawled_in_order(self):
+        mark_puuid_crawled("puuid_2")
+        assert filter_uncrawled_puuids(["puuid_3", "puuid_2", "puuid_1"]) == ["puuid_3", "puuid_1"]
+
+    def test_filter_empty_list(self):
+        assert filter_uncrawled_puuids([]) == []
+
+    def test_bulk_mark_is_seen_by_single_check(self, fake_redis):
+        mark_puuids_crawled(["puuid_1", "puuid_2"])
+        assert is_puuid_crawled_this_cycle("puuid_2") is True
+        assert get_crawled_puuid_count() == 2
+        assert fake_redis.ttl(CRAWLED_PUUIDS_CYCLE_KEY) > 0
+
+
+# ---------------------------------------------------------------------------
+# Bloom filter backend
+# ---------------------------------------------------------------------------
+
+class TestBloomBackend:
+
+    @pytest.fixture(autouse=True)
+    def bloom(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUP_BACKEND", "bloom")
+        monkeypatch.setattr(settings, "DEDUP_BLOOM_CAPACITY", 100)
+
+    @pytest.fixture
+    def saturated(self, fake_redis):
+        """Every bit of the first filter set — every lookup reports a hit."""
+        _, bits, _, _ = _bloom_filters()[0]
+        fake_redis.setrange(BLOOM_BITS_KEY, 0, b"\xff" * ((bits + 7) // 8))
+
+    @pytest.fixture
+    def saved(self, monkeypatch):
+        """Match IDs PostgreSQL holds — stands in for the exact check."""
+        saved_ids = set()
+        monkeypatch.setattr("crawler.db.postgres.match_exists", lambda match_id: match_id in saved_ids)
+        return saved_ids
+
+    def test_claims_new_match_once(self, saved):
+        assert check_and_mark_match("EUW1_1") is True
+        assert check_and_mark_match("EUW1_1") is False
+
+    def test_claimed_match_is_fetched(self, saved):
+        check_and_mark_match("EUW1_1")
+        assert is_match_fetched("EUW1_1") is True
+        assert is_match_fetched("EUW1_2") is False
+
+    def test_preloaded_match_confirmed_by_postgres(self, saved):
+        saved.add("EUW1_1")
+        preload_match_ids(["EUW1_1"])
+        assert check_and_mark_match("EUW1_1") is False
+
+    def test_false_positive_is_claimed_after_exact_check(self, saved, saturated):
+        assert _bloom_contains("EUW1_NEW") is True
+        assert check_and_mark_match("EUW1_NEW") is True
+        assert check_and_mark_match("EUW1_NEW") is False
+
+    def test_expired_claim_of_unsaved_match_can_be_reclaimed(self, saved, fake_redis):
+        check_and_mark_match("EUW1_1")
+        fake_redis.delete(f"{BLOOM_CLAIM_KEY_PREFIX}:EUW1_1")
+        assert check_and_mark_match("EUW1_1") is True
+
+    def test_bulk_claim_confirms_positives_in_one_query(self, saved, monkeypatch):
+        saved.add("EUW1_1")
+        preload_match_ids(["EUW1_1"])
+        queries = []
+        monkeypatch.setattr(
+            "crawler.db.postgres.get_existing_match_ids",
+            lambda match_ids: queries.append(match_ids) or saved & set(match_ids),
+        )
+        assert claim_matches(["EUW1_1", "EUW1_2", "EUW1_2"]) == ["EUW1_2"]
+        assert claim_matches(["EUW1_2", "EUW1_3"]) == ["EUW1_3"]
+        # EUW1_2 is held by its claim marker, so only EUW1_1 reached Postgres
+        assert queries == [["EUW1_1"]]
+
+    def test_bulk_claim_takes_false_positives(self, saved, saturated, monkeypatch):
+        monkeypatch.setattr("crawler.db.postgres.get_existing_match_ids", lambda match_ids: set())
+        assert claim_matches(["EUW1_A", "EUW1_B"]) == ["EUW1_A", "EUW1_B"]
+        assert claim_matches(["EUW1_A", "EUW1_B"]) == []
+
+    def test_grows_into_next_filter_when_full(self, saved):
+        preload_match_ids([f"EUW1_{i}" for i in range(250)])
+        assert get_memory_report()["bloom_filters"] >= 2
+        assert all(_bloom_contains(f"EUW1_{i}") for i in range(250))
+
+    def test_false_positive_rate_within_target(self, saved):
+        preload_match_ids([f"EUW1_{i}" for i in range(100)])
+        false_positives = sum(_bloom_contains(f"KR_{i}") for i in range(500))
+        assert false_positives <= 5
+
+    def test_count_matches_items_added(self, saved):
+        preload_match_ids(["EUW1_1", "EUW1_2", "EUW1_1"])
+        assert get_fetched_match_count() == 2
+
+    def test_filters_fit_one_redis_bitmap(self):
+        offset, bits, _, _ = _bloom_filters()[-1]
+        assert offset + bits <= 2 ** 32
+
+
+class TestMemoryReport:
+
+    def test_bloom_is_smaller_than_set(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUP_BLOOM_CAPACITY", 1_000_000)
+        preload_match_ids([f"EUW1_{i}" for i in range(1000)])
+        report = get_memory_report()
+        assert report["backend"] == "set"
+        assert report["items"] == 1000
+        # ~1.8 MB of bits for the first million IDs vs ~72 MB as a set
+        assert report["bloom_bytes"] * 30 < 1_000_000 * 72
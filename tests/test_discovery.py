@@ -0,0 +1,147 @@
+import time
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis clients with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.discovery.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.deduplication.redis_client", fake_client)
+    monkeypatch.setattr(
+        "crawler.services.discovery._claim_discovered_script",
+        fake_client.register_script(CLAIM_DISCOVERED_SCRIPT),
+    )
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(settings, "DISCOVERY_ENABLED", True)
+    monkeypatch.setattr(settings, "DISCOVERY_MIN_TIER", "MASTER")
+    monkeypatch.setattr(settings, "DISCOVERY_MIN_LP", 0)
+    monkeypatch.setattr(settings, "DISCOVERY_MAX_PER_CYCLE", 100)
+    monkeypatch.setattr(settings, "RIOT_REGIONS", ["europe", "americas"])
+
+
+from crawler.services.deduplication import (
+    CRAWLED_PUUIDS_CYCLE_KEY,
+    CRAWLED_PUUIDS_TTL_SECONDS,
+    filter_uncrawled_puuids,
+    is_puuid_crawled_this_cycle,
+    mark_puuid_crawled,
+)
+from crawler.services.discovery import (
+    CLAIM_DISCOVERED_SCRIPT,
+    discover_players,
+    pop_discovered_count,
+    region_for_match,
+)
+from crawler.services.scheduler import priority_for, score_player
+from shared.config import settings
+
+MATCH_ID = "EUW1_123"
+
+
+def _rank(tier: str, lp: int = 0) -> dict:
+    return {"tier": tier, "rank": "I", "lp": lp}
+
+
+def _puuids(players: list[dict]) -> list[str]:
+    return [player["puuid"] for player in players]
+
+
+# ---------------------------------------------------------------------------
+# discover_players
+# ---------------------------------------------------------------------------
+
+class TestDiscoverPlayers:
+
+    def test_disabled_discovers_nothing(self, monkeypatch):
+        monkeypatch.setattr(settings, "DISCOVERY_ENABLED", False)
+        assert discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")}) == []
+
+    def test_ranked_participants_are_discovered(self):
+        [player] = discover_players(MATCH_ID, ["a"], {"a": _rank("GRANDMASTER", 400)})
+        assert (player["puuid"], player["region"], player["tier"]) == ("a", "europe", "GRANDMASTER")
+        assert player["priority"] == priority_for(score_player("GRANDMASTER", 400))
+        assert is_puuid_crawled_this_cycle("a")
+
+    def test_filters_by_tier_and_lp(self, monkeypatch):
+        monkeypatch.setattr(settings, "DISCOVERY_MIN_LP", 100)
+        ranks = {
+            "low_tier": _rank("DIAMOND", 90),
+            "low_lp": _rank("MASTER", 50),
+            "good": _rank("MASTER", 150),
+        }
+        assert _puuids(discover_players(MATCH_ID, list(ranks), ranks)) == ["good"]
+
+    def test_unranked_participants_are_skipped(self):
+        assert discover_players(MATCH_ID, ["a"], {}) == []
+
+    def test_players_crawled_this_cycle_are_skipped(self):
+        mark_puuid_crawled("a")
+        assert discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")}) == []
+
+    def test_player_is_discovered_once(self):
+        ranks = {"a": _rank("CHALLENGER")}
+        discover_players(MATCH_ID, ["a"], ranks)
+        assert discover_players("EUW1_124", ["a"], ranks) == []
+
+    def test_cap_keeps_the_best_players(self, monkeypatch):
+        monkeypatch.setattr(settings, "DISCOVERY_MAX_PER_CYCLE", 2)
+        ranks = {"m": _rank("MASTER"), "c": _rank("CHALLENGER"), "g": _rank("GRANDMASTER")}
+        assert _puuids(discover_players(MATCH_ID, list(ranks), ranks)) == ["c", "g"]
+        assert discover_players("EUW1_124", ["x"], {"x": _rank("CHALLENGER")}) == []
+
+    def test_cap_is_per_region(self, monkeypatch):
+        monkeypatch.setattr(settings, "DISCOVERY_MAX_PER_CYCLE", 1)
+        discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")})
+        assert _puuids(discover_players("NA1_1", ["b"], {"b": _rank("CHALLENGER")})) == ["b"]
+
+    def test_cap_resets_each_cycle(self, monkeypatch):
+        monkeypatch.setattr(settings, "DISCOVERY_MAX_PER_CYCLE", 1)
+        discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")})
+        assert pop_discovered_count("europe") == 1
+        assert _puuids(discover_players(MATCH_ID, ["b"], {"b": _rank("CHALLENGER")})) == ["b"]
+
+    def test_regions_not_crawled_are_ignored(self):
+        assert discover_players("KR_1", ["a"], {"a": _rank("CHALLENGER")}) == []
+
+    def test_claims_do_not_extend_the_cycle(self, fake_redis):
+        mark_puuid_crawled("seeded")
+        fake_redis.expire(CRAWLED_PUUIDS_CYCLE_KEY, 60)
+        discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")})
+        assert fake_redis.ttl(CRAWLED_PUUIDS_CYCLE_KEY) <= 60
+
+    def test_cycle_key_expires_while_discovery_runs(self, fake_redis):
+        mark_puuid_crawled("seeded")
+        fake_redis.pexpire(CRAWLED_PUUIDS_CYCLE_KEY, 200)
+        for i in range(5):
+            discover_players(f"EUW1_{i}", [f"p{i}"], {f"p{i}": _rank("CHALLENGER")})
+            time.sleep(0.06)
+
+        assert filter_uncrawled_puuids(["seeded", "p0"]) == ["seeded", "p0"]
+
+    def test_discovery_starts_the_cycle_ttl(self, fake_redis):
+        discover_players(MATCH_ID, ["a"], {"a": _rank("CHALLENGER")})
+        assert 0 < fake_redis.ttl(CRAWLED_PUUIDS_CYCLE_KEY) <= CRAWLED_PUUIDS_TTL_SECONDS
+
+
+class TestRegionForMatch:
+
+    def test_maps_platform_prefix_to_region(self):
+        assert region_for_match("EUW1_123") == "europe"
+        assert region_for_match("na1_5") == "americas"
+
+    def test_every_platform_is_mapped(self):
+        assert region_for_match("EUN1_1") == "europe"
+        assert region_for_match("BR1_1") == "americas"
+        assert region_for_match("JP1_1") == "asia"
+        assert region_for_match("OC1_1") == "sea"
+
+    def test_unknown_prefix(self):
+        assert region_for_match("XX9_1") is None
@@ -0,0 +1,220 @@
+from pathlib import Path
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(autouse=True)
+def fake_settings(monkeypatch):
+    """Small ladder, no latency and no injected failures for every test."""
+    from fake_riot.config import settings
+    from fake_riot import limiter
+
+    monkeypatch.setattr(settings, "MATCH_TEMPLATE_PATH", str(FIXTURE_PATH))
+    monkeypatch.setattr(settings, "PLAYERS_PER_TIER", 16)
+    monkeypatch.setattr(settings, "LATENCY_MS", 0.0)
+    monkeypatch.setattr(settings, "LATENCY_JITTER_MS", 0.0)
+    monkeypatch.setattr(settings, "ERROR_RATE", 0.0)
+    monkeypatch.setattr(settings, "NOT_FOUND_RATE", 0.0)
+    monkeypatch.setattr(settings, "VALID_KEYS", [])
+    limiter.reset()
+    return settings
+
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "match_response.json"
+
+
+from shared.models.league import LeagueResponseModel
+from shared.models.match import MatchResponseModel
+from fake_riot import limiter, payloads
+from fake_riot.main import app
+
+ROUTE = "europe"
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+# ---------------------------------------------------------------------------
+# payloads
+# ---------------------------------------------------------------------------
+
+class TestPayloads:
+
+    def test_league_response_matches_model(self):
+        league = LeagueResponseModel(**payloads.league_response(ROUTE, "challenger"))
+        assert league.tier == "CHALLENGER"
+        assert len(league.entries) == 16
+
+    def test_lower_tier_divisions_split_the_tier(self):
+        divisions = [
+            {e["puuid"] for e in payloads.league_entries(ROUTE, "GOLD", division)}
+            for division in payloads.DIVISIONS
+        ]
+        assert sum(len(players) for players in divisions) == 16
+        assert divisions[0].isdisjoint(divisions[1])
+
+    def test_entries_are_paged(self, monkeypatch):
+        monkeypatch.setattr(payloads, "ENTRIES_PAGE_SIZE", 3)
+        first = payloads.league_entries(ROUTE, "GOLD", "I", page=1)
+        second = payloads.league_entries(ROUTE, "GOLD", "I", page=2)
+        assert [len(first), len(second)] == [3, 1]
+        assert payloads.league_entries(ROUTE, "GOLD", "I", page=3) == []
+
+    def test_tiers_have_distinct_players(self):
+        challenger = {e["puuid"] for e in payloads.league_response(ROUTE, "challenger")["entries"]}
+        diamond = {e["puuid"] for e in payloads.league_entries(ROUTE, "DIAMOND", "I")}
+        assert challenger.isdisjoint(diamond)
+
+    def test_match_ids_newest_first_and_paged(self):
+        puuid = payloads.player_puuid(ROUTE, 3)
+        ids = payloads.match_ids(ROUTE, puuid, count=5)
+        numbers = [int(match_id.split("_")[1]) for match_id in ids]
+        assert len(ids) == 5
+        assert numbers == sorted(numbers, reverse=True)
+        assert payloads.match_ids(ROUTE, puuid, start=2, count=3) == ids[2:5]
+
+    def test_start_time_limits_history(self):
+        puuid = payloads.player_puuid(ROUTE, 3)
+        assert payloads.match_ids(ROUTE, puuid, count=20, start_time=2**40) == []
+
+    def test_match_is_shared_by_its_lobby(self):
+        puuid = payloads.player_puuid(ROUTE, 5)
+        match_id = payloads.match_ids(ROUTE, puuid, count=1)[0]
+        match = payloads.match_detail(match_id)
+
+        participants = match["metadata"]["participants"]
+        assert puuid in participants
+        assert len(set(participants)) == 8
+        for other in participants:
+            assert match_id in payloads.match_ids(ROUTE, other, count=1)
+
+    def test_match_detail_matches_model(self):
+        match_id = payloads.match_ids(ROUTE, payloads.player_puuid(ROUTE, 0), count=1)[0]
+        match = MatchResponseModel(**payloads.match_detail(match_id))
+        assert sorted(p.placement for p in match.info.participants) == list(range(1, 9))
+
+    def test_unknown_match_id(self):
+        assert payloads.match_detail("XX_1") is None
+
+
+# ---------------------------------------------------------------------------
+# limiter
+# ---------------------------------------------------------------------------
+
+class TestLimiter:
+
+    def test_reports_counts(self, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "APP_RATE_LIMIT", "5:1")
+        status_code, headers = limiter.check_and_record("key", ROUTE, "match_detail")
+        assert status_code == 200
+        assert headers["X-App-Rate-Limit"] == "5:1"
+        assert headers["X-App-Rate-Limit-Count"] == "1:1"
+        assert headers["X-Method-Rate-Limit-Count"] == "1:10"
+
+    def test_app_limit_returns_429(self, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "APP_RATE_LIMIT", "2:10")
+        limiter.check_and_record("key", ROUTE, "league")
+        limiter.check_and_record("key", ROUTE, "match_list")
+        status_code, headers = limiter.check_and_record("key", ROUTE, "match_detail")
+        assert status_code == 429
+        assert headers["X-Rate-Limit-Type"] == "application"
+        assert 1 <= int(headers["Retry-After"]) <= 10
+
+    def test_method_limit_returns_429(self, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "MATCH_DETAIL_RATE_LIMIT", "1:10")
+        limiter.check_and_record("key", ROUTE, "match_detail")
+        status_code, headers = limiter.check_and_record("key", ROUTE, "match_detail")
+        assert status_code == 429
+        assert headers["X-Rate-Limit-Type"] == "method"
+        assert limiter.check_and_record("key", ROUTE, "match_list")[0] == 200
+
+    def test_keys_and_routes_are_independent(self, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "APP_RATE_LIMIT", "1:10")
+        limiter.check_and_record("key-a", ROUTE, "league")
+        assert limiter.check_and_record("key-a", ROUTE, "league")[0] == 429
+        assert limiter.check_and_record("key-b", ROUTE, "league")[0] == 200
+        assert limiter.check_and_record("key-a", "americas", "league")[0] == 200
+
+
+# ---------------------------------------------------------------------------
+# app
+# ---------------------------------------------------------------------------
+
+class TestApp:
+
+    def test_serves_match_with_rate_limit_headers(self, client):
+        puuid = payloads.player_puuid(ROUTE, 1)
+        ids = client.get(f"/{ROUTE}/tft/match/v1/matches/by-puuid/{puuid}/ids?count=3").json()
+        response = client.get(f"/{ROUTE}/tft/match/v1/matches/{ids[0]}")
+
+        assert response.status_code == 200
+        assert response.json()["metadata"]["match_id"] == ids[0]
+        assert "x-app-rate-limit-count" in response.headers
+
+    def test_serves_lower_tier_entries(self, client):
+        response = client.get(f"/{ROUTE}/tft/league/v1/entries/RANKED_TFT/GOLD/I")
+        assert response.status_code == 200
+        assert response.json()[0]["tier"] == "GOLD"
+
+    def test_rejects_unknown_key(self, client, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "VALID_KEYS", ["good"])
+        response = client.get(f"/{ROUTE}/tft/league/v1/challenger", headers={"X-Riot-Token": "bad"})
+        assert response.status_code == 403
+
+    def test_injected_errors(self, client, fake_settings, monkeypatch):
+        monkeypatch.setattr(fake_settings, "ERROR_RATE", 1.0)
+        assert client.get(f"/{ROUTE}/tft/league/v1/challenger").status_code == 503
+
+    def test_unknown_match_is_404(self, client):
+        assert client.get(f"/{ROUTE}/tft/match/v1/matches/XX_1").status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# riot_client against the fake server
+# ---------------------------------------------------------------------------
+
+class TestRiotClientAgainstFake:
+
+    @pytest.fixture(autouse=True)
+    def fake_redis(self, monkeypatch):
+        fake_client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        monkeypatch.setattr("crawler.services.rate_limiter.redis_client", fake_client)
+        monkeypatch.setattr("crawler.services.rate_limiter._limits_cache", {})
+        monkeypatch.setattr("crawler.services.key_pool.redis_client", fake_client)
+        monkeypatch.setattr("crawler.services.key_pool._disabled_cache", None)
+        monkeypatch.setattr("crawler.services.key_pool._pending_usage", {})
+
+    @pytest.fixture(autouse=True)
+    def point_at_fake(self, monkeypatch):
+        from shared.config import settings
+        from crawler.services import riot_client
+
+        monkeypatch.setattr(settings, "RIOT_API_BASE_URL", "http://testserver/{route}")
+        monkeypatch.setattr(
+            riot_client,
+            "_get_client",
+            lambda base_url: TestClient(app, base_url=base_url),
+        )
+
+    def test_crawler_fetches_match_list_and_match(self):
+        from crawler.services.riot_client import fetch_match, fetch_match_list
+
+        match_ids = fetch_match_list(payloads.player_puuid(ROUTE, 2), count=2, region=ROUTE)
+        match = fetch_match(match_ids[0], region=ROUTE)
+        assert match["metadata"]["match_id"] == match_ids[0]
+
+    def test_crawler_learns_limits_from_fake(self, fake_settings, monkeypatch):
+        from crawler.services.key_pool import get_active_keys
+        from crawler.services.rate_limiter import app_scope, get_scope_limits, _limits_cache
+        from crawler.services.riot_client import fetch_match_list
+
+        monkeypatch.setattr(fake_settings, "APP_RATE_LIMIT", "50:1,500:120")
+        fetch_match_list(payloads.player_puuid(ROUTE, 2), count=1, region=ROUTE)
+
+        key_id = next(iter(get_active_keys()))
+        _limits_cache.clear()
+        assert get_scope_limits(app_scope(ROUTE, key_id)) == {1: 50, 120: 500}
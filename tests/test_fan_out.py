@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from celery import Celery
+from kombu.transport import redis as kombu_redis
+from redis.client import Pipeline
+
+from crawler.services.fan_out import publish_many
+from shared.config import settings
+
+
+class FakeTask:
+    """Records apply_async calls and the producer each one was published on."""
+
+    name = "fake.task"
+
+    def __init__(self):
+        self.published = []
+        self.producers = 0
+        self.app = self
+
+    @contextmanager
+    def producer_or_acquire(self):
+        self.producers += 1
+        yield SimpleNamespace(name=f"producer-{self.producers}", channel=None)
+
+    def apply_async(self, args, kwargs, producer, **options):
+        self.published.append((args, kwargs, options, producer))
+
+
+def _calls(count: int):
+    return (([i], {"region": "europe"}, {"priority": i % 10}) for i in range(count))
+
+
+# ---------------------------------------------------------------------------
+# publish_many
+# ---------------------------------------------------------------------------
+
+class TestPublishMany:
+
+    @pytest.fixture(autouse=True)
+    def batch_size(self, monkeypatch):
+        monkeypatch.setattr(settings, "FAN_OUT_BATCH_SIZE", 3)
+
+    def test_publishes_every_call_in_order(self):
+        task = FakeTask()
+        assert publish_many(task, _calls(7)) == 7
+        assert [args[0] for args, _, _, _ in task.published] == list(range(7))
+
+    def test_one_producer_per_batch(self):
+        task = FakeTask()
+        publish_many(task, _calls(7))
+
+        assert task.producers == 3
+        assert [producer.name for *_, producer in task.published] == [
+            "producer-1", "producer-1", "producer-1",
+            "producer-2", "producer-2", "producer-2",
+            "producer-3",
+        ]
+
+    def test_options_are_passed_through(self):
+        task = FakeTask()
+        publish_many(task, _calls(2))
+        assert task.published[1][1:3] == ({"region": "europe"}, {"priority": 1})
+
+    def test_nothing_to_publish(self):
+        task = FakeTask()
+        assert publish_many(task, []) == 0
+        assert task.producers == 0
+
+
+# ---------------------------------------------------------------------------
+# Redis broker round trips
+# ---------------------------------------------------------------------------
+
+class TestRedisBroker:
+
+    @pytest.fixture
+    def broker(self, monkeypatch):
+        """A Celery app on a fakeredis broker that counts commands sent on their own and pipelines."""
+        server = fakeredis.FakeServer()
+        round_trips = {"commands": [], "pipelines": 0}
+
+        class CountingPipeline(Pipeline):
+            def execute(self, *args, **kwargs):
+                round_trips["pipelines"] += 1
+                return super().execute(*args, **kwargs)
+
+        class CountingRedis(fakeredis.FakeRedis):
+            def execute_command(self, *args, **kwargs):
+                round_trips["commands"].append(args[0])
+                return super().execute_command(*args, **kwargs)
+
+            def pipeline(self, transaction=True, shard_hint=None):
+                return CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+        monkeypatch.setattr(
+            kombu_redis.Channel, "_create_client",
+            lambda channel, asynchronous=False: CountingRedis(server=server),
+        )
+        app = Celery("fan_out_test", broker="redis://localhost:6379/0")
+
+        @app.task(name="fan_out_test.task")
+        def task(*args, **kwargs):
+            pass
+
+        return task, round_trips, CountingRedis(server=server)
+
+    def test_one_round_trip_per_batch(self, broker, monkeypatch):
+        monkeypatch.setattr(settings, "FAN_OUT_BATCH_SIZE", 3)
+        task, round_trips, client = broker
+
+        assert publish_many(task, _calls(7)) == 7
+
+        assert "LPUSH" not in round_trips["commands"]
+        assert round_trips["pipelines"] == 3
+        queues = [key for key in client.keys() if not key.startswith(b"_kombu")]
+        assert sum(client.llen(queue) for queue in queues) == 7
+
+    def test_failed_batch_publishes_nothing(self, broker, monkeypatch):
+        monkeypatch.setattr(settings, "FAN_OUT_BATCH_SIZE", 3)
+        task, round_trips, client = broker
+
+        # The second message cannot be serialized — the first must not be sent alone
+        calls = [([1], {}, {}), ([object()], {}, {}), ([3], {}, {})]
+        with pytest.raises(Exception):
+            publish_many(task, calls)
+
+        assert round_trips["pipelines"] == 0
+        assert not [key for key in client.keys() if not key.startswith(b"_kombu")]
@@ -0,0 +1,147 @@
+import time
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis clients with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.rate_limiter.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.rate_limiter._limits_cache", {})
+    monkeypatch.setattr("crawler.services.key_pool.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.key_pool._disabled_cache", None)
+    monkeypatch.setattr("crawler.services.key_pool._pending_usage", {})
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def two_keys(monkeypatch):
+    from shared.config import settings
+    monkeypatch.setattr(settings, "RIOT_API_KEYS", ["key-a", "key-b"])
+
+
+from crawler.services.key_pool import (
+    DISABLED_KEYS_KEY,
+    disable_key,
+    flush_usage,
+    get_active_keys,
+    get_key_stats,
+    key_id,
+    record_response,
+    reset_disabled_keys,
+)
+from crawler.services.rate_limiter import try_acquire_permit
+
+ROUTE = "europe"
+KEY_A = key_id("key-a")
+KEY_B = key_id("key-b")
+
+
+# ---------------------------------------------------------------------------
+# key_id
+# ---------------------------------------------------------------------------
+
+class TestKeyId:
+
+    def test_is_stable(self):
+        assert key_id("key-a") == KEY_A
+
+    def test_does_not_leak_key(self):
+        assert "key-a" not in KEY_A
+
+    def test_differs_per_key(self):
+        assert KEY_A != KEY_B
+
+
+# ---------------------------------------------------------------------------
+# get_active_keys / disable_key / reset_disabled_keys
+# ---------------------------------------------------------------------------
+
+class TestPoolMembership:
+
+    def test_all_configured_keys_active(self):
+        assert get_active_keys() == {KEY_A: "key-a", KEY_B: "key-b"}
+
+    def test_falls_back_to_single_key(self, monkeypatch):
+        from shared.config import settings
+        monkeypatch.setattr(settings, "RIOT_API_KEYS", [])
+        assert list(get_active_keys().values()) == [settings.RIOT_API_KEY]
+
+    def test_settings_require_a_non_empty_key(self):
+        from shared.config import Settings
+        with pytest.raises(ValueError, match="RIOT_API_KEY"):
+            Settings(RIOT_API_KEY="", RIOT_API_KEYS=["", ""])
+
+    def test_disable_key_removes_it(self):
+        assert disable_key(KEY_A) == 1
+        assert get_active_keys() == {KEY_B: "key-b"}
+
+    def test_disabled_keys_are_shared(self, fake_redis):
+        fake_redis.zadd(DISABLED_KEYS_KEY, {KEY_B: time.time() + 60})
+        assert KEY_B not in get_active_keys()
+
+    def test_disabled_key_returns_after_ttl(self, fake_redis):
+        fake_redis.zadd(DISABLED_KEYS_KEY, {KEY_B: time.time() - 1})
+        assert KEY_B in get_active_keys()
+
+    def test_disable_key_sets_ttl(self, fake_redis, monkeypatch):
+        from shared.config import settings
+        monkeypatch.setattr(settings, "DISABLED_KEY_TTL_HOURS", 2)
+        disable_key(KEY_A)
+        assert 0 < fake_redis.zscore(DISABLED_KEYS_KEY, KEY_A) - time.time() <= 7200
+
+    def test_disable_key_prunes_expired_entries(self, fake_redis):
+        fake_redis.zadd(DISABLED_KEYS_KEY, {KEY_B: time.time() - 1})
+        disable_key(KEY_A)
+        assert fake_redis.zrange(DISABLED_KEYS_KEY, 0, -1) == [KEY_A]
+
+    def test_disabling_every_key_empties_pool(self):
+        disable_key(KEY_A)
+        assert disable_key(KEY_B) == 0
+        assert get_active_keys() == {}
+
+    def test_reset_restores_every_key(self):
+        disable_key(KEY_A)
+        reset_disabled_keys()
+        assert len(get_active_keys()) == 2
+
+
+# ---------------------------------------------------------------------------
+# record_response / get_key_stats
+# ---------------------------------------------------------------------------
+
+class TestKeyStats:
+
+    def test_counts_requests_per_key(self):
+        for status_code in (200, 200, 429, 403):
+            record_response(KEY_A, status_code)
+        record_response(KEY_B, 200)
+
+        stats = {s["key_id"]: s for s in get_key_stats(ROUTE)}
+        assert stats[KEY_A]["requests"] == 4
+        assert stats[KEY_A]["rate_limited"] == 1
+        assert stats[KEY_A]["forbidden"] == 1
+        assert stats[KEY_B]["requests"] == 1
+
+    def test_usage_is_buffered_until_flush(self, fake_redis):
+        record_response(KEY_A, 200)
+        assert fake_redis.exists(f"key_pool:usage:{KEY_A}") == 0
+        flush_usage()
+        assert fake_redis.hget(f"key_pool:usage:{KEY_A}", "requests") == "1"
+
+    def test_reports_window_utilisation(self, fake_redis):
+        fake_redis.hset(f"rate_limit:{ROUTE}:{KEY_A}:app:limits", mapping={"10": "20"})
+        for _ in range(5):
+            try_acquire_permit(route=ROUTE, key_id=KEY_A)
+
+        stats = {s["key_id"]: s for s in get_key_stats(ROUTE)}
+        assert stats[KEY_A]["utilisation"] == {10: 0.25}
+
+    def test_reports_disabled_keys(self):
+        disable_key(KEY_B)
+        stats = {s["key_id"]: s for s in get_key_stats(ROUTE)}
+        assert stats[KEY_A]["active"]
+        assert not stats[KEY_B]["active"]
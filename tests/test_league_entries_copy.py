@@ -0,0 +1,80 @@
+import csv
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from crawler.db import postgres
+from crawler.db.postgres import LEAGUE_ENTRY_COLUMNS, _league_entries_csv, copy_league_entries
+
+ENTRY = {
+    "puuid": "puuid_a",
+    "leaguePoints": 812,
+    "rank": "I",
+    "wins": 120,
+    "losses": 95,
+    "veteran": True,
+    "inactive": False,
+    "freshBlood": False,
+    "hotStreak": True,
+    "summonerName": 'has "quotes", commas\nand a newline',
+}
+
+
+class FakeCursor:
+    def __init__(self, copies: list):
+        self.copies = copies
+
+    def copy_expert(self, sql, file):
+        self.copies.append({"sql": sql, "rows": list(csv.reader(file))})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def copies(monkeypatch):
+    """COPY statements sent to PostgreSQL, with their rows parsed back."""
+    copies = []
+
+    dbapi_connection = SimpleNamespace(cursor=lambda: FakeCursor(copies))
+    session = SimpleNamespace(connection=lambda: SimpleNamespace(connection=dbapi_connection))
+
+    @contextmanager
+    def get_session():
+        yield session
+
+    monkeypatch.setattr(postgres, "get_session", get_session)
+    return copies
+
+
+# ---------------------------------------------------------------------------
+# COPY bulk loader
+# ---------------------------------------------------------------------------
+
+class TestCopyLeagueEntries:
+
+    def test_rows_follow_column_order(self):
+        [row] = list(csv.reader(_league_entries_csv("MASTER", [ENTRY])))
+        assert len(row) == len(LEAGUE_ENTRY_COLUMNS)
+        assert row[:6] == ["puuid_a", "MASTER", "I", "812", "120", "95"]
+        assert row[6:10] == ["True", "False", "False", "True"]
+
+    def test_raw_response_survives_csv_quoting(self):
+        [row] = list(csv.reader(_league_entries_csv("MASTER", [ENTRY])))
+        assert json.loads(row[-1]) == ENTRY
+
+    def test_missing_fields_get_lower_tier_defaults(self):
+        [row] = list(csv.reader(_league_entries_csv("DIAMOND", [{"puuid": "puuid_b"}])))
+        assert row[:10] == ["puuid_b", "DIAMOND", "I", "0", "0", "0", "False", "False", "False", "False"]
+
+    def test_one_copy_per_call(self, copies):
+        assert copy_league_entries("MASTER", [ENTRY, {**ENTRY, "puuid": "puuid_b"}]) == 2
+        assert len(copies) == 1
+        assert copies[0]["sql"].startswith("COPY league_entries (puuid, tier, rank,")
+        assert [row[0] for row in copies[0]["rows"]] == ["puuid_a", "puuid_b"]
+
+    def test_no_entries_no_copy(self, copies):
+        assert copy_league_entries("MASTER", []) == 0
+        assert copies == []
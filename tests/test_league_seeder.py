@@ -0,0 +1,197 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis clients with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.league_seeder.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.deduplication.redis_client", fake_client)
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def player_crawls(monkeypatch):
+    """Every player has a player_crawls row unless listed in never_crawled."""
+    never_crawled = set()
+    monkeypatch.setattr(
+        "crawler.services.league_seeder.get_matches_found",
+        lambda puuids: {puuid: 1 for puuid in puuids if puuid not in never_crawled},
+    )
+    return never_crawled
+
+
+from crawler.services import league_seeder
+from crawler.services.league_seeder import collect_puuids_for_cycle, get_active_players
+from crawler.services.scheduler import SEED_TIER
+from shared.config import settings
+
+REGION = "europe"
+
+
+# ---------------------------------------------------------------------------
+# get_active_players
+# ---------------------------------------------------------------------------
+
+class TestActivePlayers:
+
+    def test_unknown_players_are_active(self):
+        assert get_active_players(REGION, {"a": 10, "b": 20}) == {"a": None, "b": None}
+
+    def test_idle_players_are_skipped(self):
+        get_active_players(REGION, {"a": 10, "b": 20})
+        assert get_active_players(REGION, {"a": 10, "b": 23}) == {"b": 3}
+
+    def test_snapshot_is_updated(self):
+        get_active_players(REGION, {"a": 10})
+        get_active_players(REGION, {"a": 12})
+        assert get_active_players(REGION, {"a": 12}) == {}
+
+    def test_lower_count_is_a_reset(self):
+        get_active_players(REGION, {"a": 300})
+        assert get_active_players(REGION, {"a": 2}) == {"a": None}
+
+    def test_snapshots_are_per_region(self):
+        get_active_players(REGION, {"a": 10})
+        assert get_active_players("americas", {"a": 10}) == {"a": None}
+
+    def test_never_crawled_players_stay_active(self, player_crawls):
+        player_crawls.add("a")
+        get_active_players(REGION, {"a": 10})
+        assert get_active_players(REGION, {"a": 10}) == {"a": None}
+
+    def test_snapshot_starts_after_first_crawl(self, player_crawls):
+        player_crawls.add("a")
+        get_active_players(REGION, {"a": 10})
+        # The first crawl succeeded since the last cycle
+        player_crawls.discard("a")
+        assert get_active_players(REGION, {"a": 10}) == {"a": None}
+        assert get_active_players(REGION, {"a": 10}) == {}
+
+    def test_departed_players_are_pruned(self, fake_redis, monkeypatch):
+        now = 1_000_000.0
+        monkeypatch.setattr(league_seeder.time, "time", lambda: now)
+        get_active_players(REGION, {"a": 10, "b": 20})
+
+        # "b" leaves the ladder; "a" is still seen every cycle
+        now += league_seeder.GAMES_PLAYED_TTL_SECONDS + 1
+        get_active_players(REGION, {"a": 10})
+
+        assert fake_redis.hgetall(f"league:games_played:{REGION}") == {"a": "10"}
+        assert fake_redis.zrange(f"league:games_played_seen:{REGION}", 0, -1) == ["a"]
+
+    def test_snapshots_expire_if_seeding_stops(self, fake_redis):
+        get_active_players(REGION, {"a": 10})
+        for key in (f"league:games_played:{REGION}", f"league:games_played_seen:{REGION}"):
+            assert 0 < fake_redis.ttl(key) <= league_seeder.GAMES_PLAYED_TTL_SECONDS
+
+    def test_skip_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "LEAGUE_SKIP_IDLE_PLAYERS", False)
+        get_active_players(REGION, {"a": 10})
+        assert get_active_players(REGION, {"a": 10}) == {"a": None}
+
+
+# ---------------------------------------------------------------------------
+# collect_puuids_for_cycle
+# ---------------------------------------------------------------------------
+
+class TestCollectPuuids:
+
+    @pytest.fixture
+    def ladder(self, monkeypatch):
+        """
+        {(tier, division, page): {puuid: wins + losses}} served instead of the
+        league endpoints — pages not in the ladder come back empty.
+        """
+        pages = {}
+        fetched = []
+
+        async def fetch_league_pages(requested, region=None):
+            fetched.append(list(requested))
+            return {page: pages.get(page, {}) for page in requested}
+
+        monkeypatch.setattr(league_seeder, "fetch_league_pages", fetch_league_pages)
+        monkeypatch.setattr(
+            league_seeder, "_parse_league_page",
+            lambda tier, response: {
+                puuid: {"games": games, "league_points": 100}
+                for puuid, games in response.items()
+            },
+        )
+        monkeypatch.setattr(settings, "SEED_PUUIDS", [])
+        monkeypatch.setattr(settings, "LEAGUE_FETCH_CONCURRENCY", 4)
+        pages["fetched"] = fetched
+        return pages
+
+    def test_returns_expected_matches_per_player(self, ladder, fake_redis):
+        ladder[("challenger", "I", 1)] = {"a": 10, "b": 20}
+        get_active_players(REGION, {"a": 8, "b": 20})
+        players = collect_puuids_for_cycle(REGION)
+        assert {puuid: player["expected_matches"] for puuid, player in players.items()} == {"a": 2}
+
+    def test_players_carry_tier_and_lp(self, ladder):
+        ladder[("grandmaster", "I", 1)] = {"a": 10}
+        assert collect_puuids_for_cycle(REGION)["a"] == {
+            "tier": "GRANDMASTER",
+            "league_points": 100,
+            "expected_matches": None,
+        }
+
+    def test_seed_puuids_are_labelled(self, ladder, monkeypatch):
+        monkeypatch.setattr(settings, "SEED_PUUIDS", ["seed"])
+        monkeypatch.setattr(settings, "RIOT_REGION", REGION.upper())
+        assert collect_puuids_for_cycle(REGION)["seed"]["tier"] == SEED_TIER
+
+    def test_idle_players_count_towards_threshold(self, ladder, monkeypatch):
+        monkeypatch.setattr(settings, "MIN_PLAYERS_THRESHOLD", 2)
+        ladder[("challenger", "I", 1)] = {"a": 10, "b": 20}
+        ladder[("DIAMOND", "I", 1)] = {"c": 30}
+        get_active_players(REGION, {"a": 10, "b": 20})
+        assert collect_puuids_for_cycle(REGION) == {}
+        assert len(ladder["fetched"]) == 1
+
+    def test_concurrency_must_be_positive(self):
+        from shared.config import Settings
+        with pytest.raises(ValueError, match="LEAGUE_FETCH_CONCURRENCY"):
+            Settings(LEAGUE_FETCH_CONCURRENCY=0)
+
+    def test_apex_tiers_are_fetched_together(self, ladder):
+        collect_puuids_for_cycle(REGION)
+        assert ladder["fetched"][0] == [
+            ("challenger", "I", 1),
+            ("grandmaster", "I", 1),
+            ("master", "I", 1),
+        ]
+
+    def test_lower_tiers_page_every_division(self, ladder, monkeypatch):
+        monkeypatch.setattr(settings, "MIN_PLAYERS_THRESHOLD", 1000)
+        ladder[("DIAMOND", "I", 1)] = {"d1": 10}
+        ladder[("DIAMOND", "I", 2)] = {"d2": 10}
+        ladder[("DIAMOND", "III", 1)] = {"d3": 10}
+
+        players = collect_puuids_for_cycle(REGION)
+
+        assert {"d1", "d2", "d3"} <= set(players)
+        assert ("DIAMOND", "IV", 1) in ladder["fetched"][1]
+        # Only divisions I and III still had players — the next wave pages them deeper
+        assert ladder["fetched"][2] == [
+            ("DIAMOND", "I", 2),
+            ("DIAMOND", "III", 2),
+            ("DIAMOND", "I", 3),
+            ("DIAMOND", "III", 3),
+        ]
+
+    def test_cascade_stops_once_threshold_is_met(self, ladder, monkeypatch):
+        monkeypatch.setattr(settings, "MIN_PLAYERS_THRESHOLD", 2)
+        ladder[("DIAMOND", "II", 1)] = {"a": 10, "b": 10}
+        ladder[("EMERALD", "I", 1)] = {"c": 10}
+
+        assert set(collect_puuids_for_cycle(REGION)) == {"a", "b"}
+        assert all(tier != "EMERALD" for wave in ladder["fetched"] for tier, _, _ in wave)
+
+    def test_players_crawled_this_cycle_are_skipped(self, ladder):
+        ladder[("challenger", "I", 1)] = {"a": 10}
+        collect_puuids_for_cycle(REGION)
+        assert collect_puuids_for_cycle(REGION) == {}
@@ -0,0 +1,40 @@
+import pytest
+
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.concurrency.solo import TaskPool as SoloPool
+
+from crawler import main
+
+
+class _Worker:
+    """The worker_init sender — only its pool is read."""
+
+    def __init__(self, pool_cls):
+        self.pool_cls = pool_cls
+
+
+# ---------------------------------------------------------------------------
+# Pause subscriber startup
+# ---------------------------------------------------------------------------
+
+class TestPauseSubscriberStartup:
+
+    @pytest.fixture
+    def started(self, monkeypatch):
+        """Pause subscriber starts, recorded instead of run."""
+        calls = []
+        monkeypatch.setattr("crawler.services.rate_limiter.start_pause_subscriber", lambda: calls.append(1))
+        return calls
+
+    @pytest.mark.parametrize("pool_cls", ["solo", "threads", SoloPool])
+    def test_main_process_pools_start_it_in_the_worker(self, started, pool_cls):
+        main.on_worker_start(sender=_Worker(pool_cls))
+        assert started == [1]
+
+    @pytest.mark.parametrize("pool_cls", ["prefork", "processes", PreforkPool])
+    def test_prefork_parent_leaves_it_to_the_children(self, started, pool_cls):
+        main.on_worker_start(sender=_Worker(pool_cls))
+        assert started == []
+
+        main.on_process_start()
+        assert started == [1]
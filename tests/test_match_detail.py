@@ -0,0 +1,77 @@
+import pytest
+
+from shared.config import settings
+from crawler.tasks import match_detail, save
+from crawler.tasks.match_detail import fetch_match_details_batch
+
+
+# ---------------------------------------------------------------------------
+# fetch_match_details_batch
+# ---------------------------------------------------------------------------
+
+class TestFetchMatchDetailsBatch:
+
+    @pytest.fixture
+    def riot(self, monkeypatch):
+        """Serves every match ID not listed as failed or deferred; records queued tasks."""
+        state = {"failed": set(), "deferred": set(), "saves": [], "requeued": [], "resumed": [], "saved_before": {}}
+
+        async def fetch_matches(match_ids, on_result, region=None, defer=False):
+            outcome = {"fetched": [], "not_found": [], "failed": [], "deferred": [], "countdown": 0.0}
+            for match_id in match_ids:
+                if match_id in state["failed"]:
+                    outcome["failed"].append(match_id)
+                    continue
+                if match_id in state["deferred"]:
+                    outcome["deferred"].append(match_id)
+                    outcome["countdown"] = 12.5
+                    continue
+                outcome["fetched"].append(match_id)
+                on_result({"match_id": match_id})
+                # What had been queued for saving by the time this match completed
+                state["saved_before"][match_id] = sum(len(batch) for batch in state["saves"])
+            return outcome
+
+        monkeypatch.setattr(match_detail, "fetch_matches_api", fetch_matches)
+        monkeypatch.setattr(match_detail, "record_budget", lambda region, tier, count=1: None)
+        monkeypatch.setattr(
+            save.save_matches, "apply_async",
+            lambda args: state["saves"].append([raw["match_id"] for raw in args[0]]),
+        )
+        monkeypatch.setattr(
+            match_detail.fetch_match_detail, "apply_async",
+            lambda args, kwargs, countdown: state["requeued"].append(args[0]),
+        )
+        monkeypatch.setattr(
+            fetch_match_details_batch, "apply_async",
+            lambda args, kwargs, countdown: state["resumed"].append((args[0], countdown)),
+        )
+        monkeypatch.setattr(settings, "MATCH_DETAIL_BATCH_SAVE_SIZE", 2)
+        return state
+
+    def test_saves_are_queued_as_matches_complete(self, riot):
+        fetch_match_details_batch(["EUW1_1", "EUW1_2", "EUW1_3", "EUW1_4", "EUW1_5"])
+
+        assert riot["saves"] == [["EUW1_1", "EUW1_2"], ["EUW1_3", "EUW1_4"], ["EUW1_5"]]
+        # The first group was on its way before the batch finished
+        assert riot["saved_before"]["EUW1_3"] == 2
+
+    def test_failed_matches_fall_back_to_single_tasks(self, riot):
+        riot["failed"] = {"EUW1_2"}
+        fetch_match_details_batch(["EUW1_1", "EUW1_2", "EUW1_3"])
+
+        assert riot["saves"] == [["EUW1_1", "EUW1_3"]]
+        assert riot["requeued"] == ["EUW1_2"]
+
+    def test_nothing_fetched_queues_no_save(self, riot):
+        riot["failed"] = {"EUW1_1"}
+        fetch_match_details_batch(["EUW1_1"])
+        assert riot["saves"] == []
+
+    def test_deferred_matches_are_rescheduled_as_one_batch(self, riot):
+        riot["deferred"] = {"EUW1_2", "EUW1_3"}
+        fetch_match_details_batch(["EUW1_1", "EUW1_2", "EUW1_3"])
+
+        assert riot["saves"] == [["EUW1_1"]]
+        assert riot["resumed"] == [(["EUW1_2", "EUW1_3"], 12.5)]
+        assert riot["requeued"] == []
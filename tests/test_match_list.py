@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from crawler.tasks import match_list
+from crawler.tasks.match_list import (
+    DEFAULT_COUNT,
+    MAX_COUNT,
+    MIN_COUNT,
+    WATERMARK_OVERLAP_MINUTES,
+    estimate_games_per_hour,
+    fetch_match_list,
+    plan_match_list,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0)
+PUUID = "puuid_abc"
+
+
+def _epoch(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+# ---------------------------------------------------------------------------
+# plan_match_list
+# ---------------------------------------------------------------------------
+
+class TestPlanMatchList:
+
+    def test_first_crawl_fetches_recent_games(self):
+        assert plan_match_list(None, NOW) == (DEFAULT_COUNT, None)
+
+    def test_window_starts_before_last_crawl(self):
+        last = NOW - timedelta(hours=2)
+        _, start_time = plan_match_list({"last_crawled_at": last, "games_per_hour": 1.0}, NOW)
+        assert start_time == _epoch(last - timedelta(minutes=WATERMARK_OVERLAP_MINUTES))
+
+    def test_unknown_rate_uses_default_count(self):
+        crawl = {"last_crawled_at": NOW - timedelta(hours=1), "games_per_hour": None}
+        assert plan_match_list(crawl, NOW)[0] == DEFAULT_COUNT
+
+    def test_count_follows_game_rate(self):
+        # 3h window (2h + 1h overlap) × 2 games/h × 1.5 headroom + 1
+        crawl = {"last_crawled_at": NOW - timedelta(hours=2), "games_per_hour": 2.0}
+        assert plan_match_list(crawl, NOW)[0] == 10
+
+    def test_league_delta_raises_count(self):
+        crawl = {"last_crawled_at": NOW - timedelta(hours=2), "games_per_hour": 2.0}
+        assert plan_match_list(crawl, NOW, expected_matches=30)[0] == 31
+
+    def test_league_delta_without_game_rate(self):
+        crawl = {"last_crawled_at": NOW - timedelta(hours=1), "games_per_hour": None}
+        assert plan_match_list(crawl, NOW, expected_matches=2)[0] == MIN_COUNT
+
+    def test_count_is_bounded(self):
+        idle = {"last_crawled_at": NOW - timedelta(hours=1), "games_per_hour": 0.0}
+        grinder = {"last_crawled_at": NOW - timedelta(days=30), "games_per_hour": 3.0}
+        assert plan_match_list(idle, NOW)[0] == MIN_COUNT
+        assert plan_match_list(grinder, NOW)[0] == MAX_COUNT
+
+
+# ---------------------------------------------------------------------------
+# estimate_games_per_hour
+# ---------------------------------------------------------------------------
+
+class TestEstimateGamesPerHour:
+
+    def test_no_window_no_estimate(self):
+        assert estimate_games_per_hour(None, 20, None, NOW) is None
+
+    def test_first_estimate_is_observed_rate(self):
+        start_time = _epoch(NOW - timedelta(hours=4))
+        crawl = {"last_crawled_at": NOW, "games_per_hour": None}
+        assert estimate_games_per_hour(crawl, 8, start_time, NOW) == pytest.approx(2.0)
+
+    def test_estimate_is_smoothed(self):
+        start_time = _epoch(NOW - timedelta(hours=4))
+        crawl = {"last_crawled_at": NOW, "games_per_hour": 1.0}
+        assert estimate_games_per_hour(crawl, 8, start_time, NOW) == pytest.approx(1.5)
+
+
+# ---------------------------------------------------------------------------
+# fetch_match_list task
+# ---------------------------------------------------------------------------
+
+class TestFetchMatchList:
+
+    @pytest.fixture
+    def riot(self, monkeypatch):
+        """A player's match history, newest first, served page by page."""
+        state = {"history": [], "calls": [], "crawl": None, "upserts": [], "queued": [], "budget": []}
+
+        def fetch(puuid, count, region, defer, start, start_time):
+            state["calls"].append({"count": count, "start": start, "start_time": start_time})
+            return state["history"][start:start + count]
+
+        monkeypatch.setattr(match_list, "fetch_match_list_api", fetch)
+        monkeypatch.setattr(match_list, "get_player_crawl", lambda puuid: state["crawl"])
+        monkeypatch.setattr(match_list, "claim_matches", lambda ids: list(ids))
+        monkeypatch.setattr(match_list, "record_player_crawl", lambda *args: state["upserts"].append(args))
+        monkeypatch.setattr(match_list, "record_budget", lambda region, tier: state["budget"].append(tier))
+
+        monkeypatch.setattr(
+            match_list, "publish_many",
+            lambda task, calls: state["queued"].extend((args[0], kwargs["tier"]) for args, kwargs, _ in calls),
+        )
+        return state
+
+    def test_first_crawl_fetches_one_page(self, riot):
+        riot["history"] = [f"EUW1_{i}" for i in range(50)]
+        fetch_match_list(PUUID)
+        assert riot["calls"] == [{"count": DEFAULT_COUNT, "start": 0, "start_time": None}]
+        assert len(riot["queued"]) == DEFAULT_COUNT
+
+    def test_returning_player_pages_until_short_page(self, riot):
+        riot["crawl"] = {"last_crawled_at": datetime.utcnow() - timedelta(hours=1), "games_per_hour": 1.0}
+        riot["history"] = [f"EUW1_{i}" for i in range(12)]
+        fetch_match_list(PUUID)
+
+        assert [call["start"] for call in riot["calls"]] == [0, 5, 10]
+        assert all(call["start_time"] is not None for call in riot["calls"])
+        assert len(riot["queued"]) == 12
+
+    def test_game_rate_is_recorded(self, riot):
+        riot["crawl"] = {"last_crawled_at": datetime.utcnow() - timedelta(hours=1), "games_per_hour": None}
+        riot["history"] = ["EUW1_1", "EUW1_2"]
+        fetch_match_list(PUUID)
+
+        puuid, matches_found, games_per_hour, _ = riot["upserts"][0]
+        assert matches_found == 2
+        assert games_per_hour == pytest.approx(1.0, rel=0.01)
+
+    def test_known_matches_are_not_queued(self, riot, monkeypatch):
+        riot["history"] = ["EUW1_1", "EUW1_2"]
+        monkeypatch.setattr(match_list, "claim_matches", lambda ids: [])
+        fetch_match_list(PUUID)
+        assert riot["queued"] == []
+        assert riot["upserts"][0][1] == 0
+
+    def test_pages_are_counted_against_the_tier(self, riot):
+        riot["crawl"] = {"last_crawled_at": datetime.utcnow() - timedelta(hours=1), "games_per_hour": 1.0}
+        riot["history"] = [f"EUW1_{i}" for i in range(7)]
+        fetch_match_list(PUUID, tier="CHALLENGER")
+
+        assert riot["budget"] == ["CHALLENGER", "CHALLENGER"]
+        assert {tier for _, tier in riot["queued"]} == {"CHALLENGER"}
@@ -7,6 +7,7 @@ from shared.models.match import MatchResponseModel
 from crawler.services.match_parser import (
     explode_match_to_unit_rows,
     parse_game_version,
+    patch_key,
     get_item_slots,
 )
 
@@ -56,6 +57,10 @@ class TestParseGameVersion:
         assert isinstance(result, str)
         assert len(result) > 0
 
+    def test_patches_compare_numerically(self):
+        assert patch_key("16.10") > patch_key("16.9")
+        assert patch_key("17.1") > patch_key("16.24")
+
 
 # ---------------------------------------------------------------------------
 # get_item_slots
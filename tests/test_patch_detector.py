@@ -0,0 +1,78 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.patch_detector.redis_client", fake_client)
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def stores(monkeypatch):
+    """ClickHouse partitions and dedup shard changes, recorded instead of run."""
+    state = {"partitions": set(), "dropped": [], "shards": []}
+
+    def drop_patch_partition(patch):
+        state["partitions"].discard(patch)
+        state["dropped"].append(patch)
+
+    monkeypatch.setattr("crawler.services.patch_detector.get_existing_patches", lambda: sorted(state["partitions"]))
+    monkeypatch.setattr("crawler.services.patch_detector.drop_patch_partition", drop_patch_partition)
+    monkeypatch.setattr("crawler.services.patch_detector.discard_stale_rows", lambda patch: 0)
+    monkeypatch.setattr("crawler.services.patch_detector.start_shard", state["shards"].append)
+    return state
+
+
+from crawler.services.patch_detector import detect_patch_change, get_current_patch
+
+
+def _version(patch: str) -> str:
+    return f"Linux Version {patch}.745.7600 (Feb 10 2026/14:45:54) [PUBLIC] <Releases/{patch}>"
+
+
+# ---------------------------------------------------------------------------
+# detect_patch_change
+# ---------------------------------------------------------------------------
+
+class TestDetectPatchChange:
+
+    def test_first_patch_is_recorded(self, stores):
+        assert not detect_patch_change(_version("16.3"))
+        assert get_current_patch() == "16.3"
+        assert stores["shards"] == ["16.3"]
+
+    def test_same_patch_is_no_change(self, stores):
+        detect_patch_change(_version("16.3"))
+        assert not detect_patch_change(_version("16.3"))
+        assert stores["shards"] == ["16.3"]
+
+    def test_newer_patch_drops_old_partitions(self, stores):
+        detect_patch_change(_version("16.3"))
+        stores["partitions"] = {"16.2", "16.3"}
+
+        assert detect_patch_change(_version("16.4"))
+        assert get_current_patch() == "16.4"
+        assert sorted(stores["dropped"]) == ["16.2", "16.3"]
+        assert stores["shards"] == ["16.3", "16.4"]
+
+    def test_older_patch_after_newer_is_stale(self, stores):
+        detect_patch_change(_version("16.3"))
+        detect_patch_change(_version("16.4"))
+        stores["partitions"] = {"16.4"}
+        stores["dropped"].clear()
+
+        # A region that has not rolled out 16.4 yet
+        assert not detect_patch_change(_version("16.3"))
+        assert get_current_patch() == "16.4"
+        assert stores["dropped"] == []
+        assert stores["shards"] == ["16.3", "16.4"]
+
+    def test_patches_compare_numerically(self, stores):
+        detect_patch_change(_version("16.9"))
+        assert detect_patch_change(_version("16.10"))
+        assert not detect_patch_change(_version("16.9"))
+        assert get_current_patch() == "16.10"
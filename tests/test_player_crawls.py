@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+
+from crawler.db import postgres
+from crawler.db.postgres import (
+    PLAYER_CRAWL_BATCH_SIZE,
+    flush_player_crawls,
+    get_player_crawl,
+    record_player_crawl,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def upserts(monkeypatch):
+    """Statements written by the buffer, one list of records each."""
+    state = {"statements": [], "fail": False}
+
+    def upsert(crawls):
+        if state["fail"]:
+            raise ConnectionError("postgres down")
+        state["statements"].append(list(crawls))
+        return len(crawls)
+
+    monkeypatch.setattr(postgres, "upsert_player_crawls", upsert)
+    monkeypatch.setattr(postgres, "_pending_crawls", {})
+    monkeypatch.setattr(postgres, "_crawls_pending_since", None)
+    # No background flusher — tests flush explicitly
+    monkeypatch.setattr(postgres, "_ensure_crawl_flusher", lambda: None)
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Buffered player crawl writes
+# ---------------------------------------------------------------------------
+
+class TestRecordPlayerCrawl:
+
+    def test_records_are_buffered_until_flush(self, upserts):
+        record_player_crawl("a", 3, 1.5, NOW)
+        assert upserts["statements"] == []
+
+        flush_player_crawls()
+        assert upserts["statements"] == [[
+            {"puuid": "a", "last_crawled_at": NOW, "matches_found": 3, "games_per_hour": 1.5},
+        ]]
+
+    def test_full_batch_is_written_in_one_statement(self, upserts):
+        for i in range(PLAYER_CRAWL_BATCH_SIZE):
+            record_player_crawl(f"p{i}", 1, None, NOW)
+        assert len(upserts["statements"]) == 1
+        assert len(upserts["statements"][0]) == PLAYER_CRAWL_BATCH_SIZE
+
+    def test_latest_crawl_of_a_player_wins(self, upserts):
+        record_player_crawl("a", 3, 1.0, NOW)
+        record_player_crawl("a", 5, 2.0, NOW)
+        flush_player_crawls()
+        assert [crawl["matches_found"] for crawl in upserts["statements"][0]] == [5]
+
+    def test_failed_flush_keeps_records(self, upserts):
+        record_player_crawl("a", 3, 1.0, NOW)
+        upserts["fail"] = True
+        flush_player_crawls()
+
+        upserts["fail"] = False
+        flush_player_crawls()
+        assert [crawl["puuid"] for crawl in upserts["statements"][0]] == ["a"]
+
+    def test_buffered_crawl_is_read_back(self):
+        record_player_crawl("a", 3, 1.5, NOW)
+        assert get_player_crawl("a") == {"last_crawled_at": NOW, "games_per_hour": 1.5}
+
+    def test_waiting_records_are_flushed_without_another_crawl(self, upserts, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(postgres.time, "monotonic", lambda: now)
+        record_player_crawl("a", 3, 1.5, NOW)
+
+        postgres._flush_stale_crawls()
+        assert upserts["statements"] == []
+
+        # The flusher thread's tick once the record has waited long enough
+        now += postgres.PLAYER_CRAWL_FLUSH_SECONDS
+        postgres._flush_stale_crawls()
+        assert [crawl["puuid"] for crawl in upserts["statements"][0]] == ["a"]
+
+    def test_failed_flush_is_retried_by_the_flusher(self, upserts, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(postgres.time, "monotonic", lambda: now)
+        record_player_crawl("a", 3, 1.0, NOW)
+        upserts["fail"] = True
+        flush_player_crawls()
+
+        upserts["fail"] = False
+        now += postgres.PLAYER_CRAWL_FLUSH_SECONDS
+        postgres._flush_stale_crawls()
+        assert [crawl["puuid"] for crawl in upserts["statements"][0]] == ["a"]
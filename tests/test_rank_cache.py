@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.rank_cache.redis_client", fake_client)
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def league_entries(monkeypatch):
+    """{puuid: rank} served by the PostgreSQL lookup, with every lookup recorded."""
+    state = {"ranks": {}, "lookups": []}
+
+    def get_player_ranks(puuids):
+        state["lookups"].append(list(puuids))
+        return {puuid: state["ranks"][puuid] for puuid in puuids if puuid in state["ranks"]}
+
+    monkeypatch.setattr("crawler.db.postgres.get_player_ranks", get_player_ranks)
+    return state
+
+
+from shared.config import settings
+from crawler.services.rank_cache import cache_ranks, get_player_ranks
+
+CHALLENGER = {"tier": "CHALLENGER", "rank": "I", "lp": 1200}
+DIAMOND = {"tier": "DIAMOND", "rank": "II", "lp": 40}
+
+
+# ---------------------------------------------------------------------------
+# get_player_ranks
+# ---------------------------------------------------------------------------
+
+class TestGetPlayerRanks:
+
+    def test_cached_ranks_skip_postgres(self, league_entries):
+        cache_ranks({"a": CHALLENGER, "b": DIAMOND})
+        assert get_player_ranks(["a", "b"]) == {"a": CHALLENGER, "b": DIAMOND}
+        assert league_entries["lookups"] == []
+
+    def test_misses_are_looked_up_once_and_cached(self, league_entries):
+        league_entries["ranks"] = {"a": CHALLENGER, "b": DIAMOND}
+        cache_ranks({"a": CHALLENGER})
+
+        assert get_player_ranks(["a", "b"]) == {"a": CHALLENGER, "b": DIAMOND}
+        assert get_player_ranks(["a", "b"]) == {"a": CHALLENGER, "b": DIAMOND}
+        assert league_entries["lookups"] == [["b"]]
+
+    def test_unranked_players_are_cached(self, league_entries):
+        assert get_player_ranks(["unranked"]) == {}
+        assert get_player_ranks(["unranked"]) == {}
+        assert league_entries["lookups"] == [["unranked"]]
+
+    def test_refresh_replaces_unranked(self, league_entries):
+        get_player_ranks(["a"])
+        cache_ranks({"a": DIAMOND})
+        assert get_player_ranks(["a"]) == {"a": DIAMOND}
+
+    def test_duplicate_puuids_are_looked_up_once(self, league_entries):
+        get_player_ranks(["a", "a"])
+        assert league_entries["lookups"] == [["a"]]
+
+    def test_ranks_expire(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "RANK_CACHE_TTL_HOURS", 1)
+        cache_ranks({"a": CHALLENGER})
+        assert 0 < fake_redis.ttl("rank:a") <= 3600
@@ -1,3 +1,5 @@
+import json
+import os
 import time
 from unittest.mock import patch
 
@@ -11,17 +13,40 @@ def fake_redis(monkeypatch):
     server = fakeredis.FakeServer()
     fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
     monkeypatch.setattr("crawler.services.rate_limiter.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.rate_limiter._limits_cache", {})
+    monkeypatch.setattr("crawler.services.rate_limiter._pause_cache", {})
     return fake_client
 
 
 from crawler.services.rate_limiter import (
     check_and_wait,
+    try_acquire_permit,
+    try_acquire_any_permit,
+    acquire_permit,
+    get_scope_limits,
     update_rate_limit,
     set_pause_for_retry,
+    _effective_limit,
     _parse_rate_limit_header,
+    _pause_key,
+    _window_key,
+    app_scope,
+    method_scope,
     PAUSE_UNTIL_KEY,
+    PAUSE_CHANNEL,
+    DEFER_JITTER_SECONDS,
+    get_pause_remaining,
+    is_pause_subscriber_connected,
+    start_pause_subscriber,
+    stop_pause_subscriber,
+    _apply_pause_message,
+    RateLimitPaused,
 )
 
+# Every budget is scoped by routing value; tests use the default route
+ROUTE = "europe"
+APP_SCOPE = app_scope(ROUTE)
+
 
 # ---------------------------------------------------------------------------
 # _parse_rate_limit_header
@@ -75,32 +100,124 @@ class TestCheckAndWait:
             assert 4 < sleep_duration <= 5
 
 
+    def test_sleeps_when_method_paused(self, fake_redis):
+        fake_redis.set(_pause_key(method_scope("match_detail")), str(time.time() + 5))
+        with patch("time.sleep") as mock_sleep:
+            check_and_wait("match_detail")
+            mock_sleep.assert_called_once()
+
+    def test_method_pause_does_not_block_other_methods(self, fake_redis):
+        fake_redis.set(_pause_key(method_scope("match_detail")), str(time.time() + 5))
+        with patch("time.sleep") as mock_sleep:
+            check_and_wait("league")
+            check_and_wait()
+            mock_sleep.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Deferral (defer=True)
+# ---------------------------------------------------------------------------
+
+class TestDefer:
+
+    def test_long_pause_raises_instead_of_sleeping(self, fake_redis):
+        fake_redis.set(PAUSE_UNTIL_KEY, str(time.time() + 30))
+        with patch("time.sleep") as mock_sleep, pytest.raises(RateLimitPaused) as exc_info:
+            check_and_wait(defer=True)
+        mock_sleep.assert_not_called()
+        assert 29 < exc_info.value.countdown <= 30 + DEFER_JITTER_SECONDS
+
+    def test_short_pause_is_slept_inline(self, fake_redis):
+        fake_redis.set(PAUSE_UNTIL_KEY, str(time.time() + 0.5))
+        with patch("time.sleep") as mock_sleep:
+            check_and_wait(defer=True)
+            mock_sleep.assert_called_once()
+
+    def test_no_pause_does_not_raise(self, fake_redis):
+        check_and_wait(defer=True)
+
+    def test_exhausted_budget_raises(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            try_acquire_permit()
+        with pytest.raises(RateLimitPaused) as exc_info:
+            acquire_permit(route=ROUTE, defer=True)
+        assert exc_info.value.countdown > 9
+
+    def test_short_budget_wait_is_slept_inline(self, fake_redis):
+        waits = iter([0.2, 0.0])
+        with patch(
+            "crawler.services.rate_limiter.try_acquire_permit",
+            side_effect=lambda *args, **kwargs: next(waits),
+        ), patch("time.sleep") as mock_sleep:
+            acquire_permit(defer=True)
+            mock_sleep.assert_called_once_with(0.2)
+
+
 # ---------------------------------------------------------------------------
 # update_rate_limit
 # ---------------------------------------------------------------------------
 
 class TestUpdateRateLimit:
 
-    def test_sets_pause_when_buffer_reached(self, fake_redis):
-        # 96 calls made out of 100 in 120s window — only 4 remaining, below buffer of 5
+    def test_stores_limits_from_headers(self, fake_redis):
+        headers = {
+            "x-app-rate-limit-count": "1:10,1:600",
+            "x-app-rate-limit": "500:10,30000:600",
+        }
+        update_rate_limit(headers)
+        assert get_scope_limits(APP_SCOPE) == {10: 500, 600: 30000}
+        assert fake_redis.hgetall("rate_limit:europe:app:limits") == {"10": "500", "600": "30000"}
+
+    def test_tops_up_window_to_reported_count(self, fake_redis):
+        # Riot has seen 96 calls this window, the limiter only knows about none
         headers = {
             "x-app-rate-limit-count": "96:120",
             "x-app-rate-limit": "100:120",
         }
         update_rate_limit(headers)
-        pause_until = fake_redis.get(PAUSE_UNTIL_KEY)
-        assert pause_until is not None
-        assert float(pause_until) > time.time()
+        assert fake_redis.zcard(_window_key(APP_SCOPE, 120)) == 96
+
+    def test_does_not_remove_locally_granted_permits(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"120": "100"})
+        for _ in range(10):
+            try_acquire_permit()
+        headers = {
+            "x-app-rate-limit-count": "3:120",
+            "x-app-rate-limit": "100:120",
+        }
+        update_rate_limit(headers)
+        assert fake_redis.zcard(_window_key(APP_SCOPE, 120)) == 10
 
-    def test_does_not_set_pause_when_plenty_remaining(self, fake_redis):
-        # Only 10 calls made out of 100 — 90 remaining, well above buffer
+    def test_no_longer_sets_window_long_pause(self, fake_redis):
+        # The proactive limiter replaces the reactive pause_until sawtooth
         headers = {
-            "x-app-rate-limit-count": "10:120",
+            "x-app-rate-limit-count": "96:120",
             "x-app-rate-limit": "100:120",
         }
         update_rate_limit(headers)
         assert fake_redis.get(PAUSE_UNTIL_KEY) is None
 
+    def test_stores_method_limits_per_method(self, fake_redis):
+        headers = {
+            "x-app-rate-limit-count": "1:10",
+            "x-app-rate-limit": "500:10",
+            "x-method-rate-limit-count": "40:10",
+            "x-method-rate-limit": "250:10",
+        }
+        update_rate_limit(headers, method="match_detail")
+        assert get_scope_limits(method_scope("match_detail")) == {10: 250}
+        assert get_scope_limits(method_scope("league")) == {}
+        assert fake_redis.zcard(_window_key(method_scope("match_detail"), 10)) == 40
+
+    def test_ignores_method_headers_without_method(self, fake_redis):
+        headers = {
+            "x-method-rate-limit-count": "40:10",
+            "x-method-rate-limit": "250:10",
+        }
+        update_rate_limit(headers)
+        assert fake_redis.keys("rate_limit:*:method:*") == []
+
     def test_handles_missing_headers_gracefully(self, fake_redis):
         # No rate limit headers — should not crash or set pause
         update_rate_limit({})
@@ -113,6 +230,123 @@ class TestUpdateRateLimit:
         }
         update_rate_limit(headers)
         assert fake_redis.get(PAUSE_UNTIL_KEY) is None
+        assert fake_redis.exists("rate_limit:europe:app:limits") == 0
+
+
+# ---------------------------------------------------------------------------
+# try_acquire_permit / acquire_permit
+# ---------------------------------------------------------------------------
+
+class TestAcquirePermit:
+
+    def test_effective_limit_applies_target_and_buffer(self):
+        # 95% of 30000 is below 30000 - 5
+        assert _effective_limit(30000) == 28500
+        # 20 - 5 buffer is below 95% of 20
+        assert _effective_limit(20) == 15
+        # Never drops to zero
+        assert _effective_limit(3) == 1
+
+    def test_grants_permits_until_window_full(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "20"})
+        granted = [try_acquire_permit() for _ in range(_effective_limit(20))]
+        assert all(wait == 0 for wait in granted)
+        assert try_acquire_permit() > 0
+
+    def test_wait_is_bounded_by_window(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            try_acquire_permit()
+        wait = try_acquire_permit()
+        assert 9 < wait <= 10
+
+    def test_tightest_window_wins(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "100", "600": "20"})
+        for _ in range(_effective_limit(20)):
+            assert try_acquire_permit() == 0
+        assert try_acquire_permit() > 10
+
+    def test_permits_are_recorded_in_every_window(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "100", "600": "1000"})
+        try_acquire_permit()
+        assert fake_redis.zcard(_window_key(APP_SCOPE, 10)) == 1
+        assert fake_redis.zcard(_window_key(APP_SCOPE, 600)) == 1
+
+    def test_falls_back_to_configured_limits(self, fake_redis):
+        from shared.config import settings
+        expected = _parse_rate_limit_header(settings.RIOT_APP_RATE_LIMIT)
+        assert get_scope_limits(APP_SCOPE) == expected
+
+    def test_saturated_method_does_not_block_other_methods(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "1000"})
+        fake_redis.hset("rate_limit:europe:method:match_detail:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            assert try_acquire_permit("match_detail") == 0
+        assert try_acquire_permit("match_detail") > 0
+        assert try_acquire_permit("match_list") == 0
+        assert try_acquire_permit("league") == 0
+
+    def test_routes_have_independent_budgets(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "20"})
+        fake_redis.hset("rate_limit:americas:app:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            try_acquire_permit(route="europe")
+        assert try_acquire_permit(route="europe") > 0
+        assert try_acquire_permit(route="americas") == 0
+
+    def test_method_permits_also_count_against_app(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:app:limits", mapping={"10": "1000"})
+        fake_redis.hset("rate_limit:europe:method:league:limits", mapping={"10": "100"})
+        try_acquire_permit("league")
+        assert fake_redis.zcard(_window_key(APP_SCOPE, 10)) == 1
+        assert fake_redis.zcard(_window_key(method_scope("league"), 10)) == 1
+
+    def test_keys_have_independent_budgets(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:key_a:app:limits", mapping={"10": "20"})
+        fake_redis.hset("rate_limit:europe:key_b:app:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            try_acquire_permit(route=ROUTE, key_id="key_a")
+        assert try_acquire_permit(route=ROUTE, key_id="key_a") > 0
+        assert try_acquire_permit(route=ROUTE, key_id="key_b") == 0
+
+    def test_scoped_pause_is_honoured_by_permit(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=30, route=ROUTE, key_id="key_a")
+        assert 29 < try_acquire_permit(route=ROUTE, key_id="key_a") <= 30
+        assert try_acquire_permit(route=ROUTE, key_id="key_b") == 0
+
+    def test_paused_permit_is_not_recorded(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=30, method="league", route=ROUTE)
+        assert try_acquire_permit("league", route=ROUTE) > 0
+        assert fake_redis.exists(_window_key(APP_SCOPE, 1)) == 0
+
+    def test_any_permit_skips_saturated_key(self, fake_redis):
+        fake_redis.hset("rate_limit:europe:key_a:app:limits", mapping={"10": "20"})
+        fake_redis.hset("rate_limit:europe:key_b:app:limits", mapping={"10": "20"})
+        for _ in range(_effective_limit(20)):
+            try_acquire_permit(route=ROUTE, key_id="key_a")
+        for _ in range(4):
+            assert try_acquire_any_permit(route=ROUTE, key_ids=["key_a", "key_b"]) == ("key_b", 0.0)
+
+    def test_any_permit_spreads_across_keys(self, fake_redis):
+        granted = {try_acquire_any_permit(route=ROUTE, key_ids=["key_a", "key_b"])[0] for _ in range(4)}
+        assert granted == {"key_a", "key_b"}
+
+    def test_any_permit_returns_soonest_wait(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=30, route=ROUTE, key_id="key_a")
+        set_pause_for_retry(retry_after_seconds=10, route=ROUTE, key_id="key_b")
+        key_id, wait = try_acquire_any_permit(route=ROUTE, key_ids=["key_a", "key_b"])
+        assert key_id is None
+        # now_ms is truncated, so allow a millisecond of rounding
+        assert 9 < wait <= 10.01
+
+    def test_acquire_sleeps_until_permit_available(self, fake_redis):
+        waits = iter([2.5, 0.0])
+        with patch(
+            "crawler.services.rate_limiter.try_acquire_permit",
+            side_effect=lambda *args, **kwargs: next(waits),
+        ), patch("time.sleep") as mock_sleep:
+            acquire_permit()
+            mock_sleep.assert_called_once_with(2.5)
 
 
 # ---------------------------------------------------------------------------
@@ -136,3 +370,112 @@ class TestSetPauseForRetry:
         pause_until = float(fake_redis.get(PAUSE_UNTIL_KEY))
         # New pause should be roughly 120 seconds from now
         assert pause_until > time.time() + 100
+
+    def test_route_pause_leaves_other_routes_unpaused(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=60, route="europe")
+        assert fake_redis.get(PAUSE_UNTIL_KEY) is None
+        with patch("time.sleep") as mock_sleep:
+            check_and_wait("match_detail", route="americas")
+            mock_sleep.assert_not_called()
+            check_and_wait("match_detail", route="europe")
+            mock_sleep.assert_called_once()
+
+    def test_global_pause_blocks_every_route(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=60)
+        with patch("time.sleep") as mock_sleep:
+            check_and_wait("league", route="kr")
+            mock_sleep.assert_called_once()
+
+    def test_method_pause_leaves_app_unpaused(self, fake_redis):
+        set_pause_for_retry(retry_after_seconds=60, method="match_list")
+        assert fake_redis.get(PAUSE_UNTIL_KEY) is None
+        assert fake_redis.get(_pause_key(method_scope("match_list"))) is not None
+
+
+# ---------------------------------------------------------------------------
+# Pause broadcast
+# ---------------------------------------------------------------------------
+
+class TestPauseBroadcast:
+
+    @pytest.fixture
+    def subscribed(self, monkeypatch):
+        """Pretend this process's subscriber thread is connected."""
+        monkeypatch.setattr("crawler.services.rate_limiter._subscribed_pid", os.getpid())
+
+    def test_set_pause_publishes(self, fake_redis):
+        pubsub = fake_redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(PAUSE_CHANNEL)
+        set_pause_for_retry(retry_after_seconds=30, route=ROUTE)
+
+        # The subscribe confirmation is consumed (and swallowed) first
+        messages = [pubsub.get_message(timeout=1.0) for _ in range(2)]
+        message = next(m for m in messages if m)
+        assert json.loads(message["data"])["key"] == _pause_key(APP_SCOPE)
+
+    def test_polls_redis_when_not_subscribed(self, fake_redis):
+        with patch.object(fake_redis, "mget", wraps=fake_redis.mget) as mget:
+            get_pause_remaining("league", ROUTE)
+            get_pause_remaining("league", ROUTE)
+        assert mget.call_count == 2
+
+    def test_subscribed_reads_are_served_from_memory(self, fake_redis, subscribed):
+        with patch.object(fake_redis, "mget", wraps=fake_redis.mget) as mget:
+            get_pause_remaining("league", ROUTE)
+            get_pause_remaining("league", ROUTE)
+        assert mget.call_count == 1
+
+    def test_published_pause_applies_without_redis_read(self, fake_redis, subscribed):
+        get_pause_remaining()
+        _apply_pause_message(json.dumps({"key": PAUSE_UNTIL_KEY, "pause_until": time.time() + 30}))
+        with patch.object(fake_redis, "mget") as mget:
+            assert get_pause_remaining() > 29
+        mget.assert_not_called()
+
+    def test_cached_pause_expires_after_validity_window(self, fake_redis, subscribed):
+        get_pause_remaining()
+        fake_redis.set(PAUSE_UNTIL_KEY, str(time.time() + 30))
+        assert get_pause_remaining() == 0
+
+        with patch("crawler.services.rate_limiter.PAUSE_CACHE_SECONDS", 0):
+            from crawler.services import rate_limiter
+            rate_limiter._pause_cache.clear()
+            get_pause_remaining()
+        assert get_pause_remaining() > 29
+
+    def test_cache_cleared_by_subscriber_mid_read(self, fake_redis, subscribed):
+        from crawler.services import rate_limiter
+        fake_redis.set(PAUSE_UNTIL_KEY, str(time.time() + 30))
+        # The global pause is cached, the route's pauses are read from Redis
+        get_pause_remaining()
+        mget = fake_redis.mget
+
+        def mget_then_reconnect(keys):
+            values = mget(keys)
+            # The subscriber thread reconnects while the pauses are being read
+            rate_limiter._pause_cache.clear()
+            return values
+
+        with patch.object(fake_redis, "mget", side_effect=mget_then_reconnect):
+            assert get_pause_remaining("league", ROUTE) > 29
+
+    def test_malformed_message_is_ignored(self, subscribed):
+        _apply_pause_message("not json")
+        assert get_pause_remaining() == 0
+
+    def test_subscriber_thread_receives_pauses(self, fake_redis):
+        start_pause_subscriber()
+        try:
+            deadline = time.time() + 2
+            while not is_pause_subscriber_connected() and time.time() < deadline:
+                time.sleep(0.01)
+            assert is_pause_subscriber_connected()
+
+            set_pause_for_retry(retry_after_seconds=30)
+            from crawler.services import rate_limiter
+            while PAUSE_UNTIL_KEY not in rate_limiter._pause_cache and time.time() < deadline:
+                time.sleep(0.01)
+            assert rate_limiter._pause_cache[PAUSE_UNTIL_KEY][0] > time.time() + 29
+        finally:
+            stop_pause_subscriber()
+        assert not is_pause_subscriber_connected()
@@ -0,0 +1,273 @@
+import fakeredis
+import httpx
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.rate_limiter.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.key_pool.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.key_pool._disabled_cache", None)
+    monkeypatch.setattr("crawler.services.key_pool._pending_usage", {})
+    monkeypatch.setattr("crawler.services.concurrency.redis_client", fake_client)
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    """Start every test with an empty connection pool."""
+    from crawler.services import riot_client
+    riot_client.close_clients()
+    yield
+    riot_client.close_clients()
+
+
+from crawler.services import riot_client
+from crawler.services.key_pool import key_id
+from crawler.services.rate_limiter import PAUSE_UNTIL_KEY
+from crawler.services.riot_client import (
+    _get_client,
+    _get_route,
+    _make_request,
+    close_clients,
+    InvalidKeyError,
+    NotFoundError,
+    RateLimitError,
+)
+
+from shared.config import settings
+
+ROUTE = "europe"
+BASE_URL = "https://europe.api.riotgames.com"
+
+
+def _mock_client(monkeypatch, handler) -> None:
+    """Routes _make_request through an httpx.MockTransport instead of the network."""
+    client = httpx.Client(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(riot_client, "_get_client", lambda base_url: client)
+
+
+# ---------------------------------------------------------------------------
+# _get_client / close_clients
+# ---------------------------------------------------------------------------
+
+class TestConnectionPool:
+
+    def test_reuses_client_for_same_base_url(self):
+        assert _get_client(BASE_URL) is _get_client(BASE_URL)
+
+    def test_separate_client_per_base_url(self):
+        other = "https://euw1.api.riotgames.com"
+        assert _get_client(BASE_URL) is not _get_client(other)
+
+    def test_client_is_bound_to_base_url(self):
+        assert str(_get_client(BASE_URL).base_url).rstrip("/") == BASE_URL
+
+    def test_close_clients_empties_pool(self):
+        client = _get_client(BASE_URL)
+        close_clients()
+        assert client.is_closed
+        assert _get_client(BASE_URL) is not client
+
+    def test_new_pool_after_fork(self, monkeypatch):
+        client = _get_client(BASE_URL)
+        monkeypatch.setattr(riot_client.os, "getpid", lambda: -1)
+        assert _get_client(BASE_URL) is not client
+
+
+# ---------------------------------------------------------------------------
+# _get_route
+# ---------------------------------------------------------------------------
+
+class TestGetRoute:
+
+    def test_regional_route(self):
+        assert _get_route("americas", regional=True) == "americas"
+
+    def test_platform_route(self):
+        assert _get_route("asia", regional=False) == "kr"
+
+    def test_defaults_to_configured_region(self):
+        from shared.config import settings
+        assert _get_route(regional=True) == settings.RIOT_REGION.lower()
+
+
+# ---------------------------------------------------------------------------
+# _make_request
+# ---------------------------------------------------------------------------
+
+class TestMakeRequest:
+
+    def test_returns_parsed_json(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json=["EUW1_1"]))
+        path = "/tft/match/v1/matches/by-puuid/abc/ids"
+        assert _make_request(ROUTE, path, "match_list") == ["EUW1_1"]
+
+    def test_sends_token_and_gzip_headers(self, monkeypatch):
+        seen = {}
+
+        def handler(request):
+            seen.update(request.headers)
+            return httpx.Response(200, json={})
+
+        _mock_client(monkeypatch, handler)
+        _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert "x-riot-token" in seen
+        assert seen["accept-encoding"] == "gzip"
+
+    def test_raises_rate_limit_error_on_429(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(429, headers={"Retry-After": "7"}),
+        )
+        with pytest.raises(RateLimitError) as exc_info:
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert exc_info.value.retry_after == 7
+        # No X-Rate-Limit-Type means an application limit — pause everything
+        assert exc_info.value.method is None
+
+    def test_method_scoped_429_names_the_method(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(
+                429,
+                headers={"Retry-After": "7", "X-Rate-Limit-Type": "method"},
+            ),
+        )
+        with pytest.raises(RateLimitError) as exc_info:
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert exc_info.value.method == "match_detail"
+        assert exc_info.value.route == ROUTE
+
+    def test_rate_limit_error_names_the_key(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(429, headers={"Retry-After": "7"}))
+        with pytest.raises(RateLimitError) as exc_info:
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert exc_info.value.key_id == key_id(settings.api_keys[0])
+
+    def test_service_429_applies_to_every_key(self, monkeypatch):
+        _mock_client(
+            monkeypatch,
+            lambda request: httpx.Response(
+                429,
+                headers={"Retry-After": "7", "X-Rate-Limit-Type": "service"},
+            ),
+        )
+        with pytest.raises(RateLimitError) as exc_info:
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert exc_info.value.key_id is None
+
+    def test_raises_not_found_on_404(self, monkeypatch):
+        _mock_client(monkeypatch, lambda request: httpx.Response(404))
+        with pytest.raises(NotFoundError):
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+
+
+# ---------------------------------------------------------------------------
+# API key pool
+# ---------------------------------------------------------------------------
+
+class TestKeyPool:
+
+    def test_requests_spread_across_keys(self, monkeypatch):
+        monkeypatch.setattr(settings, "RIOT_API_KEYS", ["key-a", "key-b"])
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers["x-riot-token"])
+            return httpx.Response(200, json={})
+
+        _mock_client(monkeypatch, handler)
+        for _ in range(4):
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert set(seen) == {"key-a", "key-b"}
+
+    def test_forbidden_key_is_dropped_and_request_retried(self, monkeypatch, fake_redis):
+        monkeypatch.setattr(settings, "RIOT_API_KEYS", ["key-a", "key-b"])
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers["x-riot-token"])
+            if request.headers["x-riot-token"] == "key-a":
+                return httpx.Response(403)
+            return httpx.Response(200, json={"ok": True})
+
+        _mock_client(monkeypatch, handler)
+        for _ in range(3):
+            assert _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail") == {"ok": True}
+
+        assert seen.count("key-a") == 1
+        # One dropped key must not pause the rest of the fleet
+        assert fake_redis.get(PAUSE_UNTIL_KEY) is None
+
+    def test_last_key_forbidden_pauses_everything(self, monkeypatch, fake_redis):
+        _mock_client(monkeypatch, lambda request: httpx.Response(403))
+        with pytest.raises(InvalidKeyError) as exc_info:
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+        assert exc_info.value.pool_exhausted
+        assert fake_redis.get(PAUSE_UNTIL_KEY) is not None
+
+
+# ---------------------------------------------------------------------------
+# Adaptive concurrency
+# ---------------------------------------------------------------------------
+
+class TestAdaptiveConcurrency:
+
+    @pytest.fixture(autouse=True)
+    def enabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "CONCURRENCY_CONTROL_ENABLED", True)
+
+    def test_slot_released_and_limit_grows(self, monkeypatch, fake_redis):
+        from crawler.services.concurrency import INITIAL_LIMIT, get_concurrency_limit
+
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json={}))
+        _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+
+        assert fake_redis.zcard(f"concurrency:{ROUTE}:inflight") == 0
+        assert get_concurrency_limit(ROUTE) > INITIAL_LIMIT
+
+    def test_transport_error_counts_as_error(self, monkeypatch, fake_redis):
+        def handler(request):
+            raise httpx.ConnectError("refused")
+
+        _mock_client(monkeypatch, handler)
+        with pytest.raises(httpx.ConnectError):
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail")
+
+        assert fake_redis.zcard(f"concurrency:{ROUTE}:inflight") == 0
+        assert fake_redis.zcard(f"concurrency:{ROUTE}:errors") == 1
+
+    def test_slot_is_taken_before_the_permit(self, monkeypatch):
+        from crawler.services.concurrency import CIRCUIT_ERROR_THRESHOLD, ERROR, release_slot
+        from crawler.services.rate_limiter import RateLimitPaused
+
+        for n in range(CIRCUIT_ERROR_THRESHOLD):
+            release_slot(ROUTE, f"t{n}", ERROR)
+        permits = []
+        monkeypatch.setattr(riot_client, "acquire_permit", lambda *args, **kwargs: permits.append(args))
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json={}))
+
+        with pytest.raises(RateLimitPaused):
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail", defer=True)
+        # Deferred on the open circuit without spending a permit
+        assert permits == []
+
+    def test_deferred_permit_frees_slot_without_feedback(self, monkeypatch, fake_redis):
+        from crawler.services.concurrency import INITIAL_LIMIT, get_concurrency_limit
+        from crawler.services.rate_limiter import RateLimitPaused
+
+        def exhausted(*args, **kwargs):
+            raise RateLimitPaused(5)
+
+        monkeypatch.setattr(riot_client, "acquire_permit", exhausted)
+        _mock_client(monkeypatch, lambda request: httpx.Response(200, json={}))
+
+        with pytest.raises(RateLimitPaused):
+            _make_request(ROUTE, "/tft/match/v1/matches/EUW1_1", "match_detail", defer=True)
+        assert fake_redis.zcard(f"concurrency:{ROUTE}:inflight") == 0
+        assert fake_redis.zcard(f"concurrency:{ROUTE}:errors") == 0
+        assert get_concurrency_limit(ROUTE) == INITIAL_LIMIT
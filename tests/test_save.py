@@ -0,0 +1,126 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from crawler.tasks import save
+from crawler.tasks.save import save_matches
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "match_response.json"
+
+
+def _raw_match(match_id: str, game_datetime: int | None = None, game_version: str | None = None) -> dict:
+    raw_json = copy.deepcopy(json.loads(FIXTURE_PATH.read_text()))
+    raw_json["metadata"]["match_id"] = match_id
+    if game_datetime is not None:
+        raw_json["info"]["game_datetime"] = game_datetime
+    if game_version is not None:
+        raw_json["info"]["game_version"] = game_version
+    return raw_json
+
+
+# ---------------------------------------------------------------------------
+# save_matches task
+# ---------------------------------------------------------------------------
+
+class TestSaveMatches:
+
+    @pytest.fixture
+    def stores(self, monkeypatch):
+        """Every database call the batch makes, recorded."""
+        state = {"stored": set(), "saves": [], "patches": [], "rank_lookups": [], "inserts": [], "discovered": []}
+
+        def save_postgres(matches):
+            state["saves"].append([match.metadata.match_id for match, _ in matches])
+            new = {match.metadata.match_id for match, _ in matches} - state["stored"]
+            state["stored"] |= new
+            return new
+
+        def discover(match_id, puuids, player_ranks):
+            state["discovered"].append(match_id)
+            return []
+
+        monkeypatch.setattr(save, "save_matches_postgres", save_postgres)
+        monkeypatch.setattr(save, "detect_patch_change", lambda version: state["patches"].append(version))
+        monkeypatch.setattr(save, "get_player_ranks", lambda puuids: state["rank_lookups"].append(puuids) or {})
+        monkeypatch.setattr(save, "insert_unit_rows", lambda rows: state["inserts"].append(rows))
+        monkeypatch.setattr(save, "discover_players", discover)
+        return state
+
+    def test_one_call_per_store_for_the_batch(self, stores):
+        save_matches([_raw_match(f"EUW1_{i}") for i in range(3)])
+
+        assert stores["saves"] == [["EUW1_0", "EUW1_1", "EUW1_2"]]
+        assert len(stores["patches"]) == 1
+        assert len(stores["rank_lookups"]) == 1
+        assert len(stores["inserts"]) == 1
+        assert {row.match_id for row in stores["inserts"][0]} == {"EUW1_0", "EUW1_1", "EUW1_2"}
+
+    def test_rank_lookup_covers_every_participant_once(self, stores):
+        save_matches([_raw_match("EUW1_0"), _raw_match("EUW1_1")])
+        puuids = stores["rank_lookups"][0]
+        assert len(puuids) == len(set(puuids)) == 8
+
+    def test_invalid_match_is_discarded_alone(self, stores):
+        invalid = _raw_match("EUW1_bad")
+        del invalid["info"]["participants"]
+
+        save_matches([_raw_match("EUW1_0"), invalid, _raw_match("EUW1_1")])
+
+        assert stores["saves"] == [["EUW1_0", "EUW1_1"]]
+        assert len(stores["inserts"]) == 1
+
+    def test_stored_matches_are_skipped(self, stores):
+        stores["stored"].add("EUW1_0")
+        save_matches([_raw_match("EUW1_0"), _raw_match("EUW1_1")])
+
+        assert {row.match_id for row in stores["inserts"][0]} == {"EUW1_1"}
+        assert stores["discovered"] == ["EUW1_1"]
+
+    def test_nothing_new_stops_after_postgres(self, stores):
+        stores["stored"].add("EUW1_0")
+        save_matches([_raw_match("EUW1_0")])
+
+        assert stores["patches"] == []
+        assert stores["inserts"] == []
+
+    def test_patch_is_checked_from_newest_match(self, stores):
+        save_matches([
+            _raw_match("EUW1_0", game_datetime=2_000, game_version="Version 16.4.1"),
+            _raw_match("EUW1_1", game_datetime=1_000, game_version="Version 16.3.9"),
+        ])
+        assert stores["patches"] == ["Version 16.4.1"]
+
+    def test_discovery_failure_does_not_fail_the_batch(self, stores, monkeypatch):
+        def broken(match_id, puuids, player_ranks):
+            raise ConnectionError("redis down")
+
+        monkeypatch.setattr(save, "discover_players", broken)
+        save_matches([_raw_match("EUW1_0")])
+        assert len(stores["inserts"]) == 1
+
+    def test_retry_still_processes_matches_saved_before_the_failure(self, stores, monkeypatch):
+        retries = []
+
+        class Retry(Exception):
+            pass
+
+        def retry(exc=None, args=None, kwargs=None):
+            retries.append({"args": args, "kwargs": kwargs})
+            return Retry()
+
+        def failing_insert(rows):
+            raise ConnectionError("clickhouse down")
+
+        monkeypatch.setattr(save_matches, "retry", retry)
+        monkeypatch.setattr(save, "insert_unit_rows", failing_insert)
+        raw_jsons = [_raw_match("EUW1_0"), _raw_match("EUW1_1")]
+        with pytest.raises(Retry):
+            save_matches(raw_jsons)
+        assert retries[0]["kwargs"] == {"saved_ids": ["EUW1_0", "EUW1_1"]}
+
+        # The matches are committed now — the retry must not skip them
+        monkeypatch.setattr(save, "insert_unit_rows", lambda rows: stores["inserts"].append(rows))
+        save_matches(*retries[0]["args"], **retries[0]["kwargs"])
+        assert {row.match_id for row in stores["inserts"][0]} == {"EUW1_0", "EUW1_1"}
@@ -0,0 +1,152 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Replace the real Redis client with fakeredis for all tests."""
+    server = fakeredis.FakeServer()
+    fake_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("crawler.services.scheduler.redis_client", fake_client)
+    monkeypatch.setattr("crawler.services.scheduler._pending_budget", {})
+    return fake_client
+
+
+from crawler.services import scheduler
+from crawler.services.scheduler import (
+    PRIORITY_STEPS,
+    SEED_TIER,
+    UNKNOWN_TIER,
+    flush_budget,
+    pop_tier_budget,
+    prioritise_players,
+    priority_for,
+    record_budget,
+    score_player,
+)
+
+REGION = "europe"
+
+
+def _player(tier: str, league_points: int = 0, expected_matches: int | None = 0) -> dict:
+    return {"tier": tier, "league_points": league_points, "expected_matches": expected_matches}
+
+
+# ---------------------------------------------------------------------------
+# score_player / priority_for
+# ---------------------------------------------------------------------------
+
+class TestScorePlayer:
+
+    def test_higher_tier_scores_higher(self):
+        assert score_player("CHALLENGER") > score_player("GRANDMASTER") > score_player("GOLD")
+
+    def test_lp_orders_players_within_a_tier(self):
+        assert score_player("MASTER", 800) > score_player("MASTER", 100)
+
+    def test_lp_bonus_is_capped(self):
+        assert score_player("CHALLENGER", 5000) == score_player("CHALLENGER", 1000)
+
+    def test_lower_tiers_scale_lp_per_division(self):
+        assert score_player("DIAMOND", 99, 0) - score_player("DIAMOND", 0, 0) == pytest.approx(0.99)
+
+    def test_active_player_scores_higher(self):
+        assert score_player("MASTER", 0, 5) > score_player("MASTER", 0, 0)
+
+    def test_unknown_activity_scores_between(self):
+        assert score_player("MASTER", 0, 0) < score_player("MASTER", 0, None) < score_player("MASTER", 0, 10)
+
+    def test_recent_yield_scores_higher(self):
+        assert score_player("MASTER", 0, 0, 10) > score_player("MASTER", 0, 0, 0)
+
+    def test_bonuses_never_skip_two_tiers(self):
+        assert score_player("DIAMOND", 99, 100, 100) < score_player("CHALLENGER", 0, 0, 0)
+
+    def test_seeds_outscore_the_whole_ladder(self):
+        assert score_player(SEED_TIER) > score_player("CHALLENGER", 1000, 10, 20)
+
+    def test_unknown_tier_scores_lowest(self):
+        assert score_player(UNKNOWN_TIER) < score_player("GOLD")
+
+
+class TestPriorityFor:
+
+    def test_best_players_get_top_priority(self):
+        assert priority_for(score_player("CHALLENGER", 1000, 10, 20)) == 0
+
+    def test_seeds_get_top_priority(self):
+        assert priority_for(score_player(SEED_TIER)) == 0
+
+    def test_priority_is_bounded(self):
+        assert priority_for(100) == 0
+        assert priority_for(-5) == PRIORITY_STEPS - 1
+
+
+# ---------------------------------------------------------------------------
+# prioritise_players
+# ---------------------------------------------------------------------------
+
+class TestPrioritisePlayers:
+
+    def test_orders_players_by_score(self):
+        players = {
+            "gold": _player("GOLD"),
+            "challenger": _player("CHALLENGER"),
+            "master": _player("MASTER"),
+        }
+        ranked = [puuid for puuid, _ in prioritise_players(players, {})]
+        assert ranked == ["challenger", "master", "gold"]
+
+    def test_seeds_run_before_the_ladder(self):
+        players = {"challenger": _player("CHALLENGER"), "seed": _player(SEED_TIER, expected_matches=None)}
+        ranked = [puuid for puuid, _ in prioritise_players(players, {"challenger": 20})]
+        assert ranked == ["seed", "challenger"]
+
+    def test_last_crawl_yield_breaks_ties(self):
+        players = {"a": _player("MASTER"), "b": _player("MASTER")}
+        ranked = [puuid for puuid, _ in prioritise_players(players, {"b": 12})]
+        assert ranked == ["b", "a"]
+
+
+# ---------------------------------------------------------------------------
+# Budget metrics
+# ---------------------------------------------------------------------------
+
+class TestTierBudget:
+
+    def test_requests_are_buffered_until_flush(self, fake_redis):
+        record_budget(REGION, "CHALLENGER")
+        assert fake_redis.hgetall(f"scheduler:budget:{REGION}") == {}
+
+        flush_budget()
+        assert fake_redis.hgetall(f"scheduler:budget:{REGION}") == {"CHALLENGER": "1"}
+
+    def test_pop_returns_requests_per_tier(self):
+        record_budget(REGION, "CHALLENGER", 3)
+        record_budget(REGION, "GOLD")
+        record_budget(REGION, None)
+        assert pop_tier_budget(REGION) == {"CHALLENGER": 3, "GOLD": 1, UNKNOWN_TIER: 1}
+
+    def test_pop_resets_the_cycle(self):
+        record_budget(REGION, "CHALLENGER")
+        pop_tier_budget(REGION)
+        assert pop_tier_budget(REGION) == {}
+
+    def test_budget_is_per_region(self):
+        record_budget(REGION, "CHALLENGER")
+        record_budget("americas", "GOLD")
+        assert pop_tier_budget(REGION) == {"CHALLENGER": 1}
+
+    def test_failed_flush_keeps_counts(self, monkeypatch):
+        record_budget(REGION, "MASTER", 2)
+
+        class BrokenPipeline:
+            def hincrby(self, *args):
+                pass
+
+            def execute(self):
+                raise ConnectionError("redis down")
+
+        monkeypatch.setattr(scheduler.redis_client, "pipeline", lambda **kwargs: BrokenPipeline())
+        flush_budget()
+        assert scheduler._pending_budget == {REGION: {"MASTER": 2}}